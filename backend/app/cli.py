@@ -0,0 +1,263 @@
+"""
+Yi-Vote maintenance commands
+
+    cd backend
+    python -m app.cli migrate [--dedupe]
+    python -m app.cli reconcile-tallies [--contest-id ID] [--dry-run]
+    python -m app.cli reconcile-rollups [--contest-id ID] [--dry-run]
+    python -m app.cli import-votes FILE [--format csv|ndjson] [--rejects PATH]
+    python -m app.cli export-votes CONTEST_ID [--format csv|ndjson|parquet] [--output PATH]
+    python -m app.cli archive-votes [--contest-id ID] [--format ndjson|parquet] [--dry-run]
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app.core import config
+from app.core.sharding import vote_shards
+from app.database import SessionLocal, engine, Base
+import app.models  # noqa: F401  (register every table before create_all)
+
+
+def migrate_command(args) -> int:
+    from app.core.migrations import upgrade, MigrationError
+
+    try:
+        steps = upgrade(engine, dedupe=args.dedupe)
+    except MigrationError as exc:
+        print(f"Migration failed: {exc}", file=sys.stderr)
+        return 1
+    for step in steps:
+        print(step)
+    print("Schema is up to date" if not steps else f"{len(steps)} migration steps applied")
+    # Tallies and rollups may be missing (new tables) or include deleted repeat votes
+    args.contest_id, args.dry_run = None, False
+    return reconcile_tallies_command(args) or reconcile_rollups_command(args)
+
+
+def reconcile_tallies_command(args) -> int:
+    from app.services.tallies import reconcile_tallies
+
+    db = SessionLocal()
+    try:
+        drift = reconcile_tallies(db, contest_id=args.contest_id, fix=not args.dry_run)
+    finally:
+        db.close()
+
+    for item in drift:
+        print(
+            f"contest {item['contest_id']} contestant {item['contestant_id']}: "
+            f"stored={item['stored']} actual={item['actual']}"
+        )
+    action = "found" if args.dry_run else "fixed"
+    print(f"{len(drift)} drifted tallies {action}")
+    return 1 if drift and args.dry_run else 0
+
+
+def reconcile_rollups_command(args) -> int:
+    from app.services.rollups import reconcile_rollups
+
+    db = SessionLocal()
+    try:
+        drift = reconcile_rollups(db, contest_id=args.contest_id, fix=not args.dry_run)
+    finally:
+        db.close()
+
+    for item in drift:
+        print(f"contest {item['contest_id']}: stored={item['stored']} actual={item['actual']}")
+    action = "found" if args.dry_run else "rebuilt"
+    print(f"{len(drift)} contests with drifted rollups {action}")
+    return 1 if drift and args.dry_run else 0
+
+
+def import_votes_command(args) -> int:
+    from app.services.vote_import import VoteImporter, detect_format, read_rows
+
+    fmt = detect_format(args.file, args.format)
+    rejects = open(args.rejects, "w") if args.rejects else sys.stderr
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        importer = VoteImporter(db, batch_size=args.batch_size, default_method=args.default_method)
+        with open(args.file, encoding="utf-8-sig", newline="") as stream:
+            for rejection in importer.run(read_rows(stream, fmt)):
+                rejects.write(json.dumps(rejection) + "\n")
+    finally:
+        db.close()
+        if rejects is not sys.stderr:
+            rejects.close()
+
+    elapsed = time.perf_counter() - started
+    summary = importer.summary()
+    summary["seconds"] = round(elapsed, 3)
+    summary["rows_per_second"] = round(summary["total"] / elapsed, 1) if elapsed else None
+    print(json.dumps(summary))
+    return 0
+
+
+def export_votes_command(args) -> int:
+    from app.services.contest_registry import contest_registry
+    from app.services.vote_archive import ArchiveError, check_archive, get_archive
+    from app.services.vote_export import check_export_format, export_votes
+
+    try:
+        check_export_format(args.format)
+    except (ValueError, RuntimeError) as exc:
+        print(f"Export failed: {exc}", file=sys.stderr)
+        return 1
+    db = SessionLocal()
+    try:
+        shard = contest_registry.shard_of(db, args.contest_id)
+        archive = get_archive(db, args.contest_id)
+    finally:
+        db.close()
+    if shard is None:
+        print(f"Contest {args.contest_id} not found", file=sys.stderr)
+        return 1
+    if archive is not None:
+        try:
+            check_archive(archive)
+        except ArchiveError as exc:
+            print(f"Export failed: {exc}", file=sys.stderr)
+            return 1
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    started = time.perf_counter()
+    written = 0
+    try:
+        for chunk in export_votes(
+            args.format, shard, args.contest_id, archive=archive,
+            since=args.since, until=args.until, vote_method=args.vote_method, page_size=args.page_size
+        ):
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+
+    print(json.dumps({
+        "contest_id": args.contest_id,
+        "format": args.format,
+        "bytes": written,
+        "seconds": round(time.perf_counter() - started, 3)
+    }), file=sys.stderr)
+    return 0
+
+
+def archive_votes_command(args) -> int:
+    from app.services.vote_archive import (
+        ArchiveError, archivable_contests, archive_contest, archive_file, check_archive_format,
+        purge_contest, purgeable_archives
+    )
+
+    try:
+        check_archive_format(args.format)
+    except (ValueError, RuntimeError) as exc:
+        print(f"Archive failed: {exc}", file=sys.stderr)
+        return 1
+    db = SessionLocal()
+    failed = 0
+    try:
+        if args.contest_id is not None:
+            contest_ids = [args.contest_id]
+        else:
+            contest_ids = archivable_contests(db, timedelta(days=args.older_than_days))
+        purge_delay = timedelta(seconds=args.purge_delay)
+        if args.dry_run:
+            print(f"would archive contests: {contest_ids}")
+            print(f"would purge contests: {[archive.contest_id for archive in purgeable_archives(db, purge_delay)]}")
+            return 0
+
+        for contest_id in contest_ids:
+            started = time.perf_counter()
+            try:
+                archive = archive_contest(db, contest_id, args.format, page_size=args.page_size)
+            except ArchiveError as exc:
+                db.rollback()
+                print(f"contest {contest_id}: {exc}", file=sys.stderr)
+                failed += 1
+                continue
+            print(json.dumps({
+                "contest_id": contest_id,
+                "archived": archive.vote_count,
+                "file": archive_file(archive),
+                "bytes": archive.size_bytes,
+                "seconds": round(time.perf_counter() - started, 3)
+            }))
+
+        # Exports that started on the hot rows get purge_delay to finish
+        for archive in purgeable_archives(db, purge_delay):
+            started = time.perf_counter()
+            deleted = purge_contest(db, archive, args.purge_chunk)
+            print(json.dumps({
+                "contest_id": archive.contest_id,
+                "purged": deleted,
+                "seconds": round(time.perf_counter() - started, 3)
+            }))
+    finally:
+        db.close()
+    return 1 if failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Yi-Vote maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate", help="Add tables and indexes missing from an existing database")
+    migrate.add_argument("--dedupe", action="store_true", help="Delete repeat votes that block the unique voter index")
+    migrate.set_defaults(handler=migrate_command)
+
+    reconcile = commands.add_parser("reconcile-tallies", help="Rebuild vote tallies from the votes table")
+    reconcile.add_argument("--contest-id", type=int, default=None, help="Only reconcile this contest")
+    reconcile.add_argument("--dry-run", action="store_true", help="Report drift without fixing it")
+    reconcile.set_defaults(handler=reconcile_tallies_command)
+
+    rollups = commands.add_parser("reconcile-rollups", help="Rebuild analytics rollups that drifted from the votes table")
+    rollups.add_argument("--contest-id", type=int, default=None, help="Only reconcile this contest")
+    rollups.add_argument("--dry-run", action="store_true", help="Report drift without fixing it")
+    rollups.set_defaults(handler=reconcile_rollups_command)
+
+    importer = commands.add_parser("import-votes", help="Bulk import votes from a CSV or NDJSON file")
+    importer.add_argument("file", help="Path to the CSV or NDJSON file")
+    importer.add_argument("--format", choices=["csv", "ndjson"], default=None, help="Default: from file extension")
+    importer.add_argument("--default-method", default="sms", help="vote_method for rows that do not set one")
+    importer.add_argument("--batch-size", type=int, default=5000)
+    importer.add_argument("--rejects", default=None, help="Write the NDJSON rejection report here (default: stderr)")
+    importer.set_defaults(handler=import_votes_command)
+
+    exporter = commands.add_parser("export-votes", help="Export a contest's raw votes for audit")
+    exporter.add_argument("contest_id", type=int)
+    exporter.add_argument("--format", choices=["csv", "ndjson", "parquet"], default="csv")
+    exporter.add_argument("--output", default=None, help="Write the export here (default: stdout)")
+    exporter.add_argument("--since", type=datetime.fromisoformat, default=None, help="ISO time, inclusive")
+    exporter.add_argument("--until", type=datetime.fromisoformat, default=None, help="ISO time, exclusive")
+    exporter.add_argument("--vote-method", default=None)
+    exporter.add_argument("--page-size", type=int, default=10000)
+    exporter.set_defaults(handler=export_votes_command)
+
+    archiver = commands.add_parser("archive-votes", help="Move closed contests' votes to archive files")
+    archiver.add_argument("--contest-id", type=int, default=None, help="Archive this contest (default: every one due)")
+    archiver.add_argument("--format", choices=["ndjson", "parquet"], default=config.VOTE_ARCHIVE_FORMAT)
+    archiver.add_argument("--older-than-days", type=float, default=config.VOTE_ARCHIVE_AFTER_DAYS,
+                          help="Archive contests that ended this long ago")
+    archiver.add_argument("--purge-delay", type=float, default=config.VOTE_ARCHIVE_PURGE_DELAY_S,
+                          help="Seconds after archival before rows leave the votes table")
+    archiver.add_argument("--purge-chunk", type=int, default=config.VOTE_ARCHIVE_PURGE_CHUNK)
+    archiver.add_argument("--page-size", type=int, default=10000)
+    archiver.add_argument("--dry-run", action="store_true", help="List what would be archived and purged")
+    archiver.set_defaults(handler=archive_votes_command)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    Base.metadata.create_all(bind=engine)
+    vote_shards.create_tables()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment"""
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_float(name: str, default: float) -> float:
+    """Read a float setting from the environment"""
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """Read a boolean setting from the environment"""
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Vote ingestion: "sync" commits every vote in its request,
+# "queued" hands validated votes to the background batch writer
+VOTE_INGEST_MODE = os.getenv("VOTE_INGEST_MODE", "sync").lower()
+VOTE_QUEUE_MAX_SIZE = env_int("VOTE_QUEUE_MAX_SIZE", 10000)
+VOTE_BATCH_SIZE = env_int("VOTE_BATCH_SIZE", 500)
+VOTE_BATCH_INTERVAL_MS = env_int("VOTE_BATCH_INTERVAL_MS", 50)
+# Queued batches the database keeps refusing are kept in SPILL_DIR (one
+# fsynced file per batch) and written again every SPILL_RETRY_S
+VOTE_SPILL_DIR = os.getenv("VOTE_SPILL_DIR", "./spill")
+VOTE_SPILL_RETRY_S = env_float("VOTE_SPILL_RETRY_S", 10)
+
+# In-memory Bloom filter of each open contest's voters: on direct (sync)
+# writes, voters it has probably seen are looked up before inserting and
+# the rest go straight to the unique index; the importer skips IN checks
+# for voters it has never seen. Queued votes are always looked up. FP_RATE
+# is the share of new voters still looked up; filters start sized for
+# INITIAL_CAPACITY voters (or the contest's vote count) and grow as needed. Votes from other workers are
+# picked up every REFRESH_S, re-reading the last SETTLE_S worth of ids.
+VOTER_FILTER_ENABLED = env_bool("VOTER_FILTER_ENABLED", True)
+VOTER_FILTER_FP_RATE = env_float("VOTER_FILTER_FP_RATE", 0.01)
+VOTER_FILTER_INITIAL_CAPACITY = env_int("VOTER_FILTER_INITIAL_CAPACITY", 100000)
+VOTER_FILTER_REFRESH_S = env_float("VOTER_FILTER_REFRESH_S", 1)
+VOTER_FILTER_SETTLE_S = env_float("VOTER_FILTER_SETTLE_S", 5)
+
+# Extra databases that hold votes and tallies, comma separated; new contests
+# are spread across them by id while metadata stays on DATABASE_URL
+VOTE_SHARD_URLS = [url.strip() for url in os.getenv("VOTE_SHARD_URLS", "").split(",") if url.strip()]
+
+# Read replicas of DATABASE_URL, comma separated, for the read routes listed
+# in READ_REPLICA_ROUTES ("results", "contestants", "contests"). Replicas are
+# picked "round_robin" or "least_loaded"; one more than MAX_STALENESS_S
+# behind (checked every CHECK_S with a heartbeat row) is skipped, and with
+# none usable reads go to the primary.
+READ_REPLICA_URLS = [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+READ_REPLICA_POLICY = os.getenv("READ_REPLICA_POLICY", "round_robin").lower()
+READ_REPLICA_ROUTES = {
+    route.strip() for route in os.getenv("READ_REPLICA_ROUTES", "results,contestants,contests").split(",")
+    if route.strip()
+}
+READ_REPLICA_MAX_STALENESS_S = env_float("READ_REPLICA_MAX_STALENESS_S", 5)
+READ_REPLICA_CHECK_S = env_float("READ_REPLICA_CHECK_S", 1)
+
+# Contest metadata registry used to validate votes without reading the contest
+CONTEST_REGISTRY_TTL_S = env_float("CONTEST_REGISTRY_TTL_S", 5)
+CONTEST_REGISTRY_MAX_ENTRIES = env_int("CONTEST_REGISTRY_MAX_ENTRIES", 10000)
+
+# Verified admin tokens are trusted for this long without re-reading the admin;
+# 0 disables the cache
+ADMIN_AUTH_CACHE_TTL_S = env_float("ADMIN_AUTH_CACHE_TTL_S", 30)
+ADMIN_AUTH_CACHE_MAX_ENTRIES = env_int("ADMIN_AUTH_CACHE_MAX_ENTRIES", 1024)
+
+# bcrypt runs in a separate process pool (default: half the cores) so logins
+# cannot take every CPU from vote traffic; calls beyond workers + queue are
+# rejected at once, and calls not answered within the timeout fail
+PASSWORD_POOL_WORKERS = env_int("PASSWORD_POOL_WORKERS", max(1, (os.cpu_count() or 2) // 2))
+PASSWORD_POOL_MAX_QUEUE = env_int("PASSWORD_POOL_MAX_QUEUE", 8)
+PASSWORD_POOL_TIMEOUT_S = env_float("PASSWORD_POOL_TIMEOUT_S", 5)
+
+# Contest lifecycle scheduler: opens and closes contests at their start and
+# end dates, and freezes final results this long after a contest closes
+# (after queued votes have landed). The timeline is re-read every
+# LIFECYCLE_REFRESH_S to pick up contests changed by other workers.
+LIFECYCLE_ENABLED = env_bool("LIFECYCLE_ENABLED", True)
+LIFECYCLE_REFRESH_S = env_float("LIFECYCLE_REFRESH_S", 30)
+LIFECYCLE_FREEZE_DELAY_S = env_float("LIFECYCLE_FREEZE_DELAY_S", 10)
+
+# Per-contest Merkle logs of votes for inclusion proofs. A background task
+# appends up to MERKLE_BATCH_SIZE not yet logged votes per contest every
+# MERKLE_INTERVAL_S. Closed contests' final roots are signed with
+# MERKLE_SIGNING_KEY, a base64 Ed25519 seed; when unset they are sealed
+# without a signature.
+MERKLE_ENABLED = env_bool("MERKLE_ENABLED", True)
+MERKLE_INTERVAL_S = env_float("MERKLE_INTERVAL_S", 1)
+MERKLE_BATCH_SIZE = env_int("MERKLE_BATCH_SIZE", 10000)
+MERKLE_SIGNING_KEY = os.getenv("MERKLE_SIGNING_KEY", "")
+
+# Archival of closed contests' votes (python -m app.cli archive-votes): votes
+# of contests whose results were frozen VOTE_ARCHIVE_AFTER_DAYS ago are
+# written to a per-contest file in VOTE_ARCHIVE_DIR ("ndjson" = gzipped
+# NDJSON, or "parquet" with pyarrow) and read from there by exports and
+# proofs. Their rows leave the votes table VOTE_ARCHIVE_PURGE_DELAY_S after
+# archival, so exports already reading them can finish, PURGE_CHUNK rows per
+# transaction.
+VOTE_ARCHIVE_DIR = os.getenv("VOTE_ARCHIVE_DIR", "./archive")
+VOTE_ARCHIVE_FORMAT = os.getenv("VOTE_ARCHIVE_FORMAT", "ndjson").lower()
+VOTE_ARCHIVE_AFTER_DAYS = env_float("VOTE_ARCHIVE_AFTER_DAYS", 30)
+VOTE_ARCHIVE_PURGE_DELAY_S = env_float("VOTE_ARCHIVE_PURGE_DELAY_S", 600)
+VOTE_ARCHIVE_PURGE_CHUNK = env_int("VOTE_ARCHIVE_PURGE_CHUNK", 10000)
+
+# Contestant photos (POST /api/contestants/{id}/photo, needs Pillow). Originals
+# up to PHOTO_MAX_BYTES / PHOTO_MAX_PIXELS are stored in PHOTO_DIR by content
+# hash; PHOTO_WORKERS processes render each "name:longest edge" size in
+# PHOTO_SIZES in every PHOTO_FORMATS format. Files never change once written,
+# so they are served with PHOTO_CACHE_MAX_AGE_S immutable caching. A render
+# claimed PHOTO_CLAIM_TIMEOUT_S ago without finishing (a crashed worker) is
+# retried, up to PHOTO_MAX_ATTEMPTS times.
+PHOTO_DIR = os.getenv("PHOTO_DIR", "./media/photos")
+PHOTO_MAX_BYTES = env_int("PHOTO_MAX_BYTES", 10 * 1024 * 1024)
+PHOTO_MAX_PIXELS = env_int("PHOTO_MAX_PIXELS", 40000000)
+PHOTO_SIZES = [
+    (name.strip(), int(edge)) for name, _, edge in
+    (size.partition(":") for size in os.getenv("PHOTO_SIZES", "thumb:160,card:480,full:1080").split(","))
+    if name.strip()
+]
+PHOTO_FORMATS = [fmt.strip().lower() for fmt in os.getenv("PHOTO_FORMATS", "webp,jpeg").split(",") if fmt.strip()]
+PHOTO_QUALITY = env_int("PHOTO_QUALITY", 80)
+PHOTO_WORKERS = env_int("PHOTO_WORKERS", max(1, (os.cpu_count() or 2) // 2))
+PHOTO_CACHE_MAX_AGE_S = env_int("PHOTO_CACHE_MAX_AGE_S", 31536000)
+PHOTO_CLAIM_TIMEOUT_S = env_float("PHOTO_CLAIM_TIMEOUT_S", 300)
+PHOTO_MAX_ATTEMPTS = env_int("PHOTO_MAX_ATTEMPTS", 3)
+
+# Vote rate limiting, checked before the vote route touches the database.
+# Limits are "<count>/<seconds>" ("0" = off): per voter per contest, and per
+# client address per contest and channel. Overrides are comma-separated
+# "<channel>:<voter|ip>=<limit>" and "<contest id>:<voter|ip>=<limit>".
+# The per-address limit is off by default: behind a reverse proxy every
+# voter shares its address until RATE_LIMIT_TRUST_FORWARDED is set (only
+# trust X-Forwarded-For behind a proxy that sets it).
+RATE_LIMIT_ENABLED = env_bool("RATE_LIMIT_ENABLED", True)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_MAX_KEYS = env_int("RATE_LIMIT_MAX_KEYS", 200000)
+RATE_LIMIT_VOTER = os.getenv("RATE_LIMIT_VOTER", "5/60")
+RATE_LIMIT_IP = os.getenv("RATE_LIMIT_IP", "0")
+RATE_LIMIT_CHANNELS = os.getenv("RATE_LIMIT_CHANNELS", "")
+RATE_LIMIT_CONTESTS = os.getenv("RATE_LIMIT_CONTESTS", "")
+RATE_LIMIT_TRUST_FORWARDED = env_bool("RATE_LIMIT_TRUST_FORWARDED", False)
+
+# Paged list endpoints: page size when only cursor/fields/include_total is
+# given, and the largest page a client may ask for with ?limit=
+LIST_DEFAULT_LIMIT = env_int("LIST_DEFAULT_LIMIT", 100)
+LIST_MAX_LIMIT = env_int("LIST_MAX_LIMIT", 1000)
+
+# Request/SQL instrumentation exposed on /metrics (Prometheus text format).
+# Requests slower than SLOW_REQUEST_LOG_MS are logged with their SQL; 0 = off
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+SLOW_REQUEST_LOG_MS = env_float("SLOW_REQUEST_LOG_MS", 0)
+
+# Results and contestant lists are built as plain dicts in their schema's
+# shape; dump them without re-validating (uses orjson when installed)
+FAST_JSON_ENABLED = env_bool("FAST_JSON_ENABLED", True)
+
+# Response cache for public read endpoints: "memory", "redis" or "none"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_MAX_ENTRIES = env_int("CACHE_MAX_ENTRIES", 2048)
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_TTL_CONTESTS = env_float("CACHE_TTL_CONTESTS", 30)
+CACHE_TTL_CONTESTANTS = env_float("CACHE_TTL_CONTESTANTS", 10)
+CACHE_TTL_RESULTS = env_float("CACHE_TTL_RESULTS", 2)
+CACHE_TTL_ANALYTICS = env_float("CACHE_TTL_ANALYTICS", 5)
+
+# Live results streaming: aggregation tick and SSE keep-alive interval
+LIVE_RESULTS_TICK_MS = env_int("LIVE_RESULTS_TICK_MS", 1000)
+LIVE_RESULTS_KEEPALIVE_S = env_float("LIVE_RESULTS_KEEPALIVE_S", 15)
+
+# Connection pool (applies to both the sync and async engines)
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 10)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 20)
+DB_POOL_TIMEOUT = env_float("DB_POOL_TIMEOUT", 10)
+DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", 1800)
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", True)
+
+# SQLite tuning, applied to every new connection when SQLITE_TUNED is on
+SQLITE_TUNED = env_bool("SQLITE_TUNED", True)
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_BUSY_TIMEOUT_MS = env_int("SQLITE_BUSY_TIMEOUT_MS", 10000)
+SQLITE_MMAP_SIZE = env_int("SQLITE_MMAP_SIZE", 268435456)
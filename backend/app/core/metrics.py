@@ -0,0 +1,248 @@
+"""
+Request and SQL instrumentation, rendered in the Prometheus text format.
+
+RequestMetricsMiddleware times every HTTP request per route template
+(``/api/votes/results/{contest_id}``, never the raw path, so label
+cardinality stays bounded). SQLAlchemy cursor events on each engine count
+statements and their time, both per engine and against the request that
+ran them. The request is found through a context variable, which reaches
+sync routes in the threadpool and ``AsyncSession.run_sync`` greenlets.
+
+With SLOW_REQUEST_LOG_MS set, requests slower than that are logged with
+the SQL they ran (statement text only; parameters carry voter details).
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+SLOW_LOG_MAX_STATEMENTS = 50
+SLOW_LOG_MAX_SQL_CHARS = 500
+
+
+class Histogram:
+    """Bucket counts, sum and count; not thread-safe, guarded by the registry lock"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestStats:
+    """SQL run on behalf of one request"""
+
+    __slots__ = ("statements", "sql_seconds", "queries")
+
+    def __init__(self, capture: bool):
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.queries = [] if capture else None
+
+    def add(self, statement: str, elapsed: float):
+        self.statements += 1
+        self.sql_seconds += elapsed
+        if self.queries is not None and len(self.queries) < SLOW_LOG_MAX_STATEMENTS:
+            self.queries.append((elapsed, statement))
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[tuple, int] = {}
+        self.latency: Dict[tuple, Histogram] = {}
+        self.request_statements: Dict[tuple, Histogram] = {}
+        self.request_sql_seconds: Dict[tuple, Histogram] = {}
+        self.statements: Dict[str, int] = {}
+        self.statement_seconds: Dict[str, float] = {}
+        self.in_progress = 0
+        self.slow_requests = 0
+
+    def record_statement(self, engine_name: str, elapsed: float):
+        with self._lock:
+            self.statements[engine_name] = self.statements.get(engine_name, 0) + 1
+            self.statement_seconds[engine_name] = self.statement_seconds.get(engine_name, 0.0) + elapsed
+
+    def record_request(self, method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+        key = (method, route)
+        with self._lock:
+            status_key = (method, route, str(status))
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+            for histograms, buckets, value in (
+                (self.latency, LATENCY_BUCKETS, elapsed),
+                (self.request_statements, STATEMENT_BUCKETS, stats.statements),
+                (self.request_sql_seconds, LATENCY_BUCKETS, stats.sql_seconds)
+            ):
+                histogram = histograms.get(key)
+                if histogram is None:
+                    histogram = histograms[key] = Histogram(buckets)
+                histogram.observe(value)
+
+    def render(self, gauges: Iterable[tuple] = ()) -> str:
+        """
+        Everything recorded, plus ``gauges``, in the Prometheus text format.
+
+        ``gauges`` are ``(name, type, help, [(labels, value), ...])`` tuples
+        for state owned elsewhere (pools, queues, caches).
+        """
+        with self._lock:
+            families = [
+                ("yivote_http_requests_total", "counter", "HTTP requests by route and status",
+                 [(dict(zip(("method", "route", "status"), key)), value) for key, value in self.requests.items()]),
+                ("yivote_http_requests_in_progress", "gauge", "HTTP requests being served",
+                 [({}, self.in_progress)]),
+                ("yivote_http_slow_requests_total", "counter", "Requests slower than SLOW_REQUEST_LOG_MS",
+                 [({}, self.slow_requests)]),
+                ("yivote_db_statements_total", "counter", "SQL statements executed per engine",
+                 [({"engine": name}, value) for name, value in self.statements.items()]),
+                ("yivote_db_statement_seconds_total", "counter", "Time spent executing SQL per engine",
+                 [({"engine": name}, round(value, 6)) for name, value in self.statement_seconds.items()])
+            ]
+            histograms = [
+                ("yivote_http_request_duration_seconds", "HTTP request latency by route", self.latency),
+                ("yivote_http_request_db_statements", "SQL statements per request by route",
+                 self.request_statements),
+                ("yivote_http_request_db_seconds", "SQL time per request by route", self.request_sql_seconds)
+            ]
+            lines = []
+            for name, help_text, series in histograms:
+                lines += _histogram_lines(name, help_text, series)
+        for name, kind, help_text, samples in [*families, *gauges]:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines += [f"{name}{_labels(labels)} {value}" for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, help_text: str, series: Dict[tuple, Histogram]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (method, route), histogram in series.items():
+        labels = {"method": method, "route": route}
+        cumulative = 0
+        for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': bound})} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {round(histogram.sum, 6)}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    return lines
+
+
+metrics = MetricsRegistry()
+
+
+def instrument_engine(engine: Engine, name: str):
+    """Count and time every statement ``engine`` executes (the sync engine of an async one)"""
+    if not config.METRICS_ENABLED:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info["statement_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("statement_started", time.perf_counter())
+        metrics.record_statement(name, elapsed)
+        stats = _current_request.get()
+        if stats is not None:
+            stats.add(statement, elapsed)
+
+
+_route_paths: Dict[object, str] = {}
+
+
+def route_template(scope) -> str:
+    """Path template of the route that served the request, from the endpoint the router matched"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    path = _route_paths.get(endpoint)
+    if path is None:
+        for route in getattr(scope.get("app"), "routes", ()):
+            if getattr(route, "endpoint", None) is not None:
+                _route_paths.setdefault(route.endpoint, route.path)
+        path = _route_paths.setdefault(endpoint, "unmatched")
+    return path
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording latency and SQL per route, and logging slow requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not config.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestStats(capture=config.SLOW_REQUEST_LOG_MS > 0)
+        token = _current_request.set(stats)
+        metrics.in_progress += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.in_progress -= 1
+            _current_request.reset(token)
+            route = route_template(scope)
+            metrics.record_request(scope["method"], route, status, elapsed, stats)
+            if config.SLOW_REQUEST_LOG_MS > 0 and elapsed * 1000 >= config.SLOW_REQUEST_LOG_MS:
+                metrics.slow_requests += 1
+                log_slow_request(scope, route, status, elapsed, stats)
+
+
+def log_slow_request(scope, route: str, status: int, elapsed: float, stats: RequestStats):
+    queries = "".join(
+        f"\n  {seconds * 1000:8.2f} ms  {' '.join(statement.split())[:SLOW_LOG_MAX_SQL_CHARS]}"
+        for seconds, statement in stats.queries
+    )
+    omitted = stats.statements - len(stats.queries)
+    logger.warning(
+        "Slow request %s %s (%s) -> %s in %.1f ms; %d SQL statements in %.1f ms%s%s",
+        scope["method"], scope["path"], route, status, elapsed * 1000,
+        stats.statements, stats.sql_seconds * 1000, queries,
+        f"\n  ... {omitted} more" if omitted > 0 else ""
+    )
@@ -0,0 +1,155 @@
+"""
+Schema upgrades for databases created by an older release.
+
+``Base.metadata.create_all`` adds missing tables but never touches tables
+that already exist, so columns and indexes added to a model later have to
+be created here. Every step is idempotent.
+"""
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.sharding import vote_shards
+from app.database import Base
+from app.models import ContestantTally, Vote, VoteRollup
+
+DUPLICATE_VOTES_SQL = """
+    SELECT COALESCE(SUM(n - 1), 0) FROM (
+        SELECT COUNT(*) AS n FROM votes
+        GROUP BY contest_id, voter_identifier
+        HAVING COUNT(*) > 1
+    ) AS duplicates
+"""
+
+DEDUPE_VOTES_SQL = """
+    DELETE FROM votes WHERE id NOT IN (
+        SELECT keep_id FROM (
+            SELECT MIN(id) AS keep_id FROM votes
+            GROUP BY contest_id, voter_identifier
+        ) AS keepers
+    )
+"""
+
+
+class MigrationError(Exception):
+    """Raised when an upgrade step cannot be applied safely"""
+
+
+def count_duplicate_votes(engine: Engine) -> int:
+    """Number of votes that would violate the one-vote-per-voter index"""
+    with engine.connect() as conn:
+        return conn.execute(text(DUPLICATE_VOTES_SQL)).scalar()
+
+
+def missing_columns(engine: Engine, metadata: MetaData = Base.metadata) -> list:
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(column for column in table.columns if column.name not in existing)
+    return missing
+
+
+def add_column(engine: Engine, column):
+    """ALTER TABLE ... ADD COLUMN; NOT NULL columns need a server default to backfill"""
+    ddl = f"ALTER TABLE {column.table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    with engine.begin() as conn:
+        conn.execute(text(ddl))
+
+
+def missing_indexes(engine: Engine) -> list:
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing.extend(index for index in table.indexes if index.name not in existing)
+    return missing
+
+
+def upgrade(engine: Engine, dedupe: bool = False) -> list:
+    """
+    Bring an existing database up to the current models.
+
+    Creates missing tables, columns and indexes. Existing repeat votes block the
+    unique (contest_id, voter_identifier) index; with ``dedupe`` the
+    earliest vote per voter is kept and the rest are deleted, otherwise a
+    MigrationError is raised. Returns a list of the steps applied.
+    """
+    Base.metadata.create_all(bind=engine)
+    steps = []
+
+    for column in missing_columns(engine):
+        add_column(engine, column)
+        steps.append(f"added column {column.name} to {column.table.name}")
+
+    pending = missing_indexes(engine)
+    if any(index.table is Vote.__table__ and index.unique for index in pending):
+        duplicates = count_duplicate_votes(engine)
+        if duplicates and not dedupe:
+            raise MigrationError(
+                f"{duplicates} repeat votes violate the one-vote-per-voter rule; "
+                "re-run with --dedupe to keep only each voter's first vote"
+            )
+        if duplicates:
+            with engine.begin() as conn:
+                conn.execute(text(DEDUPE_VOTES_SQL))
+            steps.append(f"deleted {duplicates} repeat votes")
+
+    for index in pending:
+        index.create(bind=engine, checkfirst=True)
+        steps.append(f"created index {index.name} on {index.table.name}")
+    return steps
+
+
+def empty_derived_tables() -> set:
+    """
+    Tally and rollup tables that are empty on a vote shard holding votes.
+
+    ``create_all`` adds them empty to a database from before they existed;
+    every vote written since updates them, so empty next to votes always
+    means they were never filled.
+    """
+    empty = set()
+    for shard in range(vote_shards.count):
+        votes_db = vote_shards.open_session(shard)
+        try:
+            if votes_db.query(Vote.id).first() is None:
+                continue
+            for model in (ContestantTally, VoteRollup):
+                if votes_db.query(model).first() is None:
+                    empty.add(model.__tablename__)
+        finally:
+            votes_db.close()
+    return empty
+
+
+def fill_derived_tables(db: Session) -> list:
+    """
+    Rebuild tallies and rollups from the votes where they were never filled.
+
+    Run at startup after ``upgrade`` and the shard tables, so a database
+    upgraded in place serves counts from its votes rather than from empty
+    tables. Returns a list of the steps applied.
+    """
+    from app.services.rollups import reconcile_rollups
+    from app.services.tallies import reconcile_tallies
+
+    empty = empty_derived_tables()
+    steps = []
+    if ContestantTally.__tablename__ in empty:
+        drift = reconcile_tallies(db)
+        steps.append(f"rebuilt {len(drift)} contestant tallies from votes")
+    if VoteRollup.__tablename__ in empty:
+        drift = reconcile_rollups(db)
+        steps.append(f"rebuilt rollups of {len(drift)} contests from votes")
+    return steps
@@ -0,0 +1,229 @@
+"""
+Read replicas of the primary database.
+
+READ_REPLICA_URLS lists read-only copies of DATABASE_URL: streaming
+replicas, or SQLite file copies for local testing. Routes named in
+READ_REPLICA_ROUTES take their session from ``read_db`` or
+``async_read_db``. These pick a replica round-robin or by fewest
+connections in use (READ_REPLICA_POLICY). Writes and all other routes
+stay on the primary.
+
+Lag is measured with a heartbeat. Every READ_REPLICA_CHECK_S each worker
+rewrites ReplicaHeartbeat on the primary and reads every replica's copy;
+the copy's age is the replica's lag, overstated by up to one check
+interval. Between checks, lag is assumed to grow with the clock. A
+replica is skipped once that bound passes READ_REPLICA_MAX_STALENESS_S or
+when it is unreachable. With no usable replica, reads go to the primary.
+
+Only the primary database is replicated. Votes of a contest on a vote
+shard are still read from the shard.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from app.core import config
+from app.core.metrics import instrument_engine
+from app.core.pool import engine_options, is_sqlite, tune_sqlite
+from app.database import AsyncSessionLocal, SessionLocal, engine, to_async_url
+from app.models import ReplicaHeartbeat
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_ID = 1
+REPLICA_POLICIES = ("round_robin", "least_loaded")
+
+
+class Replica:
+    def __init__(self, number: int, url: str):
+        self.name = f"replica{number}"
+        self.url = url
+        self.engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False} if is_sqlite(url) else {},
+            **engine_options(url)
+        )
+        tune_sqlite(self.engine)
+        instrument_engine(self.engine, self.name)
+        async_url = to_async_url(url)
+        self.async_engine = create_async_engine(async_url, **engine_options(async_url, is_async=True))
+        tune_sqlite(self.async_engine.sync_engine)
+        instrument_engine(self.async_engine.sync_engine, f"{self.name}_async")
+        self.session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.async_session = async_sessionmaker(
+            self.async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession
+        )
+        self.lag: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def in_use(self, is_async: bool) -> int:
+        pool = (self.async_engine.sync_engine if is_async else self.engine).pool
+        return pool.checkedout() if hasattr(pool, "checkedout") else 0
+
+
+class ReadReplicas:
+    def __init__(self, urls: List[str], policy: str, routes, max_staleness_s: float, check_interval_s: float):
+        if policy not in REPLICA_POLICIES:
+            raise ValueError(f"Invalid READ_REPLICA_POLICY '{policy}', expected one of {', '.join(REPLICA_POLICIES)}")
+        self.replicas = [Replica(number, url) for number, url in enumerate(urls, start=1)]
+        self.policy = policy
+        self.routes = frozenset(routes)
+        self.max_staleness = max_staleness_s
+        self.check_interval = check_interval_s
+        self._turn = itertools.count()
+        self._task = None
+        # route -> target ("primary" or a replica name) -> sessions handed out
+        self.reads = defaultdict(lambda: defaultdict(int))
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.replicas and not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def dispose(self):
+        for replica in self.replicas:
+            replica.engine.dispose()
+            await replica.async_engine.dispose()
+
+    def usable(self, now: float = None) -> List[Replica]:
+        """Replicas that cannot be further behind than the staleness limit, even if checks are running late"""
+        now = time.monotonic() if now is None else now
+        return [
+            replica for replica in self.replicas
+            if replica.lag is not None and replica.lag + (now - replica.checked_at) <= self.max_staleness
+        ]
+
+    def choose(self, route: str, is_async: bool) -> Optional[Replica]:
+        """Replica to serve a read on ``route``, or None for the primary"""
+        if route not in self.routes:
+            return None
+        usable = self.usable()
+        if not usable:
+            return None
+        # Rotate so round-robin turns and least-loaded ties spread evenly
+        turn = next(self._turn) % len(usable)
+        usable = usable[turn:] + usable[:turn]
+        if self.policy == "least_loaded":
+            return min(usable, key=lambda replica: replica.in_use(is_async))
+        return usable[0]
+
+    def session(self, route: str) -> Session:
+        replica = self.choose(route, is_async=False)
+        self.reads[route][replica.name if replica else "primary"] += 1
+        return (replica.session if replica else SessionLocal)()
+
+    def async_session(self, route: str) -> AsyncSession:
+        replica = self.choose(route, is_async=True)
+        self.reads[route][replica.name if replica else "primary"] += 1
+        return (replica.async_session if replica else AsyncSessionLocal)()
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self.check)
+            except Exception:
+                logger.exception("Replica lag check failed")
+            await asyncio.sleep(self.check_interval)
+
+    def check(self):
+        """Rewrite the heartbeat on the primary and measure each replica's lag"""
+        self.beat()
+        for replica in self.replicas:
+            self.measure(replica)
+
+    def beat(self):
+        now = datetime.utcnow()
+        try:
+            with engine.begin() as conn:
+                beat = update(ReplicaHeartbeat).where(ReplicaHeartbeat.id == HEARTBEAT_ID).values(beat_at=now)
+                if not conn.execute(beat).rowcount:
+                    conn.execute(insert(ReplicaHeartbeat).values(id=HEARTBEAT_ID, beat_at=now))
+        except IntegrityError:
+            # Another worker wrote the first heartbeat
+            pass
+
+    def measure(self, replica: Replica):
+        try:
+            with replica.engine.connect() as conn:
+                beat_at = conn.execute(
+                    select(ReplicaHeartbeat.beat_at).where(ReplicaHeartbeat.id == HEARTBEAT_ID)
+                ).scalar()
+            lag, error = (max((datetime.utcnow() - beat_at).total_seconds(), 0.0), None) if beat_at \
+                else (None, "no heartbeat yet")
+        except Exception as exc:
+            lag, error = None, str(exc).splitlines()[0]
+        if (error is None) != (replica.error is None):
+            if error:
+                logger.warning("Read replica %s unusable: %s", replica.name, error)
+            else:
+                logger.info("Read replica %s is back", replica.name)
+        replica.lag, replica.error, replica.checked_at = lag, error, time.monotonic()
+
+    def stats(self) -> dict:
+        usable = self.usable()
+        return {
+            "policy": self.policy,
+            "routes": sorted(self.routes),
+            "max_staleness_s": self.max_staleness,
+            "checking": self.running,
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "lag_s": round(replica.lag, 3) if replica.lag is not None else None,
+                    "checked_s_ago": round(time.monotonic() - replica.checked_at, 3) if replica.checked_at else None,
+                    "usable": replica in usable,
+                    "error": replica.error,
+                    "connections_in_use": replica.in_use(False) + replica.in_use(True)
+                }
+                for replica in self.replicas
+            ],
+            "reads": {route: dict(targets) for route, targets in self.reads.items()}
+        }
+
+
+read_replicas = ReadReplicas(
+    config.READ_REPLICA_URLS,
+    policy=config.READ_REPLICA_POLICY,
+    routes=config.READ_REPLICA_ROUTES,
+    max_staleness_s=config.READ_REPLICA_MAX_STALENESS_S,
+    check_interval_s=config.READ_REPLICA_CHECK_S
+)
+
+
+def read_db(route: str):
+    """Dependency for a read-only route: a session on a fresh replica, or on the primary"""
+    def get_read_db():
+        db = read_replicas.session(route)
+        try:
+            yield db
+        finally:
+            db.close()
+    return get_read_db
+
+
+def async_read_db(route: str):
+    """Async counterpart of ``read_db``"""
+    async def get_async_read_db():
+        async with read_replicas.async_session(route) as db:
+            yield db
+    return get_async_read_db
@@ -0,0 +1,151 @@
+"""
+Vote sharding by contest.
+
+Votes, contestant tallies, vote rollups and the Merkle log of a contest live on shard
+``Contest.shard``. Shard 0 is the primary database, which also holds
+contests, contestants and admins. VOTE_SHARD_URLS adds vote-only databases (shards 1..n). When
+any are configured, new contests are placed on them by contest id. A
+contest's shard is fixed when the contest is created, so adding shards
+later never moves existing votes. Vote ids are only unique within a
+shard; (contest_id, id) identifies a vote across the deployment.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterator, List
+
+from sqlalchemy import Column, Index, MetaData, Table, create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core import config
+from app.core.metrics import instrument_engine
+from app.core.pool import engine_options, is_sqlite, tune_sqlite
+from app.database import SessionLocal, AsyncSessionLocal, engine, async_engine, to_async_url
+from app.models import ContestantTally, MerkleBatch, MerkleLog, MerkleTile, Vote, VoteRollup
+
+PRIMARY_SHARD = 0
+
+
+def shard_metadata() -> MetaData:
+    """
+    The vote tables as created on a shard.
+
+    Same columns and indexes as the models, minus the foreign keys to
+    contests and contestants, which live on the primary.
+    """
+    metadata = MetaData()
+    for table in (
+        Vote.__table__, ContestantTally.__table__, VoteRollup.__table__,
+        MerkleLog.__table__, MerkleTile.__table__, MerkleBatch.__table__
+    ):
+        copy = Table(table.name, metadata, *(
+            Column(
+                column.name, column.type,
+                primary_key=column.primary_key,
+                nullable=column.nullable,
+                unique=column.unique,
+                autoincrement=column.autoincrement,
+                server_default=column.server_default.arg if column.server_default is not None else None
+            )
+            for column in table.columns
+        ))
+        for index in table.indexes:
+            Index(index.name, *(copy.c[column.name] for column in index.columns), unique=index.unique)
+    return metadata
+
+
+class VoteShards:
+    def __init__(self, urls: List[str]):
+        self.urls = list(urls)
+        self.engines = [engine]
+        self.async_engines = [async_engine]
+        self._sessions = [SessionLocal]
+        self._async_sessions = [AsyncSessionLocal]
+        for shard, url in enumerate(self.urls, start=1):
+            shard_engine = create_engine(
+                url,
+                connect_args={"check_same_thread": False} if is_sqlite(url) else {},
+                **engine_options(url)
+            )
+            tune_sqlite(shard_engine)
+            instrument_engine(shard_engine, f"shard{shard}")
+            async_url = to_async_url(url)
+            shard_async_engine = create_async_engine(async_url, **engine_options(async_url, is_async=True))
+            tune_sqlite(shard_async_engine.sync_engine)
+            instrument_engine(shard_async_engine.sync_engine, f"shard{shard}_async")
+            self.engines.append(shard_engine)
+            self.async_engines.append(shard_async_engine)
+            self._sessions.append(sessionmaker(autocommit=False, autoflush=False, bind=shard_engine))
+            self._async_sessions.append(async_sessionmaker(
+                shard_async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession
+            ))
+
+    @property
+    def count(self) -> int:
+        return len(self.engines)
+
+    def assign(self, contest_id: int) -> int:
+        """Shard for a newly created contest"""
+        if not self.urls:
+            return PRIMARY_SHARD
+        return 1 + contest_id % len(self.urls)
+
+    def open_session(self, shard: int) -> Session:
+        return self._sessions[shard]()
+
+    @contextmanager
+    def session(self, db: Session, shard: int) -> Iterator[Session]:
+        """
+        Session for the shard holding a contest's votes, given a primary session.
+
+        Yields ``db`` itself for the primary. Otherwise opens a session on the
+        shard of the same flavour: an async-backed one when ``db`` runs under
+        ``AsyncSession.run_sync``, so the hot path never blocks the event loop.
+        """
+        if shard == PRIMARY_SHARD:
+            yield db
+            return
+        if db.get_bind().dialect.is_async:
+            votes_db = self._async_sessions[shard]().sync_session
+        else:
+            votes_db = self.open_session(shard)
+        try:
+            yield votes_db
+        finally:
+            votes_db.close()
+
+    def fan_out(self, query: Callable[[Session], list], shards: List[int] = None) -> List[list]:
+        """Run ``query`` on every shard (or the given ones) in parallel and return the results in shard order"""
+        shards = list(range(self.count)) if shards is None else shards
+
+        def run(shard: int) -> list:
+            db = self.open_session(shard)
+            try:
+                return query(db)
+            finally:
+                db.close()
+
+        if len(shards) == 1:
+            return [run(shards[0])]
+        with ThreadPoolExecutor(len(shards)) as pool:
+            return list(pool.map(run, shards))
+
+    def create_tables(self):
+        """Create the vote tables, and columns and indexes added since, on every non-primary shard"""
+        from app.core.migrations import add_column, missing_columns
+
+        metadata = shard_metadata()
+        for shard_engine in self.engines[1:]:
+            metadata.create_all(bind=shard_engine)
+            for column in missing_columns(shard_engine, metadata):
+                add_column(shard_engine, column)
+            for table in metadata.tables.values():
+                for index in table.indexes:
+                    index.create(bind=shard_engine, checkfirst=True)
+
+    async def dispose(self):
+        for shard_async_engine in self.async_engines[1:]:
+            await shard_async_engine.dispose()
+
+
+vote_shards = VoteShards(config.VOTE_SHARD_URLS)
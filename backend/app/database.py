@@ -1,9 +1,13 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 
+from app.core.metrics import instrument_engine
+from app.core.pool import engine_options, tune_sqlite
+
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv(
@@ -13,11 +17,34 @@ SQLALCHEMY_DATABASE_URL = os.getenv(
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in SQLALCHEMY_DATABASE_URL else {}
+    connect_args={"check_same_thread": False} if "sqlite" in SQLALCHEMY_DATABASE_URL else {},
+    **engine_options(SQLALCHEMY_DATABASE_URL)
 )
+tune_sqlite(engine)
+instrument_engine(engine, "primary")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def to_async_url(url: str) -> str:
+    """Swap a database URL's driver for its asyncio counterpart"""
+    scheme, sep, rest = url.partition(":")
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if scheme.startswith("postgresql"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(SQLALCHEMY_DATABASE_URL)
+
+# Async engine for the hot vote/read paths; same database as `engine`
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+tune_sqlite(async_engine.sync_engine)
+instrument_engine(async_engine.sync_engine, "primary_async")
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession
+)
+
 Base = declarative_base()
 
 def get_db():
@@ -26,3 +53,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,19 +1,73 @@
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from app.core import config
+from app.core.metrics import RequestMetricsMiddleware
+from app.core.migrations import fill_derived_tables, upgrade
+from app.core.replicas import read_replicas
+from app.core.sharding import vote_shards
+from app.database import engine, async_engine, SessionLocal
 from app.models import Contest, Contestant, Vote, Admin
-from app.routes import contests, contestants, votes, admin
+from app.routes import contests, contestants, votes, admin, internal, metrics, photos
+from app.services.lifecycle import contest_lifecycle
+from app.services.live_results import results_broadcaster
+from app.services.merkle_log import merkle_appender
+from app.services.password_pool import password_pool
+from app.services.photos import photo_pipeline
+from app.services.rate_limit import VoteRateLimitMiddleware
+from app.services.vote_queue import vote_writer
+from app.services.voter_filter import voter_filters
 
-Base.metadata.create_all(bind=engine)
+# Creates missing tables and indexes; refuses to start if existing repeat
+# votes block the unique voter index (run `python -m app.cli migrate --dedupe`)
+upgrade(engine)
+vote_shards.create_tables()
+# Tally and rollup tables added to a database that already holds votes
+# start empty; fill them from the votes before serving counts
+with SessionLocal() as db:
+    fill_derived_tables(db)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.VOTE_INGEST_MODE == "queued":
+        vote_writer.start()
+    if config.LIFECYCLE_ENABLED:
+        contest_lifecycle.start()
+    if config.MERKLE_ENABLED:
+        merkle_appender.start()
+    if config.VOTER_FILTER_ENABLED:
+        voter_filters.start()
+    read_replicas.start()
+    photo_pipeline.start()
+    yield
+    await photo_pipeline.stop()
+    await read_replicas.stop()
+    await merkle_appender.stop()
+    await contest_lifecycle.stop()
+    await results_broadcaster.shutdown()
+    # Drain the write-behind queue so acknowledged votes are committed
+    vote_writer.stop()
+    voter_filters.stop()
+    await async_engine.dispose()
+    await vote_shards.dispose()
+    await read_replicas.dispose()
+    password_pool.shutdown()
 
 app = FastAPI(
     title="Yi-Vote API",
     description="Professional E-Voting System with Admin Portal",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
+# Added before CORS so CORS wraps it and 429s still carry CORS headers
+app.add_middleware(VoteRateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://localhost:5173", "http://localhost:5174"],
@@ -22,10 +76,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so request timings include the rate limiter and CORS
+app.add_middleware(RequestMetricsMiddleware)
+
 app.include_router(contests.router)
 app.include_router(contestants.router)
 app.include_router(votes.router)
 app.include_router(admin.router)
+app.include_router(internal.router)
+app.include_router(metrics.router)
+app.include_router(photos.router)
 
 @app.get("/")
 def read_root():
@@ -40,4 +100,18 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "database": "connected"}
+    """Round-trips a SELECT 1 to the primary database; 503 when it fails"""
+    started = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as exc:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unhealthy", "database": "unavailable", "error": type(exc).__name__}
+        )
+    return {
+        "status": "healthy",
+        "database": "connected",
+        "database_latency_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
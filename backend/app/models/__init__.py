@@ -3,5 +3,15 @@ from app.models.contest import Contest
 from app.models.contestant import Contestant
 from app.models.vote import Vote
 from app.models.admin import Admin
+from app.models.tally import ContestantTally
+from app.models.rollup import VoteRollup
+from app.models.result_snapshot import ContestResultSnapshot
+from app.models.merkle import MerkleLog, MerkleTile, MerkleBatch
+from app.models.replica_heartbeat import ReplicaHeartbeat
+from app.models.vote_archive import VoteArchive
+from app.models.photo import Photo
+from app.models.rejected_vote import RejectedVote
 
-__all__ = ["Base", "Contest", "Contestant", "Vote", "Admin"]
+__all__ = ["Base", "Contest", "Contestant", "Vote", "Admin", "ContestantTally", "VoteRollup", "ContestResultSnapshot",
+           "MerkleLog", "MerkleTile", "MerkleBatch", "ReplicaHeartbeat", "VoteArchive",
+           "Photo", "RejectedVote"]
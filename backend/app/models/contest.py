@@ -21,6 +21,11 @@ class Contest(Base):
     client_name = Column(String(100))
     status = Column(Enum(ContestStatus), default=ContestStatus.DRAFT)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped whenever the window, status or contestant list changes; votes
+    # are only inserted while the contest is at the version they checked
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Vote shard holding this contest's votes and tallies (0 is the primary)
+    shard = Column(Integer, nullable=False, default=0, server_default="0")
     
     contestants = relationship("Contestant", back_populates="contest", cascade="all, delete-orphan")
     votes = relationship("Vote", back_populates="contest", cascade="all, delete-orphan")
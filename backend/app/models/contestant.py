@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -12,8 +12,13 @@ class Contestant(Base):
     name = Column(String(200), nullable=False)
     bio = Column(Text)
     photo_url = Column(String(500))
+    # Set by photo uploads: the original's digest and, once rendered, the
+    # variant URLs served with contestants (see app.services.photos)
+    photo_digest = Column(String(64), ForeignKey("photos.digest"), index=True)
+    photo_variants = Column(JSON)
     region = Column(String(100))
     created_at = Column(DateTime, default=datetime.utcnow)
     
     contest = relationship("Contest", back_populates="contestants")
     votes = relationship("Vote", back_populates="contestant", cascade="all, delete-orphan")
+    tally = relationship("ContestantTally", back_populates="contestant", uselist=False, cascade="all, delete-orphan")
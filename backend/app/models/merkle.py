@@ -0,0 +1,47 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, LargeBinary, Text
+
+from app.database import Base
+
+class MerkleLog(Base):
+    """
+    Head of a contest's Merkle log of votes: size, root and, once sealed, the signed root.
+
+    Lives on the contest's vote shard, next to its votes. Leaves are the
+    contest's votes in the order they were appended, each recording its
+    leaf index in ``votes.merkle_index``; ``last_vote_id`` is the highest
+    vote id logged.
+    """
+    __tablename__ = "merkle_logs"
+    
+    contest_id = Column(Integer, ForeignKey("contests.id"), primary_key=True)
+    tree_size = Column(Integer, nullable=False, default=0)
+    last_vote_id = Column(Integer, nullable=False, default=0)
+    root_hash = Column(String(64), nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    sealed_at = Column(DateTime)
+    signed_root = Column(Text)
+    signature = Column(String(100))
+
+class MerkleTile(Base):
+    """
+    Up to 256 consecutive stored hashes of one tree level, packed 32 bytes each.
+
+    Tile level L holds the hashes of the perfect subtrees of height 8 * L,
+    so level 0 holds the leaf hashes and each full tile yields one hash on
+    the next level. Only the last tile of a level is ever partial.
+    """
+    __tablename__ = "merkle_tiles"
+    
+    contest_id = Column(Integer, ForeignKey("contests.id"), primary_key=True)
+    level = Column(Integer, primary_key=True, autoincrement=False)
+    tile_index = Column(Integer, primary_key=True, autoincrement=False)
+    hashes = Column(LargeBinary, nullable=False)
+
+class MerkleBatch(Base):
+    """One append to a Merkle log: leaves from ``first_index``, votes ``first_vote_id``..``last_vote_id`` in id order"""
+    __tablename__ = "merkle_batches"
+    
+    contest_id = Column(Integer, ForeignKey("contests.id"), primary_key=True)
+    first_index = Column(Integer, primary_key=True, autoincrement=False)
+    first_vote_id = Column(Integer, nullable=False)
+    last_vote_id = Column(Integer, nullable=False)
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, BigInteger
+from datetime import datetime
+
+from app.database import Base
+
+class Photo(Base):
+    """
+    An uploaded contestant photo, stored once per distinct file (keyed by its SHA-256).
+
+    ``status`` goes pending -> processing -> ready (or failed) as the photo
+    pipeline renders its variants; ``variants`` then maps each size name to
+    its width, height and file name per format.
+    """
+    __tablename__ = "photos"
+    
+    digest = Column(String(64), primary_key=True)
+    extension = Column(String(8), nullable=False)
+    content_type = Column(String(50), nullable=False)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    status = Column(String(16), nullable=False, default="pending", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    variants = Column(JSON)
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    claimed_at = Column(DateTime)
+    processed_at = Column(DateTime)
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from datetime import datetime
+
+from app.database import Base
+
+class RejectedVote(Base):
+    """
+    A queued vote that was acknowledged with 202 but refused when written.
+
+    Lives on the primary, keyed by the receipt's ``vote_hash`` so voters and
+    support can look it up (GET /api/votes/receipt/{contest_id}/{vote_hash}).
+    """
+    __tablename__ = "rejected_votes"
+    
+    vote_hash = Column(String(64), primary_key=True)
+    contest_id = Column(Integer, ForeignKey("contests.id"), nullable=False, index=True)
+    contestant_id = Column(Integer, nullable=False)
+    voter_identifier = Column(String(200), nullable=False)
+    vote_method = Column(String(20))
+    timestamp = Column(DateTime)
+    reason = Column(String(200), nullable=False)
+    rejected_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, DateTime
+
+from app.database import Base
+
+class ReplicaHeartbeat(Base):
+    """A timestamp the app rewrites on the primary; how old a replica's copy is measures its lag"""
+    __tablename__ = "replica_heartbeats"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    beat_at = Column(DateTime, nullable=False)
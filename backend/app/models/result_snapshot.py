@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Text
+from datetime import datetime
+
+from app.database import Base
+
+class ContestResultSnapshot(Base):
+    """Final results of a closed contest, frozen once so results reads stop touching the vote shards"""
+    __tablename__ = "contest_result_snapshots"
+    
+    contest_id = Column(Integer, ForeignKey("contests.id"), primary_key=True)
+    total_votes = Column(Integer, nullable=False)
+    # The VoteResults payload as served, in JSON
+    results = Column(Text, nullable=False)
+    frozen_at = Column(DateTime, nullable=False, default=datetime.utcnow)
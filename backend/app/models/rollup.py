@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+
+from app.database import Base
+
+class VoteRollup(Base):
+    """
+    Vote counts per time bucket, maintained in the same transaction as each vote insert.
+
+    One row per contest, granularity (minute, hour or day), bucket start,
+    contestant and vote method. Votes without a method are counted under "".
+    """
+    __tablename__ = "vote_rollups"
+
+    contest_id = Column(Integer, ForeignKey("contests.id"), primary_key=True)
+    granularity = Column(String(6), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    contestant_id = Column(Integer, ForeignKey("contestants.id"), primary_key=True)
+    vote_method = Column(String(20), primary_key=True)
+    vote_count = Column(Integer, nullable=False, default=0)
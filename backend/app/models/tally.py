@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy.orm import relationship
+
+from app.database import Base
+
+class ContestantTally(Base):
+    """Running vote count per contestant, updated in the same transaction as each vote insert"""
+    __tablename__ = "contestant_tallies"
+    
+    contestant_id = Column(Integer, ForeignKey("contestants.id"), primary_key=True)
+    contest_id = Column(Integer, ForeignKey("contests.id"), nullable=False, index=True)
+    vote_count = Column(Integer, nullable=False, default=0)
+    
+    contestant = relationship("Contestant", back_populates="tally")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -6,15 +6,25 @@ from app.database import Base
 
 class Vote(Base):
     __tablename__ = "votes"
+    __table_args__ = (
+        # One vote per voter per contest; also serves contest_id lookups as its leading column
+        Index("ix_votes_contest_voter", "contest_id", "voter_identifier", unique=True),
+        # Keyset pages of one contest's votes in id order (audit export)
+        Index("ix_votes_contest_id_id", "contest_id", "id"),
+        # Votes not in the contest's Merkle log yet (merkle_index IS NULL), and proofs' leaf lookups
+        Index("ix_votes_contest_merkle_index", "contest_id", "merkle_index"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     contest_id = Column(Integer, ForeignKey("contests.id"), nullable=False)
-    contestant_id = Column(Integer, ForeignKey("contestants.id"), nullable=False)
+    contestant_id = Column(Integer, ForeignKey("contestants.id"), nullable=False, index=True)
     voter_identifier = Column(String(200), nullable=False)
     vote_method = Column(String(20))
     vote_hash = Column(String(64), unique=True, nullable=False)
     ip_address = Column(String(45))
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    # Leaf index in the contest's Merkle log, set when the vote is appended
+    merkle_index = Column(Integer)
     
     contest = relationship("Contest", back_populates="votes")
     contestant = relationship("Contestant", back_populates="votes")
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, BigInteger
+from datetime import datetime
+
+from app.database import Base
+
+class VoteArchive(Base):
+    """
+    A closed contest's votes, moved out of the hot ``votes`` table into a file.
+
+    Lives on the primary; ``file_name`` and ``leaf_index_file`` (the
+    vote_hash -> Merkle leaf index table, when the contest has a log) are
+    relative to VOTE_ARCHIVE_DIR. Once
+    this row exists exports and proofs read the file, and ``purged_at`` is
+    set when the contest's rows are gone from its shard.
+    """
+    __tablename__ = "vote_archives"
+    
+    contest_id = Column(Integer, ForeignKey("contests.id"), primary_key=True)
+    format = Column(String(16), nullable=False)
+    file_name = Column(String(255), nullable=False)
+    leaf_index_file = Column(String(255))
+    vote_count = Column(Integer, nullable=False)
+    first_vote_id = Column(Integer)
+    last_vote_id = Column(Integer)
+    size_bytes = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    purged_at = Column(DateTime)
@@ -1,3 +1,3 @@
-from app.routes import contests, contestants, votes
+from app.routes import contests, contestants, votes, internal, metrics, photos
 
-__all__ = ["contests", "contestants", "votes"]
+__all__ = ["contests", "contestants", "votes", "internal", "metrics", "photos"]
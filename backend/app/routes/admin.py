@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import List
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models.admin import Admin
 from app.schemas.admin import (
     AdminLogin, 
@@ -12,9 +14,10 @@ from app.schemas.admin import (
     AdminResponse, 
     Token
 )
+from app.utils.pagination import ListParams, respond_page
 from app.utils.security import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
     get_current_active_admin,
     ACCESS_TOKEN_EXPIRE_MINUTES
@@ -23,9 +26,9 @@ from app.utils.security import (
 router = APIRouter(prefix="/api/admin", tags=["Admin Authentication"])
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     credentials: AdminLogin,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Admin login endpoint
@@ -33,9 +36,11 @@ def login(
     - **email**: Admin email address
     - **password**: Admin password
     
-    Returns JWT access token if credentials are valid
+    Returns JWT access token if credentials are valid. Password checks run
+    on a bounded worker pool; when it is saturated the login is refused
+    with 503 and Retry-After.
     """
-    admin = db.query(Admin).filter(Admin.email == credentials.email).first()
+    admin = await db.scalar(select(Admin).where(Admin.email == credentials.email))
     
     if not admin:
         raise HTTPException(
@@ -44,7 +49,7 @@ def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not verify_password(credentials.password, admin.hashed_password):
+    if not await verify_password_async(credentials.password, admin.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -58,7 +63,7 @@ def login(
         )
     
     admin.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -73,30 +78,30 @@ def login(
     }
 
 @router.post("/register", response_model=AdminResponse, status_code=201)
-def register_admin(
+async def register_admin(
     admin_data: AdminCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_admin: Admin = Depends(get_current_active_admin)
 ):
     """
     Register a new admin (requires authentication)
     Only existing admins can create new admin accounts
     """
-    existing_admin = db.query(Admin).filter(Admin.email == admin_data.email).first()
+    existing_admin = await db.scalar(select(Admin).where(Admin.email == admin_data.email))
     if existing_admin:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    existing_username = db.query(Admin).filter(Admin.username == admin_data.username).first()
+    existing_username = await db.scalar(select(Admin).where(Admin.username == admin_data.username))
     if existing_username:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already taken"
         )
     
-    hashed_password = get_password_hash(admin_data.password)
+    hashed_password = await get_password_hash_async(admin_data.password)
     new_admin = Admin(
         email=admin_data.email,
         username=admin_data.username,
@@ -106,8 +111,8 @@ def register_admin(
     )
     
     db.add(new_admin)
-    db.commit()
-    db.refresh(new_admin)
+    await db.commit()
+    await db.refresh(new_admin)
     
     return new_admin
 
@@ -122,32 +127,38 @@ def get_current_admin_info(
 
 @router.get("/list", response_model=List[AdminResponse])
 def list_admins(
+    request: Request,
+    params: ListParams = Depends(),
     db: Session = Depends(get_db),
     current_admin: Admin = Depends(get_current_active_admin)
 ):
     """
     List all admin users (requires authentication)
+
+    Supports paging with limit/cursor, sparse fields and include_total.
     """
+    if params.paged:
+        return respond_page(request, params, db, AdminResponse, Admin)
     admins = db.query(Admin).all()
     return admins
 
 @router.post("/setup-first-admin", response_model=AdminResponse, status_code=201)
-def setup_first_admin(
+async def setup_first_admin(
     admin_data: AdminCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create the first admin account (only works if no admins exist)
     This is a one-time setup endpoint
     """
-    admin_count = db.query(Admin).count()
+    admin_count = await db.scalar(select(func.count(Admin.id)))
     if admin_count > 0:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin accounts already exist. Use /register to create new admins."
         )
     
-    hashed_password = get_password_hash(admin_data.password)
+    hashed_password = await get_password_hash_async(admin_data.password)
     first_admin = Admin(
         email=admin_data.email,
         username=admin_data.username,
@@ -157,7 +168,7 @@ def setup_first_admin(
     )
     
     db.add(first_admin)
-    db.commit()
-    db.refresh(first_admin)
+    await db.commit()
+    await db.refresh(first_admin)
     
     return first_admin
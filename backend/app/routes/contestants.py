@@ -1,46 +1,95 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Request, Response, UploadFile
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
 from typing import List
 
-from app.database import get_db
-from app.models import Contestant, Contest, Vote
-from app.schemas import ContestantCreate, ContestantResponse
+from app.core import config
+from app.core.replicas import async_read_db
+from app.core.sharding import PRIMARY_SHARD, vote_shards
+from app.database import get_db, get_async_db
+from app.models import Contestant, Contest, ContestantTally
+from app.models.admin import Admin
+from app.schemas import ContestantCreate, ContestantResponse, PhotoUploadResponse
+from app.services.cache import response_cache
+from app.services.contest_registry import contest_registry
+from app.services.photo_render import check_pillow, probe
+from app.services.photos import attach_photo, photo_pipeline, store_original
+from app.services.results import contest_tallies
+from app.services.tallies import create_tally
+from app.utils.pagination import (
+    ListParams, count_query, page_query, page_response, selected_columns
+)
+from app.utils.security import get_current_active_admin
 
 router = APIRouter(prefix="/api/contestants", tags=["Contestants"])
 
+ContestantListAdapter = TypeAdapter(List[ContestantResponse])
+
 @router.get("/contest/{contest_id}", response_model=List[ContestantResponse])
-def get_contestants_by_contest(contest_id: int, db: Session = Depends(get_db)):
-    """Get all contestants for a specific contest with vote counts"""
-    
-    contest = db.query(Contest).filter(Contest.id == contest_id).first()
+async def get_contestants_by_contest(
+    contest_id: int,
+    request: Request,
+    params: ListParams = Depends(),
+    db: AsyncSession = Depends(async_read_db("contestants"))
+):
+    """
+    Get all contestants for a specific contest with vote counts
+
+    Supports paging with limit/cursor, sparse fields and include_total.
+    Vote counts are only read for the contestants on the page, and not at
+    all when vote_count is left out of ``fields``.
+    """
+    if params.paged:
+        return await db.run_sync(page_contestants, request, params, contest_id)
+    return await response_cache.respond_async(
+        request, f"contestants:{contest_id}", config.CACHE_TTL_CONTESTANTS, ContestantListAdapter,
+        lambda: db.run_sync(list_contestants, contest_id), trusted=True
+    )
+
+def contestants_query(db: Session, contest_id: int, fields: tuple):
+    """The contest (404 if missing) and a select of the requested contestant columns"""
+    contest = db.query(Contest.id, Contest.shard).filter(Contest.id == contest_id).first()
     if not contest:
         raise HTTPException(status_code=404, detail="Contest not found")
-    
-    contestants = db.query(
-        Contestant,
-        func.count(Vote.id).label("vote_count")
-    ).outerjoin(
-        Vote, Vote.contestant_id == Contestant.id
-    ).filter(
-        Contestant.contest_id == contest_id
-    ).group_by(Contestant.id).all()
-    
-    result = []
-    for contestant, vote_count in contestants:
-        contestant_dict = {
-            "id": contestant.id,
-            "name": contestant.name,
-            "bio": contestant.bio,
-            "photo_url": contestant.photo_url,
-            "region": contestant.region,
-            "contest_id": contestant.contest_id,
-            "created_at": contestant.created_at,
-            "vote_count": vote_count
-        }
-        result.append(contestant_dict)
-    
-    return result
+    return contest, select(*selected_columns(Contestant, fields)).where(Contestant.contest_id == contest_id)
+
+def contestant_dicts(rows: list, fields: tuple, tallies: dict) -> list:
+    """
+    Contestant rows as dicts with keys in ``fields`` order, vote counts from ``tallies``.
+
+    Keys follow the schema so the trusted (unvalidated) dump of a list is
+    byte-for-byte the validated one.
+    """
+    return [
+        {name: tallies.get(row.id, 0) if name == "vote_count" else getattr(row, name) for name in fields}
+        for row in rows
+    ]
+
+def with_vote_counts(db: Session, contest, rows: list, fields: tuple) -> list:
+    """Contestant rows as dicts, with their tallied vote counts when requested"""
+    if "vote_count" not in fields or not rows:
+        return [row._asdict() for row in rows]
+    return contestant_dicts(rows, fields, contest_tallies(db, contest, [row.id for row in rows]))
+
+def list_contestants(db: Session, contest_id: int) -> list:
+    """Contestants of a contest with their tallied vote counts"""
+    fields = tuple(ContestantResponse.model_fields)
+    contest, query = contestants_query(db, contest_id, fields)
+    rows = db.execute(query.order_by(Contestant.id)).all()
+    return contestant_dicts(rows, fields, contest_tallies(db, contest))
+
+def page_contestants(db: Session, request: Request, params: ListParams, contest_id: int) -> Response:
+    """One page of a contest's contestants"""
+    fields = params.selected(ContestantResponse)
+    contest, query = contestants_query(db, contest_id, fields)
+    rows = db.execute(page_query(query, Contestant.id, params)).all()
+    total = db.scalar(count_query(query)) if params.include_total else None
+    # The extra row only signals a next page; its votes are never read
+    page = with_vote_counts(db, contest, rows[:params.page_size], fields) + rows[params.page_size:]
+    return page_response(request, params, ContestantResponse, page, total)
 
 @router.post("/", response_model=ContestantResponse, status_code=201)
 def create_contestant(contestant: ContestantCreate, db: Session = Depends(get_db)):
@@ -51,8 +100,57 @@ def create_contestant(contestant: ContestantCreate, db: Session = Depends(get_db
         raise HTTPException(status_code=404, detail="Contest not found")
     
     db_contestant = Contestant(**contestant.model_dump())
+    if contest.shard == PRIMARY_SHARD:
+        db_contestant.tally = ContestantTally(contest_id=contestant.contest_id, vote_count=0)
     db.add(db_contestant)
+    contest.version = Contest.version + 1
     db.commit()
     db.refresh(db_contestant)
+    if contest.shard != PRIMARY_SHARD:
+        # The contestant needs its id before its tally can go to the shard
+        with vote_shards.session(db, contest.shard) as votes_db:
+            create_tally(votes_db, db_contestant.id, db_contestant.contest_id)
+            votes_db.commit()
+    contest_registry.invalidate(contestant.contest_id)
+    response_cache.invalidate(f"contestants:{contestant.contest_id}", f"results:{contestant.contest_id}")
     
     return {**db_contestant.__dict__, "vote_count": 0}
+
+@router.post("/{contestant_id}/photo", response_model=PhotoUploadResponse, status_code=202)
+async def upload_contestant_photo(
+    contestant_id: int,
+    response: Response,
+    file: UploadFile = File(..., description="JPEG, PNG or WebP image"),
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: Admin = Depends(get_current_active_admin)
+):
+    """
+    Upload a contestant's photo (requires authentication)
+
+    The original is stored and becomes ``photo_url`` at once. Resized WebP
+    and JPEG variants are rendered in the background and show up in the
+    contestant's ``photo_variants`` when ready (200 instead of 202 when
+    the same file was already rendered).
+    """
+    try:
+        check_pillow()
+    except RuntimeError as exc:
+        raise HTTPException(status_code=501, detail=str(exc))
+    if await db.get(Contestant, contestant_id) is None:
+        raise HTTPException(status_code=404, detail="Contestant not found")
+
+    data = await file.read(config.PHOTO_MAX_BYTES + 1)
+    if len(data) > config.PHOTO_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Photo is larger than {config.PHOTO_MAX_BYTES} bytes")
+    try:
+        info = await run_in_threadpool(probe, data)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    digest = await run_in_threadpool(store_original, data, info)
+    result = await db.run_sync(attach_photo, contestant_id, digest, info, len(data))
+    if result["status"] == "ready":
+        response.status_code = 200
+    else:
+        photo_pipeline.wake()
+    return result
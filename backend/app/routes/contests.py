@@ -1,34 +1,77 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 
+from app.core import config
+from app.core.replicas import async_read_db
+from app.core.sharding import vote_shards
 from app.database import get_db
 from app.models import Contest
+from app.models.contest import ContestStatus
 from app.schemas import ContestCreate, ContestResponse, ContestUpdate
+from app.services.cache import response_cache
+from app.services.contest_registry import contest_registry
+from app.services.lifecycle import contest_lifecycle
+from app.services.results import unfreeze_results
+from app.services.vote_archive import get_archive
+from app.utils.pagination import ListParams, respond_page_async
 
 router = APIRouter(prefix="/api/contests", tags=["Contests"])
 
+ContestAdapter = TypeAdapter(ContestResponse)
+ContestListAdapter = TypeAdapter(List[ContestResponse])
+
 @router.get("/", response_model=List[ContestResponse])
-def get_all_contests(db: Session = Depends(get_db)):
-    """Get all contests"""
-    contests = db.query(Contest).all()
-    return contests
+async def get_all_contests(
+    request: Request,
+    params: ListParams = Depends(),
+    db: AsyncSession = Depends(async_read_db("contests"))
+):
+    """
+    Get all contests
+
+    Supports paging with limit/cursor, sparse fields and include_total.
+    """
+    if params.paged:
+        return await respond_page_async(request, params, db, ContestResponse, Contest)
+    
+    async def load():
+        return (await db.scalars(select(Contest))).all()
+    
+    return await response_cache.respond_async(
+        request, "contests:all", config.CACHE_TTL_CONTESTS, ContestListAdapter, load
+    )
 
 @router.get("/{contest_id}", response_model=ContestResponse)
-def get_contest(contest_id: int, db: Session = Depends(get_db)):
+async def get_contest(
+    contest_id: int, request: Request, db: AsyncSession = Depends(async_read_db("contests"))
+):
     """Get a specific contest"""
-    contest = db.query(Contest).filter(Contest.id == contest_id).first()
-    if not contest:
-        raise HTTPException(status_code=404, detail="Contest not found")
-    return contest
+    async def load():
+        contest = await db.get(Contest, contest_id)
+        if not contest:
+            raise HTTPException(status_code=404, detail="Contest not found")
+        return contest
+    
+    return await response_cache.respond_async(
+        request, f"contest:{contest_id}", config.CACHE_TTL_CONTESTS, ContestAdapter, load
+    )
 
 @router.post("/", response_model=ContestResponse, status_code=201)
 def create_contest(contest: ContestCreate, db: Session = Depends(get_db)):
     """Create a new contest"""
     db_contest = Contest(**contest.model_dump())
     db.add(db_contest)
+    db.flush()
+    db_contest.shard = vote_shards.assign(db_contest.id)
     db.commit()
     db.refresh(db_contest)
+    contest_lifecycle.refresh()
+    contest_registry.invalidate(db_contest.id)
+    response_cache.invalidate("contests:all", "contests:active")
     return db_contest
 
 @router.put("/{contest_id}", response_model=ContestResponse)
@@ -38,22 +81,54 @@ def update_contest(contest_id: int, contest: ContestUpdate, db: Session = Depend
     if not db_contest:
         raise HTTPException(status_code=404, detail="Contest not found")
     
+    was_closed = db_contest.status == ContestStatus.CLOSED
     update_data = contest.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_contest, field, value)
+    db_contest.version = Contest.version + 1
+    if was_closed and db_contest.status != ContestStatus.CLOSED:
+        if get_archive(db, contest_id) is not None:
+            raise HTTPException(status_code=409, detail="Contest votes are archived; it cannot be reopened")
+        # Reopened: results are live again and re-frozen when it closes
+        unfreeze_results(db, contest_id)
     
     db.commit()
     db.refresh(db_contest)
+    contest_lifecycle.refresh()
+    contest_registry.invalidate(contest_id)
+    response_cache.invalidate(
+        "contests:all", "contests:active", f"contest:{contest_id}", f"results:{contest_id}"
+    )
     return db_contest
 
 @router.get("/active/list", response_model=List[ContestResponse])
-def get_active_contests(db: Session = Depends(get_db)):
-    """Get all active contests"""
+async def get_active_contests(
+    request: Request,
+    params: ListParams = Depends(),
+    db: AsyncSession = Depends(async_read_db("contests"))
+):
+    """
+    Get all active contests
+
+    Supports paging with limit/cursor, sparse fields and include_total.
+    The lifecycle scheduler keeps the set of open contests; without it
+    the status and dates are compared in SQL.
+    """
     from datetime import datetime
-    now = datetime.utcnow()
-    contests = db.query(Contest).filter(
-        Contest.status == "active",
-        Contest.start_date <= now,
-        Contest.end_date >= now
-    ).all()
-    return contests
+    
+    def running():
+        active_ids = contest_lifecycle.active_contest_ids()
+        if active_ids is not None:
+            return (Contest.id.in_(sorted(active_ids)),)
+        now = datetime.utcnow()
+        return (Contest.status == "active", Contest.start_date <= now, Contest.end_date >= now)
+    
+    if params.paged:
+        return await respond_page_async(request, params, db, ContestResponse, Contest, *running())
+    
+    async def load():
+        return (await db.scalars(select(Contest).filter(*running()))).all()
+    
+    return await response_cache.respond_async(
+        request, "contests:active", config.CACHE_TTL_CONTESTS, ContestListAdapter, load
+    )
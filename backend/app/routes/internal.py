@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends
+
+from app.core.pool import pool_status
+from app.core.replicas import read_replicas
+from app.core.sharding import PRIMARY_SHARD, vote_shards
+from app.database import engine, async_engine
+from app.models.admin import Admin
+from app.services.cache import response_cache
+from app.services.contest_registry import contest_registry
+from app.services.lifecycle import contest_lifecycle
+from app.services.merkle_log import merkle_appender
+from app.services.password_pool import password_pool
+from app.services.photos import photo_pipeline
+from app.services.principal_cache import principal_cache
+from app.services.rate_limit import rate_limiter
+from app.services.voter_filter import voter_filters
+from app.utils.security import get_current_active_admin
+
+router = APIRouter(prefix="/api/internal", tags=["Internal"])
+
+@router.get("/cache")
+def get_cache_stats(current_admin: Admin = Depends(get_current_active_admin)):
+    """Response cache hit/miss counters per endpoint, for tuning TTLs"""
+    return response_cache.stats()
+
+@router.get("/pool")
+def get_pool_stats(current_admin: Admin = Depends(get_current_active_admin)):
+    """Connection pool usage and checkout wait times for both engines, plus each extra vote shard"""
+    return {
+        "sync": pool_status(engine),
+        "async": pool_status(async_engine.sync_engine),
+        "shards": [
+            {"shard": shard, "sync": pool_status(shard_engine), "async": pool_status(shard_async_engine.sync_engine)}
+            for shard, (shard_engine, shard_async_engine)
+            in enumerate(zip(vote_shards.engines, vote_shards.async_engines))
+            if shard != PRIMARY_SHARD
+        ]
+    }
+
+@router.get("/replicas")
+def get_replica_stats(current_admin: Admin = Depends(get_current_active_admin)):
+    """Read replicas: measured lag, whether each is in use, and reads per route served by each database"""
+    return read_replicas.stats()
+
+@router.get("/contests")
+def get_contest_registry_stats(current_admin: Admin = Depends(get_current_active_admin)):
+    """Contest metadata registry size and hit rate"""
+    return contest_registry.stats()
+
+@router.get("/lifecycle")
+def get_lifecycle_stats(current_admin: Admin = Depends(get_current_active_admin)):
+    """Contest lifecycle scheduler: open contests and upcoming transitions"""
+    return contest_lifecycle.stats()
+
+@router.get("/merkle")
+def get_merkle_stats(current_admin: Admin = Depends(get_current_active_admin)):
+    """Merkle log appender: votes appended, logs sealed and append races lost"""
+    return merkle_appender.stats()
+
+@router.get("/voter-filters")
+def get_voter_filter_stats(current_admin: Admin = Depends(get_current_active_admin)):
+    """Duplicate-voter filters: check outcomes, and voters, memory and estimated false-positive rate per contest"""
+    return voter_filters.stats()
+
+@router.get("/photos")
+def get_photo_pipeline_stats(current_admin: Admin = Depends(get_current_active_admin)):
+    """Photo pipeline: renders in flight, rendered and failed, and photos by status"""
+    return photo_pipeline.stats()
+
+@router.get("/auth")
+def get_auth_cache_stats(current_admin: Admin = Depends(get_current_active_admin)):
+    """Admin principal cache hit rate and password worker pool usage"""
+    return {"principal_cache": principal_cache.stats(), "password_pool": password_pool.stats()}
+
+@router.get("/rate-limit")
+def get_rate_limit_stats(current_admin: Admin = Depends(get_current_active_admin)):
+    """Vote rate limiter decisions and store size"""
+    return rate_limiter.stats()
@@ -0,0 +1,107 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.core import config
+from app.core.metrics import metrics
+from app.core.replicas import read_replicas
+from app.core.sharding import PRIMARY_SHARD, vote_shards
+from app.services.cache import response_cache
+from app.services.live_results import results_broadcaster
+from app.services.password_pool import password_pool
+from app.services.photos import photo_pipeline
+from app.services.rate_limit import rate_limiter
+from app.services.vote_queue import vote_writer
+from app.services.voter_filter import voter_filters
+
+router = APIRouter(tags=["Monitoring"])
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def engine_names():
+    for shard, (shard_engine, shard_async_engine) in enumerate(zip(vote_shards.engines, vote_shards.async_engines)):
+        name = "primary" if shard == PRIMARY_SHARD else f"shard{shard}"
+        yield name, shard_engine
+        yield f"{name}_async", shard_async_engine.sync_engine
+    for replica in read_replicas.replicas:
+        yield replica.name, replica.engine
+        yield f"{replica.name}_async", replica.async_engine.sync_engine
+
+
+def pool_gauges() -> list:
+    samples = {"checked_out": [], "size": [], "overflow": [], "checkouts": [], "timeouts": [], "wait": []}
+    for name, engine in engine_names():
+        pool = engine.pool
+        labels = {"engine": name}
+        if hasattr(pool, "checkedout"):
+            samples["checked_out"].append((labels, pool.checkedout()))
+            samples["size"].append((labels, pool.size()))
+            samples["overflow"].append((labels, pool.overflow()))
+        wait_stats = getattr(pool, "wait_stats", None)
+        if wait_stats is not None:
+            snapshot = wait_stats.snapshot()
+            samples["checkouts"].append((labels, snapshot["checkouts"]))
+            samples["timeouts"].append((labels, snapshot["timeouts"]))
+            samples["wait"].append((labels, snapshot["wait_seconds_total"]))
+    return [
+        ("yivote_db_pool_checked_out", "gauge", "Connections in use", samples["checked_out"]),
+        ("yivote_db_pool_size", "gauge", "Configured pool size", samples["size"]),
+        ("yivote_db_pool_overflow", "gauge", "Connections open beyond the pool size", samples["overflow"]),
+        ("yivote_db_pool_checkouts_total", "counter", "Connections handed out", samples["checkouts"]),
+        ("yivote_db_pool_timeouts_total", "counter", "Checkouts that gave up waiting", samples["timeouts"]),
+        ("yivote_db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection", samples["wait"])
+    ]
+
+
+def service_gauges() -> list:
+    passwords = password_pool.stats()
+    limiter = rate_limiter.stats()
+    cache = response_cache.stats()["endpoints"]
+    filters = voter_filters.stats()
+    replicas = read_replicas.stats()
+    return [
+        ("yivote_vote_queue_depth", "gauge", "Votes waiting for the write-behind writer",
+         [({}, vote_writer.depth)]),
+        ("yivote_vote_queue_written_total", "counter", "Votes committed by the write-behind writer",
+         [({}, vote_writer.written)]),
+        ("yivote_vote_queue_spilled", "gauge", "Queued votes spilled to disk because their batch could not be written",
+         [({}, vote_writer.spilled)]),
+        ("yivote_vote_queue_rejected_total", "counter", "Queued votes refused when written, by reason (kept in rejected_votes)",
+         [({"reason": reason}, count) for reason, count in vote_writer.rejected.items()]),
+        ("yivote_password_pool_in_flight", "gauge", "Password hashes running or queued",
+         [({}, passwords["in_flight"])]),
+        ("yivote_password_pool_rejected_total", "counter", "Password hashes refused because the pool was full",
+         [({}, passwords["rejected"])]),
+        ("yivote_photo_renders_in_flight", "gauge", "Contestant photos being rendered by the photo workers",
+         [({}, photo_pipeline.in_flight)]),
+        ("yivote_photo_renders_total", "counter", "Contestant photo renders by outcome",
+         [({"result": "rendered"}, photo_pipeline.rendered), ({"result": "failed"}, photo_pipeline.failed)]),
+        ("yivote_live_results_subscribers", "gauge", "Open live results streams",
+         [({}, results_broadcaster.subscriber_count)]),
+        ("yivote_rate_limit_decisions_total", "counter", "Vote rate limiter decisions",
+         [({"decision": "allowed"}, limiter["allowed"]), ({"decision": "rejected"}, limiter["rejected"])]),
+        ("yivote_voter_filter_checks_total", "counter", "Duplicate-voter filter answers (new voters skip the lookup)",
+         [({"result": result}, count) for result, count in filters["checks"].items()]),
+        ("yivote_voter_filter_memory_bytes", "gauge", "Duplicate-voter filter bit arrays per contest",
+         [({"contest": str(contest_id)}, stats["memory_bytes"]) for contest_id, stats in filters["contests"].items()]),
+        ("yivote_read_replica_lag_seconds", "gauge", "Replica lag measured by the heartbeat (absent when unreachable)",
+         [({"replica": replica["name"]}, replica["lag_s"]) for replica in replicas["replicas"]
+          if replica["lag_s"] is not None]),
+        ("yivote_read_sessions_total", "counter", "Read-route sessions by route and database served from",
+         [({"route": route, "target": target}, count)
+          for route, targets in replicas["reads"].items() for target, count in targets.items()]),
+        ("yivote_response_cache_lookups_total", "counter", "Response cache lookups by endpoint",
+         [({"endpoint": endpoint, "result": result}, values[result])
+          for endpoint, values in cache.items() for result in ("hits", "misses")])
+    ]
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    """Request, SQL, pool and queue metrics in the Prometheus text format"""
+    if not config.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(
+        metrics.render([*pool_gauges(), *service_gauges()]),
+        media_type=PROMETHEUS_MEDIA_TYPE
+    )
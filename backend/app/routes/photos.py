@@ -0,0 +1,52 @@
+import os
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.core import config
+from app.services.photo_render import MEDIA_TYPES
+from app.services.photos import photo_file
+
+router = APIRouter(prefix="/api/photos", tags=["Photos"])
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses the weak comparison: W/ prefixes are ignored"""
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+@router.api_route(
+    "/{digest}/{file_name}",
+    methods=["GET", "HEAD"],
+    response_class=FileResponse,
+    responses={200: {"content": {media_type: {} for media_type in set(MEDIA_TYPES.values())}},
+               206: {"description": "The requested byte range"},
+               304: {"description": "Not modified (If-None-Match)"}}
+)
+async def get_photo(digest: str, file_name: str, request: Request):
+    """
+    Serve a contestant photo: an original or one of its variants
+
+    The bytes behind a URL never change, so responses carry a strong ETag
+    and immutable caching. Conditional (If-None-Match) and range requests,
+    including If-Range, are supported.
+    """
+    found = photo_file(digest, file_name)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    path, etag = found
+    try:
+        stat_result = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Photo not found")
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={config.PHOTO_CACHE_MAX_AGE_S}, immutable"
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        path, headers=headers, media_type=MEDIA_TYPES[file_name.rsplit(".", 1)[1]], stat_result=stat_result
+    )
@@ -1,105 +1,469 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import (
+    APIRouter, Depends, File, HTTPException, Query, Request, Response,
+    UploadFile, WebSocket, WebSocketDisconnect, status
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy import exists, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
+from typing import List, Literal, Optional
+import asyncio
+import heapq
+import io
+import itertools
 import hashlib
+import json
+import tempfile
 
-from app.database import get_db
-from app.models import Vote, Contest, Contestant
-from app.schemas import VoteCreate, VoteResponse, VoteResults, VoteResultItem
+from app.core import config
+from app.core.replicas import async_read_db
+from app.core.sharding import vote_shards
+from app.database import get_db, get_async_db, SessionLocal
+from app.models import Vote, Contest, RejectedVote
+from app.models.admin import Admin
+from app.schemas import (
+    VoteCreate, VoteResponse, VoteReceipt, VoteRecord, VoteResults, VoteResultItem, VoteAnalytics,
+    MerkleRoot, MerkleInclusionProof
+)
+from app.services.cache import response_cache
+from app.services.contest_registry import contest_registry, ContestEntry
+from app.services.live_results import results_broadcaster
+from app.services.merkle_log import inclusion_proof, merkle_root
+from app.services.results import build_vote_results, VoteResultsAdapter
+from app.services.rollups import build_vote_analytics, VoteAnalyticsAdapter
+from app.services.tallies import record_votes
+from app.services.vote_archive import ArchiveError, archive_leaf_index, check_archive, get_archive
+from app.services.vote_export import EXPORT_MEDIA_TYPES, check_export_format, export_votes
+from app.services.vote_import import VoteImporter, detect_format, read_rows
+from app.services.vote_queue import vote_writer, VoteQueueFull
+from app.services.voter_filter import voter_filters
+from app.utils.security import get_current_active_admin
 
 router = APIRouter(prefix="/api/votes", tags=["Votes"])
 
+# Inserts retried after the contest changed under the registry's entry
+STALE_CONTEST_RETRIES = 3
+
 @router.post("/", response_model=VoteResponse, status_code=201)
-def cast_vote(vote: VoteCreate, db: Session = Depends(get_db)):
-    """Cast a vote for a contestant"""
-    
-    contest = db.query(Contest).filter(Contest.id == vote.contest_id).first()
-    if not contest:
-        raise HTTPException(status_code=404, detail="Contest not found")
-    
+async def cast_vote(vote: VoteCreate, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """
+    Cast a vote for a contestant
+
+    In queued ingestion mode the vote is acknowledged with 202 once it is
+    accepted by the background writer, and committed with the next batch;
+    GET /receipt/{contest_id}/{vote_hash} tells whether it was recorded.
+    """
+    return await db.run_sync(record_vote, vote, response)
+
+def vote_rejected(error: str) -> HTTPException:
+    return HTTPException(status_code=404 if error.endswith("not found") else 400, detail=error)
+
+def guarded_vote_insert(row: dict, version: int):
+    """INSERT ... SELECT that only writes the vote while the contest is at ``version``"""
+    columns = Vote.__table__.c
+    values = select(*(literal(value, columns[name].type) for name, value in row.items())).where(
+        exists().where(Contest.id == row["contest_id"], Contest.version == version)
+    )
+    return insert(Vote).from_select(list(row), values).returning(Vote.id)
+
+def insert_vote(db: Session, votes_db: Session, row: dict, contest: ContestEntry) -> int:
+    """
+    Insert a validated vote and return its id.
+
+    One vote per voter per contest is enforced by the unique index on
+    (contest_id, voter_identifier): a conflict is reported as a repeat vote.
+    The insert only goes through while the contest is at the version the
+    registry validated against, so a contest changed by another worker is
+    re-read and the vote validated again instead of trusting a stale entry.
+    """
+    for _ in range(STALE_CONTEST_RETRIES):
+        try:
+            if votes_db is db:
+                vote_id = db.execute(guarded_vote_insert(row, contest.version)).scalar()
+            elif db.query(Contest.version).filter(Contest.id == contest.contest_id).scalar() == contest.version:
+                # The contests table is on the primary, so the stamp is read
+                # there just before the shard insert. Always touching the
+                # primary before the shard keeps connection waits acyclic.
+                vote_id = votes_db.execute(insert(Vote).values(row).returning(Vote.id)).scalar()
+            else:
+                vote_id = None
+        except IntegrityError:
+            votes_db.rollback()
+            raise HTTPException(status_code=400, detail="You have already voted in this contest")
+        if vote_id is not None:
+            return vote_id
+        contest_registry.invalidate(contest.contest_id)
+        contest, error = contest_registry.validate(db, row["contest_id"], row["contestant_id"], row["timestamp"])
+        if error:
+            raise vote_rejected(error)
+    raise HTTPException(status_code=409, detail="Contest was updated while voting, please retry")
+
+def record_vote(db: Session, vote: VoteCreate, response: Response) -> dict:
+    """
+    Validate and store a single vote
+
+    Written against the sync Session API; the async route runs it on the
+    async connection through ``AsyncSession.run_sync``.
+    """
     now = datetime.utcnow()
-    if now < contest.start_date:
-        raise HTTPException(status_code=400, detail="Contest has not started yet")
-    if now > contest.end_date:
-        raise HTTPException(status_code=400, detail="Contest has ended")
-    if contest.status != "active":
-        raise HTTPException(status_code=400, detail="Contest is not active")
-    
-    contestant = db.query(Contestant).filter(
-        Contestant.id == vote.contestant_id,
-        Contestant.contest_id == vote.contest_id
-    ).first()
-    if not contestant:
-        raise HTTPException(status_code=404, detail="Contestant not found")
-    
-    existing_vote = db.query(Vote).filter(
-        Vote.contest_id == vote.contest_id,
-        Vote.voter_identifier == vote.voter_identifier
-    ).first()
-    if existing_vote:
-        raise HTTPException(status_code=400, detail="You have already voted in this contest")
+    contest, error = contest_registry.validate(db, vote.contest_id, vote.contestant_id, now)
+    if error:
+        raise vote_rejected(error)
     
     hash_string = f"{vote.contest_id}{vote.contestant_id}{vote.voter_identifier}{datetime.utcnow()}"
     vote_hash = hashlib.sha256(hash_string.encode()).hexdigest()
     
-    db_vote = Vote(
-        contest_id=vote.contest_id,
-        contestant_id=vote.contestant_id,
-        voter_identifier=vote.voter_identifier,
-        vote_method=vote.vote_method,
-        vote_hash=vote_hash,
-        ip_address=vote.ip_address
-    )
+    row = {
+        "contest_id": vote.contest_id,
+        "contestant_id": vote.contestant_id,
+        "voter_identifier": vote.voter_identifier,
+        "vote_method": vote.vote_method,
+        "vote_hash": vote_hash,
+        "ip_address": vote.ip_address,
+        "timestamp": now
+    }
     
-    db.add(db_vote)
-    db.commit()
-    db.refresh(db_vote)
+    with vote_shards.session(db, contest.shard) as votes_db:
+        # Queued votes are acknowledged before they reach the unique index, so
+        # duplicates against committed votes are always checked up front (the
+        # filter only knows other workers' votes after a delay). Direct writes
+        # insert and let the index catch repeats; only a voter the filter has
+        # probably seen is looked up first, rather than failing an insert
+        # under the write lock.
+        if vote_writer.running or voter_filters.check(vote.contest_id, vote.voter_identifier) is True:
+            existing_vote = votes_db.query(Vote.id).filter(
+                Vote.contest_id == vote.contest_id,
+                Vote.voter_identifier == vote.voter_identifier
+            ).first()
+            if existing_vote:
+                raise HTTPException(status_code=400, detail="You have already voted in this contest")
+        if vote_writer.running:
+            return enqueue_vote(row, response, contest)
+        
+        vote_id = insert_vote(db, votes_db, row, contest)
+        record_votes(votes_db, [row])
+        votes_db.commit()
+    response_cache.invalidate(f"results:{vote.contest_id}", f"contestants:{vote.contest_id}")
     
     return {
-        "id": db_vote.id,
-        "contest_id": db_vote.contest_id,
-        "contestant_id": db_vote.contestant_id,
-        "vote_hash": db_vote.vote_hash,
-        "timestamp": db_vote.timestamp,
+        "id": vote_id,
+        "contest_id": vote.contest_id,
+        "contestant_id": vote.contestant_id,
+        "vote_hash": vote_hash,
+        "timestamp": now,
         "message": "Vote recorded successfully!"
     }
 
+@router.post(
+    "/import",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}, "description": "Import summary line followed by one line per rejected row"}}
+)
+def import_votes(
+    file: UploadFile = File(..., description="CSV or NDJSON file of votes"),
+    format: Optional[str] = Query(None, description="csv or ndjson (default: from file extension)"),
+    default_method: str = Query("sms", description="vote_method for rows that do not set one"),
+    batch_size: int = Query(5000, ge=100, le=50000),
+    current_admin: Admin = Depends(get_current_active_admin)
+):
+    """
+    Bulk import votes from a carrier or offline batch (requires authentication)
+
+    Each row needs contest_id, contestant_id and voter_identifier, and may set
+    vote_method, ip_address and an ISO timestamp. Rows get the same checks as
+    a single vote. The response is NDJSON: a summary line, then one
+    {"line", "error"} line per rejected row.
+    """
+    try:
+        fmt = detect_format(file.filename, format)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    # Rejections spill to disk so the report stays out of memory for huge files
+    report = tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode="w+")
+    db = SessionLocal()
+    try:
+        importer = VoteImporter(db, batch_size=batch_size, default_method=default_method)
+        rows = read_rows(io.TextIOWrapper(file.file, encoding="utf-8-sig", newline=""), fmt)
+        for rejection in importer.run(rows):
+            report.write(json.dumps(rejection) + "\n")
+    finally:
+        db.close()
+    report.seek(0)
+    
+    def report_lines():
+        try:
+            yield json.dumps({"summary": importer.summary()}) + "\n"
+            yield from report
+        finally:
+            report.close()
+    
+    return StreamingResponse(report_lines(), media_type="application/x-ndjson")
+
+def enqueue_vote(row: dict, response: Response, contest: ContestEntry):
+    """Hand a validated vote to the write-behind queue"""
+    try:
+        accepted = vote_writer.submit(row, contest.version, contest.shard)
+    except VoteQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Vote queue is full, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    if not accepted:
+        raise HTTPException(status_code=400, detail="You have already voted in this contest")
+    
+    response.status_code = 202
+    return {
+        "id": None,
+        "contest_id": row["contest_id"],
+        "contestant_id": row["contestant_id"],
+        "vote_hash": row["vote_hash"],
+        "timestamp": row["timestamp"],
+        "message": "Vote accepted and queued for recording!"
+    }
+
+@router.get("/", response_model=List[VoteRecord])
+def list_votes(
+    contest_id: Optional[int] = Query(None),
+    voter_identifier: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_active_admin)
+):
+    """
+    List the most recent votes, newest first (requires authentication)
+
+    Without a contest filter every vote shard is queried in parallel and
+    the results are merged.
+    """
+    shards = None
+    if contest_id is not None:
+        shard = contest_registry.shard_of(db, contest_id)
+        if shard is None:
+            raise HTTPException(status_code=404, detail="Contest not found")
+        shards = [shard]
+    
+    def recent_votes(votes_db: Session) -> list:
+        query = votes_db.query(Vote)
+        if contest_id is not None:
+            query = query.filter(Vote.contest_id == contest_id)
+        if voter_identifier is not None:
+            query = query.filter(Vote.voter_identifier == voter_identifier)
+        return query.order_by(Vote.timestamp.desc(), Vote.id.desc()).limit(limit).all()
+    
+    per_shard = vote_shards.fan_out(recent_votes, shards)
+    merged = heapq.merge(*per_shard, key=lambda vote: (vote.timestamp, vote.id), reverse=True)
+    return list(itertools.islice(merged, limit))
+
+@router.get(
+    "/export/{contest_id}",
+    response_class=StreamingResponse,
+    responses={200: {"content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()},
+                     "description": "Every vote of the contest, oldest first"}}
+)
+def export_contest_votes(
+    contest_id: int,
+    format: str = Query("csv", description="csv, ndjson or parquet (needs pyarrow)"),
+    since: Optional[datetime] = Query(None, description="Only votes cast at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only votes cast before this time"),
+    vote_method: Optional[str] = Query(None),
+    page_size: int = Query(10000, ge=100, le=100000),
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_active_admin)
+):
+    """
+    Export a contest's raw votes for audit (requires authentication)
+
+    Rows are read in id order a page at a time and streamed as they are
+    encoded, so exports of any size run in constant memory. Archived
+    contests are read from their archive file.
+    """
+    try:
+        check_export_format(format)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except RuntimeError as exc:
+        raise HTTPException(status_code=501, detail=str(exc))
+
+    shard = contest_registry.shard_of(db, contest_id)
+    if shard is None:
+        raise HTTPException(status_code=404, detail="Contest not found")
+    archive = get_archive(db, contest_id)
+    if archive is not None:
+        try:
+            check_archive(archive)
+        except ArchiveError as exc:
+            raise HTTPException(status_code=503, detail=str(exc))
+
+    chunks = export_votes(
+        format, shard, contest_id, archive=archive,
+        since=since, until=until, vote_method=vote_method, page_size=page_size
+    )
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="contest-{contest_id}-votes.{format}"'}
+    )
+
 @router.get("/results/{contest_id}", response_model=VoteResults)
-def get_vote_results(contest_id: int, db: Session = Depends(get_db)):
+async def get_vote_results(
+    contest_id: int, request: Request, db: AsyncSession = Depends(async_read_db("results"))
+):
     """Get voting results for a contest"""
-    
-    contest = db.query(Contest).filter(Contest.id == contest_id).first()
+    return await response_cache.respond_async(
+        request, f"results:{contest_id}", config.CACHE_TTL_RESULTS, VoteResultsAdapter,
+        lambda: db.run_sync(build_vote_results, contest_id), trusted=True
+    )
+
+@router.get("/merkle/{contest_id}/root", response_model=MerkleRoot)
+def get_merkle_root(contest_id: int, db: Session = Depends(get_db)):
+    """
+    Current root of a contest's vote log
+
+    Votes join the log a few seconds after they are cast. Once a closed
+    contest's results are final, the root is sealed and, when a signing key
+    is configured, signed with Ed25519 over ``signed_root.statement``.
+    """
+    return merkle_root(db, contest_id)
+
+@router.get("/merkle/{contest_id}/proof/{vote_hash}", response_model=MerkleInclusionProof)
+def get_merkle_proof(contest_id: int, vote_hash: str, db: Session = Depends(get_db)):
+    """
+    Inclusion proof for a vote receipt's hash (RFC 6962 audit path)
+
+    Hash the leaf as SHA-256(0x00 || bytes.fromhex(vote_hash)) and fold in
+    ``proof`` from the leaf up, with SHA-256(0x01 || left || right), to
+    arrive at ``root_hash``.
+    """
+    return inclusion_proof(db, contest_id, vote_hash)
+
+@router.get("/receipt/{contest_id}/{vote_hash}", response_model=VoteReceipt)
+def get_vote_receipt(contest_id: int, vote_hash: str, db: Session = Depends(get_db)):
+    """
+    What became of a vote receipt: recorded, rejected or still pending
+
+    Queued votes are acknowledged before they are written; one refused at
+    write time (contest closed or changed meanwhile, or an earlier vote by
+    the same voter) is reported as rejected with the reason. Pending means
+    it has not been written yet, or the hash is unknown.
+    """
+    shard = contest_registry.shard_of(db, contest_id)
+    if shard is None:
+        raise HTTPException(status_code=404, detail="Contest not found")
+    receipt = {"contest_id": contest_id, "vote_hash": vote_hash, "status": "pending"}
+
+    rejected = db.get(RejectedVote, vote_hash)
+    if rejected is not None and rejected.contest_id == contest_id:
+        return {**receipt, "status": "rejected", "reason": rejected.reason, "rejected_at": rejected.rejected_at}
+
+    archive = get_archive(db, contest_id)
+    if archive is not None and archive.purged_at is not None:
+        try:
+            recorded = archive_leaf_index(archive, vote_hash) is not None
+        except ArchiveError as exc:
+            raise HTTPException(status_code=503, detail=str(exc))
+        return {**receipt, "status": "recorded"} if recorded else receipt
+
+    with vote_shards.session(db, shard) as votes_db:
+        vote_id = votes_db.query(Vote.id).filter(
+            Vote.vote_hash == vote_hash, Vote.contest_id == contest_id
+        ).scalar()
+    return {**receipt, "status": "recorded", "vote_id": vote_id} if vote_id is not None else receipt
+
+@router.get("/analytics/{contest_id}", response_model=VoteAnalytics)
+async def get_vote_analytics(
+    contest_id: int,
+    request: Request,
+    granularity: Literal["minute", "hour", "day"] = Query("minute"),
+    since: Optional[datetime] = Query(None, description="Start of the range, rounded down to its bucket"),
+    until: Optional[datetime] = Query(None, description="Buckets starting at or after this time are left out"),
+    group_by: Optional[Literal["vote_method", "region", "contestant"]] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Votes per minute, hour or day, optionally broken down by channel, region or contestant
+
+    Answered from the rollup tables maintained with every vote, so the cost
+    depends on the number of buckets in range, not the number of votes.
+    """
+    key = f"analytics:{contest_id}:{granularity}:{group_by}:{since and since.isoformat()}:{until and until.isoformat()}"
+    return await response_cache.respond_async(
+        request, key, config.CACHE_TTL_ANALYTICS, VoteAnalyticsAdapter,
+        lambda: db.run_sync(
+            build_vote_analytics, contest_id,
+            granularity=granularity, since=since, until=until, group_by=group_by
+        )
+    )
+
+@router.get(
+    "/results/{contest_id}/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}, "description": "Server-sent `results` events carrying a VoteResults payload"}}
+)
+def stream_vote_results(contest_id: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Live results as server-sent events
+
+    Emits a `results` event with the same payload as GET /results/{contest_id}
+    whenever the tallies change (at most once per aggregation tick).
+    """
+    contest = db.query(Contest.id).filter(Contest.id == contest_id).first()
     if not contest:
         raise HTTPException(status_code=404, detail="Contest not found")
     
-    results = db.query(
-        Contestant.id,
-        Contestant.name,
-        func.count(Vote.id).label("vote_count")
-    ).outerjoin(
-        Vote, Vote.contestant_id == Contestant.id
-    ).filter(
-        Contestant.contest_id == contest_id
-    ).group_by(Contestant.id, Contestant.name).all()
+    async def event_stream():
+        async with results_broadcaster.subscribe(contest_id) as subscription:
+            while True:
+                try:
+                    payload = await subscription.get(timeout=config.LIVE_RESULTS_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: results\ndata: {payload}\n\n"
     
-    total_votes = sum(result.vote_count for result in results)
-    
-    result_items = []
-    for result in results:
-        percentage = (result.vote_count / total_votes * 100) if total_votes > 0 else 0
-        result_items.append({
-            "contestant_id": result.id,
-            "contestant_name": result.name,
-            "vote_count": result.vote_count,
-            "percentage": round(percentage, 2)
-        })
-    
-    result_items.sort(key=lambda x: x["vote_count"], reverse=True)
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def contest_exists(contest_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        return db.query(Contest.id).filter(Contest.id == contest_id).first() is not None
+    finally:
+        db.close()
+
+@router.websocket("/results/{contest_id}/ws")
+async def stream_vote_results_ws(websocket: WebSocket, contest_id: int):
+    """Live results over a WebSocket, one VoteResults JSON message per change"""
+    if not await run_in_threadpool(contest_exists, contest_id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Contest not found")
+        return
     
-    return {
-        "contest_id": contest_id,
-        "contest_name": contest.name,
-        "total_votes": total_votes,
-        "results": result_items
-    }
+    await websocket.accept()
+    async with results_broadcaster.subscribe(contest_id) as subscription:
+        receiver = asyncio.create_task(websocket.receive())
+        try:
+            while True:
+                update = asyncio.create_task(subscription.get())
+                done, _ = await asyncio.wait({update, receiver}, return_when=asyncio.FIRST_COMPLETED)
+                if receiver in done:
+                    if receiver.result()["type"] == "websocket.disconnect":
+                        update.cancel()
+                        break
+                    receiver = asyncio.create_task(websocket.receive())
+                if update in done:
+                    await websocket.send_text(update.result())
+                else:
+                    update.cancel()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            receiver.cancel()
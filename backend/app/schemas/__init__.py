@@ -1,6 +1,9 @@
 from app.schemas.contest import ContestCreate, ContestUpdate, ContestResponse
-from app.schemas.contestant import ContestantCreate, ContestantResponse
-from app.schemas.vote import VoteCreate, VoteResponse, VoteResults, VoteResultItem
+from app.schemas.contestant import ContestantCreate, ContestantResponse, PhotoVariant, PhotoUploadResponse
+from app.schemas.vote import (
+    VoteCreate, VoteResponse, VoteReceipt, VoteRecord, VoteResults, VoteResultItem,
+    VoteAnalytics, VoteAnalyticsPoint, MerkleRoot, SignedMerkleRoot, MerkleInclusionProof
+)
 from app.schemas.admin import AdminLogin, AdminCreate, AdminResponse, Token
 
 __all__ = [
@@ -9,10 +12,19 @@ __all__ = [
     "ContestResponse",
     "ContestantCreate",
     "ContestantResponse",
+    "PhotoVariant",
+    "PhotoUploadResponse",
     "VoteCreate",
     "VoteResponse",
+    "VoteReceipt",
+    "VoteRecord",
     "VoteResults",
     "VoteResultItem",
+    "VoteAnalytics",
+    "VoteAnalyticsPoint",
+    "MerkleRoot",
+    "SignedMerkleRoot",
+    "MerkleInclusionProof",
     "AdminLogin",
     "AdminCreate",
     "AdminResponse",
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
 class ContestantBase(BaseModel):
@@ -11,11 +11,27 @@ class ContestantBase(BaseModel):
 class ContestantCreate(ContestantBase):
     contest_id: int
 
+class PhotoVariant(BaseModel):
+    """One size of a contestant photo, with a URL per rendered format"""
+    width: int
+    height: int
+    webp: Optional[str] = None
+    jpeg: Optional[str] = None
+
 class ContestantResponse(ContestantBase):
     id: int
     contest_id: int
     created_at: datetime
     vote_count: Optional[int] = 0
+    # Size name ("thumb", "card", ...) -> variant, once an uploaded photo is rendered
+    photo_variants: Optional[Dict[str, PhotoVariant]] = None
     
     class Config:
         from_attributes = True
+
+class PhotoUploadResponse(BaseModel):
+    contestant_id: int
+    digest: str
+    status: str
+    photo_url: str
+    photo_variants: Optional[Dict[str, PhotoVariant]] = None
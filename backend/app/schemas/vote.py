@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Literal, Optional
 from datetime import datetime
 
 class VoteCreate(BaseModel):
@@ -10,7 +10,7 @@ class VoteCreate(BaseModel):
     ip_address: Optional[str] = None
 
 class VoteResponse(BaseModel):
-    id: int
+    id: Optional[int] = None
     contest_id: int
     contestant_id: int
     vote_hash: str
@@ -20,6 +20,27 @@ class VoteResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class VoteReceipt(BaseModel):
+    contest_id: int
+    vote_hash: str
+    status: Literal["recorded", "rejected", "pending"]
+    vote_id: Optional[int] = None
+    reason: Optional[str] = None
+    rejected_at: Optional[datetime] = None
+
+class VoteRecord(BaseModel):
+    id: int
+    contest_id: int
+    contestant_id: int
+    voter_identifier: str
+    vote_method: Optional[str] = None
+    vote_hash: str
+    ip_address: Optional[str] = None
+    timestamp: datetime
+    
+    class Config:
+        from_attributes = True
+
 class VoteResultItem(BaseModel):
     contestant_id: int
     contestant_name: str
@@ -31,3 +52,38 @@ class VoteResults(BaseModel):
     contest_name: str
     total_votes: int
     results: list[VoteResultItem]
+
+class VoteAnalyticsPoint(BaseModel):
+    bucket_start: datetime
+    group: Optional[str] = None
+    vote_count: int
+
+class VoteAnalytics(BaseModel):
+    contest_id: int
+    granularity: Literal["minute", "hour", "day"]
+    group_by: Optional[Literal["vote_method", "region", "contestant"]] = None
+    total_votes: int
+    series: list[VoteAnalyticsPoint]
+
+class SignedMerkleRoot(BaseModel):
+    statement: str
+    signature: str
+    algorithm: Literal["Ed25519"]
+    public_key: str
+
+class MerkleRoot(BaseModel):
+    contest_id: int
+    tree_size: int
+    root_hash: str
+    updated_at: Optional[datetime] = None
+    sealed: bool
+    signed_root: Optional[SignedMerkleRoot] = None
+
+class MerkleInclusionProof(BaseModel):
+    contest_id: int
+    vote_hash: str
+    leaf_index: int
+    leaf_hash: str
+    tree_size: int
+    root_hash: str
+    proof: list[str]
@@ -0,0 +1,211 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from app.core import config
+from app.utils.serialization import dump_response
+
+# A cached entry is the serialized JSON body together with its ETag
+CacheEntry = Tuple[str, bytes]
+
+
+class CacheBackend:
+    """Storage interface for the response cache"""
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        raise NotImplementedError
+
+    def set(self, key: str, entry: CacheEntry, ttl: float):
+        raise NotImplementedError
+
+    def delete(self, *keys: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class NullCache(CacheBackend):
+    """Backend that never stores anything (caching disabled)"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, entry, ttl):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU with a per-entry TTL"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            entry, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, ttl):
+        with self._lock:
+            self._entries[key] = (entry, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache(CacheBackend):
+    """
+    Backend for any Redis-compatible server (Redis, KeyDB, Valkey, ...).
+
+    Shared between workers, so an invalidation in one process is seen by all.
+    Needs the optional ``redis`` package unless a client is passed in.
+    """
+
+    def __init__(self, url: str = None, client=None, prefix: str = "yivote:cache:"):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+            client = redis.Redis.from_url(url)
+        self._client = client
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        if raw is None:
+            return None
+        etag, _, body = raw.partition(b"\n")
+        return etag.decode(), body
+
+    def set(self, key, entry, ttl):
+        etag, body = entry
+        self._client.set(self._prefix + key, etag.encode() + b"\n" + body, px=max(int(ttl * 1000), 1))
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*(self._prefix + key for key in keys))
+
+    def clear(self):
+        keys = list(self._client.scan_iter(match=self._prefix + "*"))
+        if keys:
+            self._client.delete(*keys)
+
+
+class ResponseCache:
+    """
+    JSON response cache with ETag revalidation and hit/miss metrics.
+
+    Keys are namespaced as ``<namespace>:<id>`` (e.g. ``results:12``);
+    metrics are aggregated per namespace.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0})
+        self._lock = threading.Lock()
+
+    def _count(self, key: str, metric: str, amount: int = 1):
+        with self._lock:
+            self._stats[key.split(":", 1)[0]][metric] += amount
+
+    def respond(
+        self, request: Request, key: str, ttl: float, adapter: TypeAdapter, load: Callable[[], Any],
+        trusted: bool = False
+    ) -> Response:
+        """
+        Serve ``key`` from cache, or build it with ``load`` and store it.
+
+        ``load`` returns ORM objects or dicts; they are validated and
+        serialized with ``adapter`` so the body matches the route's
+        response_model. ``trusted`` loads skip the validation (see
+        ``app.utils.serialization``). Replies 304 when If-None-Match
+        matches the ETag.
+        """
+        entry = self._lookup(key)
+        if entry is None:
+            entry = self._store(key, ttl, dump_response(adapter, load(), trusted))
+        return self._reply(request, key, entry)
+
+    async def respond_async(
+        self, request: Request, key: str, ttl: float, adapter: TypeAdapter, load: Callable[[], Awaitable[Any]],
+        trusted: bool = False
+    ) -> Response:
+        """Same as ``respond`` for async routes, where ``load`` is a coroutine function"""
+        entry = self._lookup(key)
+        if entry is None:
+            entry = self._store(key, ttl, dump_response(adapter, await load(), trusted))
+        return self._reply(request, key, entry)
+
+    def _lookup(self, key: str) -> Optional[CacheEntry]:
+        entry = self.backend.get(key)
+        self._count(key, "misses" if entry is None else "hits")
+        return entry
+
+    def _store(self, key: str, ttl: float, body: bytes) -> CacheEntry:
+        entry = (f'"{hashlib.sha1(body).hexdigest()}"', body)
+        self.backend.set(key, entry, ttl)
+        return entry
+
+    def _reply(self, request: Request, key: str, entry: CacheEntry) -> Response:
+        etag, body = entry
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in request.headers.get("if-none-match", ""):
+            self._count(key, "not_modified")
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def invalidate(self, *keys: str):
+        """Drop cached responses after the rows behind them changed"""
+        self.backend.delete(*keys)
+        for key in keys:
+            self._count(key, "invalidations")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {namespace: dict(values) for namespace, values in self._stats.items()}
+        for values in stats.values():
+            lookups = values["hits"] + values["misses"]
+            values["hit_rate"] = round(values["hits"] / lookups, 4) if lookups else 0.0
+        return {"backend": type(self.backend).__name__, "endpoints": stats}
+
+
+def build_backend() -> CacheBackend:
+    if config.CACHE_BACKEND == "redis":
+        return RedisCache(config.CACHE_REDIS_URL)
+    if config.CACHE_BACKEND == "memory":
+        return MemoryCache(config.CACHE_MAX_ENTRIES)
+    return NullCache()
+
+
+response_cache = ResponseCache(build_backend())
@@ -0,0 +1,155 @@
+"""
+In-process registry of the contest metadata votes are validated against.
+
+Each entry holds a contest's voting window, status, contestant ids and the
+``version`` it was loaded at. Entries are loaded lazily, expire after
+CONTEST_REGISTRY_TTL_S and are dropped by ``invalidate`` when this worker
+changes a contest. Other workers learn about a change through the version
+stamp: every write path that changes what a vote is checked against bumps
+``Contest.version``, and ``record_vote`` only inserts while the contest is
+still at the version it validated against.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import FrozenSet, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core import config
+from app.models import Contest, Contestant
+
+# A rejection from an entry older than this is re-checked against the
+# database once, so a stale entry never refuses a vote for long
+RECHECK_AFTER_S = 1.0
+
+
+class ContestEntry:
+    """Snapshot of one contest as of ``version``"""
+
+    __slots__ = ("contest_id", "version", "shard", "start_date", "end_date", "status", "contestant_ids")
+
+    def __init__(self, contest_id: int, version: int, shard: int, start_date: datetime, end_date: datetime,
+                 status: str, contestant_ids: FrozenSet[int]):
+        self.contest_id = contest_id
+        self.version = version
+        self.shard = shard
+        self.start_date = start_date
+        self.end_date = end_date
+        self.status = status
+        self.contestant_ids = contestant_ids
+
+    def check(self, contestant_id: int, at: datetime) -> Optional[str]:
+        """Reason a vote cast at ``at`` is refused, or None if it is allowed"""
+        if at < self.start_date:
+            return "Contest has not started yet"
+        if at > self.end_date:
+            return "Contest has ended"
+        if self.status != "active":
+            return "Contest is not active"
+        if contestant_id not in self.contestant_ids:
+            return "Contestant not found"
+        return None
+
+
+class ContestRegistry:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # contest_id -> (ContestEntry or None for a missing contest, loaded_at)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.loads = 0
+
+    def get(self, db: Session, contest_id: int) -> Tuple[Optional[ContestEntry], float]:
+        """Cached entry for a contest and its age in seconds, loading it on a miss or expiry"""
+        with self._lock:
+            item = self._entries.get(contest_id)
+            if item is not None:
+                entry, loaded_at = item
+                age = time.monotonic() - loaded_at
+                # Misses are only trusted briefly so a new contest shows up quickly
+                if age < (self.ttl if entry is not None else RECHECK_AFTER_S):
+                    self._entries.move_to_end(contest_id)
+                    self.hits += 1
+                    return entry, age
+        return self.load(db, contest_id), 0.0
+
+    def load(self, db: Session, contest_id: int) -> Optional[ContestEntry]:
+        """Read a contest from the database and cache it"""
+        with self._lock:
+            generation = self._generation
+        row = db.query(
+            Contest.version, Contest.shard, Contest.start_date, Contest.end_date, Contest.status
+        ).filter(Contest.id == contest_id).first()
+        entry = None
+        if row is not None:
+            contestant_ids = frozenset(
+                contestant_id for (contestant_id,) in
+                db.query(Contestant.id).filter(Contestant.contest_id == contest_id)
+            )
+            entry = ContestEntry(contest_id, row.version, row.shard, row.start_date, row.end_date, row.status, contestant_ids)
+
+        with self._lock:
+            self.loads += 1
+            # An invalidation while we were reading may mean this row is
+            # already stale; hand it to the caller but do not cache it
+            if generation == self._generation:
+                self._entries[contest_id] = (entry, time.monotonic())
+                self._entries.move_to_end(contest_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def shard_of(self, db: Session, contest_id: int) -> Optional[int]:
+        """Vote shard of a contest, or None if it does not exist"""
+        entry, _ = self.get(db, contest_id)
+        return entry.shard if entry is not None else None
+
+    def validate(self, db: Session, contest_id: int, contestant_id: int,
+                 at: datetime) -> Tuple[Optional[ContestEntry], Optional[str]]:
+        """
+        Check a vote against the registry.
+
+        Returns the entry the vote was validated against and the rejection
+        reason (None when accepted). A rejection from an entry more than
+        RECHECK_AFTER_S old is confirmed with a fresh load first.
+        """
+        entry, age = self.get(db, contest_id)
+        error = self._check(entry, contestant_id, at)
+        if error and age >= RECHECK_AFTER_S:
+            entry = self.load(db, contest_id)
+            error = self._check(entry, contestant_id, at)
+        return entry, error
+
+    @staticmethod
+    def _check(entry: Optional[ContestEntry], contestant_id: int, at: datetime) -> Optional[str]:
+        if entry is None:
+            return "Contest not found"
+        return entry.check(contestant_id, at)
+
+    def invalidate(self, contest_id: int = None):
+        """Forget one contest, or every contest when no id is given"""
+        with self._lock:
+            self._generation += 1
+            if contest_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(contest_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.loads
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "loads": self.loads,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "ttl_seconds": self.ttl
+            }
+
+
+contest_registry = ContestRegistry(config.CONTEST_REGISTRY_TTL_S, config.CONTEST_REGISTRY_MAX_ENTRIES)
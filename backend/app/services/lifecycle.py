@@ -0,0 +1,233 @@
+"""
+Contest lifecycle scheduler.
+
+Contests move DRAFT -> ACTIVE at ``start_date`` and ACTIVE -> CLOSED at
+``end_date``. A closed contest's final results are frozen into its
+snapshot LIFECYCLE_FREEZE_DELAY_S after it closed, once votes still in
+write-behind queues have landed; results reads are then served from the
+snapshot.
+
+The scheduler keeps the timeline of upcoming transitions and the set of
+contests open for voting in memory, sleeps until the next transition, and
+re-reads the timeline every LIFECYCLE_REFRESH_S to pick up contests changed
+by other workers (changes made by this worker call ``refresh``). Every
+worker runs one. Transitions are conditional UPDATEs that bump
+``Contest.version`` and snapshots are keyed by contest, so each is applied
+once; every worker drops its own cached copies either way.
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, List, NamedTuple, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core import config
+from app.database import SessionLocal
+from app.models import Contest, ContestResultSnapshot
+from app.models.contest import ContestStatus
+from app.services.cache import response_cache
+from app.services.contest_registry import contest_registry
+from app.services.results import freeze_results
+
+logger = logging.getLogger(__name__)
+
+# Wake slightly after a boundary so ``end_date < now`` already holds
+WAKE_MARGIN_S = 0.01
+
+
+class Transition(NamedTuple):
+    at: datetime
+    contest_id: int
+    action: str  # "activate", "open", "close" or "freeze"
+
+
+class ContestLifecycle:
+    def __init__(self, refresh_s: float, freeze_delay_s: float, session_factory=SessionLocal):
+        self.refresh_s = refresh_s
+        self.freeze_delay = timedelta(seconds=freeze_delay_s)
+        self._session_factory = session_factory
+        # _lock guards the in-memory timeline only; _tick_lock keeps ticks
+        # (and their database work) one at a time without blocking readers
+        self._lock = threading.Lock()
+        self._tick_lock = threading.Lock()
+        self._timeline: List[Transition] = []
+        self._active: FrozenSet[int] = frozenset()
+        # First time this worker saw a contest closed without a snapshot,
+        # for contests closed by hand before their end date
+        self._closed_seen: Dict[int, datetime] = {}
+        self._task = None
+        self._loop = None
+        self._wake = None
+        self.ticks = 0
+        self.transitions = 0
+        self.frozen = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def active_contest_ids(self) -> Optional[FrozenSet[int]]:
+        """Contests open for voting right now, or None when the scheduler is not running"""
+        return self._active if self.running else None
+
+    def start(self):
+        """Start the scheduler task on the running event loop"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def refresh(self):
+        """
+        Re-read the timeline soon, after this worker created or changed a contest.
+
+        Only wakes the scheduler task, so the request never waits for a
+        tick (or a freeze it triggers). The tick drops the cached active
+        list itself when the set of open contests changes.
+        """
+        if self.running:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self):
+        while True:
+            try:
+                timeout = await run_in_threadpool(self.tick)
+            except Exception:
+                logger.exception("Contest lifecycle tick failed")
+                timeout = self.refresh_s
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def tick(self) -> float:
+        """Apply due transitions, reload the timeline and return the seconds until the next one"""
+        with self._tick_lock:
+            db = self._session_factory()
+            try:
+                now = datetime.utcnow()
+                due, timeline, active = self._plan(db, now)
+                changed = []
+                for transition in due:
+                    try:
+                        if self._apply(db, transition, now):
+                            changed.append(transition)
+                    except Exception:
+                        # One failing contest must not hold up the others
+                        db.rollback()
+                        logger.exception("Contest %s: %s failed", transition.contest_id, transition.action)
+                if due:
+                    # Applied transitions (or ones another worker beat us to)
+                    # change what is due next
+                    _, timeline, active = self._plan(db, datetime.utcnow())
+            finally:
+                db.close()
+            with self._lock:
+                previous, self._active = self._active, active
+                self._timeline = sorted(timeline)
+                next_at = self._timeline[0].at if self._timeline else None
+            self.ticks += 1
+
+        for transition in due:
+            contest_id = transition.contest_id
+            if transition.action == "freeze":
+                response_cache.invalidate(f"results:{contest_id}")
+            else:
+                contest_registry.invalidate(contest_id)
+                response_cache.invalidate(
+                    "contests:all", "contests:active", f"contest:{contest_id}", f"results:{contest_id}"
+                )
+        if active != previous:
+            response_cache.invalidate("contests:active")
+        self.transitions += sum(transition.action != "freeze" for transition in changed)
+        self.frozen += sum(transition.action == "freeze" for transition in changed)
+
+        if next_at is None:
+            return self.refresh_s
+        until_next = (next_at - datetime.utcnow()).total_seconds() + WAKE_MARGIN_S
+        return min(self.refresh_s, max(until_next, 0.0))
+
+    def _plan(self, db: Session, now: datetime):
+        """Transitions due now, upcoming ones, and the contests open for voting"""
+        rows = db.query(
+            Contest.id, Contest.status, Contest.start_date, Contest.end_date, ContestResultSnapshot.contest_id
+        ).outerjoin(
+            ContestResultSnapshot, ContestResultSnapshot.contest_id == Contest.id
+        ).filter(
+            or_(Contest.status != ContestStatus.CLOSED, ContestResultSnapshot.contest_id.is_(None))
+        ).all()
+
+        due, timeline, active = [], [], set()
+        closed_unfrozen = set()
+        for contest_id, status, start_date, end_date, _ in rows:
+            if status == ContestStatus.CLOSED:
+                closed_unfrozen.add(contest_id)
+                closed_at = min(end_date, self._closed_seen.setdefault(contest_id, now))
+                transition = Transition(closed_at + self.freeze_delay, contest_id, "freeze")
+            elif now > end_date:
+                transition = Transition(end_date, contest_id, "close")
+            elif status == ContestStatus.DRAFT:
+                transition = Transition(start_date, contest_id, "activate")
+            elif now < start_date:
+                # Activated by hand ahead of its start; opens on its own
+                transition = Transition(start_date, contest_id, "open")
+            else:
+                active.add(contest_id)
+                transition = Transition(end_date, contest_id, "close")
+            (due if transition.at <= now else timeline).append(transition)
+
+        for contest_id in set(self._closed_seen) - closed_unfrozen:
+            del self._closed_seen[contest_id]
+        return due, timeline, frozenset(active)
+
+    def _apply(self, db: Session, transition: Transition, now: datetime) -> bool:
+        """Apply one due transition; False if it no longer applies or another worker applied it"""
+        if transition.action == "freeze":
+            return freeze_results(db, transition.contest_id)
+        if transition.action == "activate":
+            criteria = (Contest.status == ContestStatus.DRAFT, Contest.start_date <= now)
+            status = ContestStatus.ACTIVE
+        else:
+            # DRAFT contests past their end close without ever opening
+            criteria = (Contest.status != ContestStatus.CLOSED, Contest.end_date < now)
+            status = ContestStatus.CLOSED
+        updated = db.execute(
+            update(Contest)
+            .where(Contest.id == transition.contest_id, *criteria)
+            .values(status=status, version=Contest.version + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if updated:
+            logger.info("Contest %s: %s", transition.contest_id, status.value)
+        return bool(updated)
+
+    def stats(self) -> dict:
+        with self._lock:
+            timeline, active = list(self._timeline), self._active
+        return {
+            "running": self.running,
+            "active_contests": len(active),
+            "ticks": self.ticks,
+            "transitions": self.transitions,
+            "frozen": self.frozen,
+            "upcoming": [
+                {"at": transition.at.isoformat(), "contest_id": transition.contest_id, "action": transition.action}
+                for transition in timeline[:20]
+            ]
+        }
+
+
+contest_lifecycle = ContestLifecycle(config.LIFECYCLE_REFRESH_S, config.LIFECYCLE_FREEZE_DELAY_S)
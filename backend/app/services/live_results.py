@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core import config
+from app.database import SessionLocal
+from app.services.results import build_vote_results, VoteResultsAdapter
+from app.utils.serialization import dump_response
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    One live-results listener.
+
+    Holds at most one undelivered payload: a newer update replaces an
+    older one the consumer has not picked up yet, so slow consumers see
+    coalesced results instead of an ever-growing backlog.
+    """
+
+    def __init__(self):
+        self._queue = asyncio.Queue(maxsize=1)
+        self.coalesced = 0
+
+    def push(self, payload: str):
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.coalesced += 1
+        self._queue.put_nowait(payload)
+
+    async def get(self, timeout: Optional[float] = None) -> str:
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+
+class ContestFeed:
+    def __init__(self, contest_id: int):
+        self.contest_id = contest_id
+        self.subscribers = set()
+        self.latest = None
+        self.task = None
+
+
+class ResultsBroadcaster:
+    """
+    Fan-out of live contest results.
+
+    Each contest with at least one subscriber gets a single aggregator task
+    that computes the results once per tick and pushes the payload to every
+    subscriber when it changed. The task stops with the last subscriber.
+    Payloads are the serialized ``VoteResults`` response.
+    """
+
+    def __init__(self, tick_ms: int, session_factory=SessionLocal):
+        self.tick = tick_ms / 1000
+        self._session_factory = session_factory
+        self._feeds = {}
+        self.aggregations = 0
+        self.published = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(feed.subscribers) for feed in self._feeds.values())
+
+    @asynccontextmanager
+    async def subscribe(self, contest_id: int):
+        feed = self._feeds.get(contest_id)
+        if feed is None:
+            feed = self._feeds[contest_id] = ContestFeed(contest_id)
+            feed.task = asyncio.create_task(self._run(feed))
+
+        subscription = Subscription()
+        feed.subscribers.add(subscription)
+        if feed.latest is not None:
+            subscription.push(feed.latest)
+        try:
+            yield subscription
+        finally:
+            feed.subscribers.discard(subscription)
+            if not feed.subscribers and self._feeds.get(contest_id) is feed:
+                feed.task.cancel()
+                del self._feeds[contest_id]
+
+    async def shutdown(self):
+        """Cancel every aggregator task"""
+        feeds, self._feeds = list(self._feeds.values()), {}
+        for feed in feeds:
+            feed.task.cancel()
+        await asyncio.gather(*(feed.task for feed in feeds), return_exceptions=True)
+
+    async def _run(self, feed: ContestFeed):
+        while True:
+            try:
+                payload = await run_in_threadpool(self._snapshot, feed.contest_id)
+            except Exception:
+                logger.exception("Live results aggregation failed for contest %s", feed.contest_id)
+                payload = None
+
+            if payload is not None and payload != feed.latest:
+                feed.latest = payload
+                self.published += 1
+                for subscription in list(feed.subscribers):
+                    subscription.push(payload)
+
+            await asyncio.sleep(self.tick)
+
+    def _snapshot(self, contest_id: int) -> str:
+        db = self._session_factory()
+        try:
+            results = build_vote_results(db, contest_id)
+        finally:
+            db.close()
+        self.aggregations += 1
+        return dump_response(VoteResultsAdapter, results, trusted=True).decode()
+
+
+results_broadcaster = ResultsBroadcaster(tick_ms=config.LIVE_RESULTS_TICK_MS)
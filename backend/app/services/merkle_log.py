@@ -0,0 +1,574 @@
+"""
+Per-contest Merkle log of votes, with O(log n) inclusion proofs.
+
+Each contest's votes are the leaves of an RFC 6962 (Certificate
+Transparency) Merkle tree, in the order they were appended. The leaf hash is
+SHA-256(0x00 || vote_hash bytes), and an interior node is
+SHA-256(0x01 || left || right). A voter who kept the ``vote_hash`` from
+their receipt can check an inclusion proof against the contest's root
+without trusting the server or scanning the table.
+
+The tree is stored as tiles on the contest's vote shard (see MerkleTile).
+Tile level L holds the hashes of the complete subtrees of height 8 * L,
+256 per tile. Any complete subtree hash is then at most 255 hashing steps
+away from one stored tile. A root or a proof needs O(log n) of those, and
+an append rewrites only the last tile of each level. A 10M-vote contest
+takes about 320 MB of leaf tiles and 1.3 MB above them.
+
+MerkleAppender, a background task in each worker, appends new votes in
+batches, so hashing never runs on the vote path. Each appended vote gets
+its leaf index in ``votes.merkle_index`` in the same transaction, and
+the appender takes the votes without one in id order: a transaction that
+took a lower id but commits later is appended with a later batch rather
+than skipped, and proofs read the index instead of deriving it. Appends
+are compare-and-set on the log head, so concurrent workers never both
+append the same batch. Once a closed contest's results are frozen and every
+vote is logged, the log is sealed and, given MERKLE_SIGNING_KEY, its
+root signed with Ed25519.
+Proofs for archived contests find the vote's leaf in the archive's leaf index.
+"""
+import asyncio
+import base64
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core import config
+from app.core.sharding import vote_shards
+from app.database import SessionLocal
+from app.models import Contest, ContestResultSnapshot, MerkleBatch, MerkleLog, MerkleTile, Vote
+from app.models.contest import ContestStatus
+from app.services.vote_archive import ArchiveError, archive_leaf_index, get_archive
+
+logger = logging.getLogger(__name__)
+
+TILE_HEIGHT = 8
+TILE_WIDTH = 1 << TILE_HEIGHT
+HASH_SIZE = 32
+EMPTY_ROOT = hashlib.sha256(b"").digest()
+
+
+def leaf_hash(data: bytes) -> bytes:
+    return hashlib.sha256(b"\x00" + data).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def _fold(hashes: List[bytes]) -> bytes:
+    """Root of a complete subtree over 2**k consecutive hashes of one level"""
+    while len(hashes) > 1:
+        hashes = [node_hash(hashes[i], hashes[i + 1]) for i in range(0, len(hashes), 2)]
+    return hashes[0]
+
+
+def _split(n: int) -> int:
+    """Largest power of two smaller than ``n`` (n >= 2)"""
+    return 1 << ((n - 1).bit_length() - 1)
+
+
+class TileStore:
+    """Reads and writes a contest's tiles through a session, caching what it read"""
+
+    def __init__(self, db: Session, contest_id: int):
+        self.db = db
+        self.contest_id = contest_id
+        self._tiles: Dict[Tuple[int, int], bytes] = {}
+        self.reads = 0
+
+    def get(self, level: int, index: int) -> bytes:
+        key = (level, index)
+        if key not in self._tiles:
+            self.reads += 1
+            self._tiles[key] = self.db.query(MerkleTile.hashes).filter(
+                MerkleTile.contest_id == self.contest_id, MerkleTile.level == level, MerkleTile.tile_index == index
+            ).scalar() or b""
+            self._tiles[key] = bytes(self._tiles[key])
+        return self._tiles[key]
+
+    def put(self, level: int, index: int, hashes: bytes, new: bool):
+        self._tiles[(level, index)] = hashes
+        if new:
+            self.db.add(MerkleTile(contest_id=self.contest_id, level=level, tile_index=index, hashes=hashes))
+        else:
+            self.db.execute(
+                update(MerkleTile)
+                .where(MerkleTile.contest_id == self.contest_id, MerkleTile.level == level,
+                       MerkleTile.tile_index == index)
+                .values(hashes=hashes)
+            )
+
+
+class MerkleTree:
+    """An RFC 6962 tree of ``size`` leaves over a TileStore"""
+
+    def __init__(self, tiles: TileStore, size: int):
+        self.tiles = tiles
+        self.size = size
+
+    def subtree_hash(self, height: int, index: int) -> bytes:
+        """Hash of the complete subtree over leaves [index << height, (index + 1) << height)"""
+        base = height - height % TILE_HEIGHT
+        span = 1 << (height - base)
+        first = index * span
+        tile = self.tiles.get(base // TILE_HEIGHT, first // TILE_WIDTH)
+        offset = (first % TILE_WIDTH) * HASH_SIZE
+        return _fold([tile[at:at + HASH_SIZE] for at in range(offset, offset + span * HASH_SIZE, HASH_SIZE)])
+
+    def range_hash(self, lo: int, hi: int) -> bytes:
+        """Merkle tree hash of leaves [lo, hi), where ``lo`` starts a subtree of the full tree"""
+        n = hi - lo
+        if n & (n - 1) == 0 and lo % n == 0:
+            return self.subtree_hash(n.bit_length() - 1, lo // n)
+        k = _split(n)
+        return node_hash(self.range_hash(lo, lo + k), self.range_hash(lo + k, hi))
+
+    def root(self) -> bytes:
+        return self.range_hash(0, self.size) if self.size else EMPTY_ROOT
+
+    def leaf(self, index: int) -> bytes:
+        return self.subtree_hash(0, index)
+
+    def inclusion_proof(self, index: int) -> List[bytes]:
+        """Audit path for leaf ``index``, from the leaf's sibling up (RFC 6962 PATH)"""
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        proof = []
+        lo, hi = 0, self.size
+        while hi - lo > 1:
+            k = _split(hi - lo)
+            if index < lo + k:
+                proof.append(self.range_hash(lo + k, hi))
+                hi = lo + k
+            else:
+                proof.append(self.range_hash(lo, lo + k))
+                lo = lo + k
+        return proof[::-1]
+
+    def append(self, leaves: List[bytes]):
+        """Append leaf hashes, rewriting only the last tile of each level touched"""
+        start, hashes = self.size, leaves
+        level = 0
+        while hashes:
+            end = start + len(hashes)
+            at = start
+            while at < end:
+                index = at // TILE_WIDTH
+                take = min(end, (index + 1) * TILE_WIDTH) - at
+                existing = self.tiles.get(level, index) if at % TILE_WIDTH else b""
+                if len(existing) != (at % TILE_WIDTH) * HASH_SIZE:
+                    raise RuntimeError(f"Merkle tile ({level}, {index}) of contest {self.tiles.contest_id} is corrupt")
+                self.tiles.put(level, index, existing + b"".join(hashes[at - start:at - start + take]),
+                               new=not existing)
+                at += take
+            # Every tile completed by this append adds one hash to the next level
+            completed = range(start // TILE_WIDTH, end // TILE_WIDTH)
+            hashes = [
+                _fold([tile[at:at + HASH_SIZE] for at in range(0, TILE_WIDTH * HASH_SIZE, HASH_SIZE)])
+                for tile in (self.tiles.get(level, index) for index in completed)
+            ]
+            start = completed.start
+            level += 1
+        self.size += len(leaves)
+
+
+def stream_root(leaves: Iterable[bytes]) -> Tuple[int, bytes]:
+    """Size and root of a tree over ``leaves``, in O(log n) memory; for audits from scratch"""
+    stack: List[Tuple[int, bytes]] = []
+    size = 0
+    for leaf in leaves:
+        height, value = 0, leaf
+        while stack and stack[-1][0] == height:
+            value = node_hash(stack.pop()[1], value)
+            height += 1
+        stack.append((height, value))
+        size += 1
+    if not stack:
+        return 0, EMPTY_ROOT
+    root = stack[-1][1]
+    for _, value in reversed(stack[:-1]):
+        root = node_hash(value, root)
+    return size, root
+
+
+def verify_inclusion(leaf: bytes, index: int, size: int, proof: List[bytes], root: bytes) -> bool:
+    """Check an audit path (RFC 9162 section 2.1.3.2)"""
+    if not 0 <= index < size:
+        return False
+    fn, sn, value = index, size - 1, leaf
+    for sibling in proof:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            value = node_hash(sibling, value)
+            if not fn & 1:
+                while not fn & 1 and fn != 0:
+                    fn >>= 1
+                    sn >>= 1
+        else:
+            value = node_hash(value, sibling)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and value == root
+
+
+# --- signing -----------------------------------------------------------------
+
+_signing_key = None
+
+
+def signing_key():
+    """
+    Ed25519 key sealing closed contests' roots, or None when MERKLE_SIGNING_KEY is unset.
+
+    MERKLE_SIGNING_KEY is a base64 32-byte seed. There is no fallback key:
+    anything derived from values in the source would let anyone forge a
+    signed root, so without it roots are sealed unsigned.
+    """
+    global _signing_key
+    if _signing_key is None and config.MERKLE_SIGNING_KEY:
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+        _signing_key = Ed25519PrivateKey.from_private_bytes(base64.b64decode(config.MERKLE_SIGNING_KEY))
+    return _signing_key
+
+
+def public_key() -> str:
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+    return base64.b64encode(signing_key().public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)).decode()
+
+
+def signed_root(head: MerkleLog) -> Optional[dict]:
+    """A sealed head's signed root, if it carries a signature made with the configured key"""
+    key = signing_key()
+    if key is None or head.sealed_at is None or not head.signature:
+        return None
+    from cryptography.exceptions import InvalidSignature
+
+    try:
+        # Roots sealed under another key (or none) are not vouched for
+        key.public_key().verify(base64.b64decode(head.signature), head.signed_root.encode())
+    except (InvalidSignature, ValueError):
+        return None
+    return {
+        "statement": head.signed_root,
+        "signature": head.signature,
+        "algorithm": "Ed25519",
+        "public_key": public_key()
+    }
+
+
+def root_statement(contest_id: int, tree_size: int, root_hash: str, sealed_at: datetime) -> str:
+    """The exact text a sealed root's signature covers"""
+    return (
+        f"yi-vote merkle root v1\ncontest {contest_id}\nsize {tree_size}\n"
+        f"root {root_hash}\nsealed {sealed_at.isoformat()}\n"
+    )
+
+
+def _leaf_tile(votes_db: Session, contest_id: int, tile_index: int) -> bytes:
+    hashes = votes_db.query(MerkleTile.hashes).filter(
+        MerkleTile.contest_id == contest_id, MerkleTile.level == 0, MerkleTile.tile_index == tile_index
+    ).scalar()
+    return bytes(hashes or b"")
+
+
+def _set_leaf_indexes(votes_db: Session, assigned: List[dict]):
+    """Record ``{"vote_id", "leaf"}`` leaf indexes on votes that have none yet"""
+    if assigned:
+        votes = Vote.__table__
+        votes_db.execute(
+            update(votes)
+            .where(votes.c.id == bindparam("vote_id"), votes.c.merkle_index.is_(None))
+            .values(merkle_index=bindparam("leaf")),
+            assigned
+        )
+
+
+# --- reads for the API ---------------------------------------------------------
+
+def _head(votes_db: Session, contest_id: int) -> Optional[MerkleLog]:
+    return votes_db.get(MerkleLog, contest_id)
+
+
+def _contest_shard(db: Session, contest_id: int) -> int:
+    shard = db.query(Contest.shard).filter(Contest.id == contest_id).scalar()
+    if shard is None:
+        raise HTTPException(status_code=404, detail="Contest not found")
+    return shard
+
+
+def merkle_root(db: Session, contest_id: int) -> dict:
+    """Current root of a contest's log, with the signed root once sealed"""
+    with vote_shards.session(db, _contest_shard(db, contest_id)) as votes_db:
+        head = _head(votes_db, contest_id)
+        if head is None:
+            return {"contest_id": contest_id, "tree_size": 0, "root_hash": EMPTY_ROOT.hex(), "updated_at": None,
+                    "sealed": False, "signed_root": None}
+        return {
+            "contest_id": contest_id,
+            "tree_size": head.tree_size,
+            "root_hash": head.root_hash,
+            "updated_at": head.updated_at,
+            "sealed": head.sealed_at is not None,
+            "signed_root": signed_root(head)
+        }
+
+
+def inclusion_proof(db: Session, contest_id: int, vote_hash: str) -> dict:
+    """Audit path proving a vote is a leaf of its contest's current tree"""
+    shard = _contest_shard(db, contest_id)
+    archive = get_archive(db, contest_id)
+    with vote_shards.session(db, shard) as votes_db:
+        if archive is not None:
+            # Archived contests have a sealed log of every vote, and the
+            # archive's leaf index table maps each vote hash to its leaf
+            head = _head(votes_db, contest_id)
+            try:
+                index = archive_leaf_index(archive, vote_hash)
+            except ArchiveError as exc:
+                raise HTTPException(status_code=503, detail=str(exc))
+            if index is None or head is None:
+                raise HTTPException(status_code=404, detail="Vote not found")
+        else:
+            vote = votes_db.query(Vote.merkle_index).filter(
+                Vote.contest_id == contest_id, Vote.vote_hash == vote_hash
+            ).first()
+            if vote is None:
+                raise HTTPException(status_code=404, detail="Vote not found")
+            head = _head(votes_db, contest_id)
+            index = vote.merkle_index
+            if head is None or index is None:
+                raise HTTPException(status_code=404, detail="Vote is not in the log yet, retry shortly")
+
+        tree = MerkleTree(TileStore(votes_db, contest_id), head.tree_size)
+        leaf = leaf_hash(bytes.fromhex(vote_hash))
+        if index >= head.tree_size or tree.leaf(index) != leaf:
+            logger.error("Merkle log of contest %s does not match vote %s", contest_id, vote_hash)
+            raise HTTPException(status_code=409, detail="Merkle log is inconsistent with the votes table")
+        return {
+            "contest_id": contest_id,
+            "vote_hash": vote_hash,
+            "leaf_index": index,
+            "leaf_hash": leaf.hex(),
+            "tree_size": head.tree_size,
+            "root_hash": head.root_hash,
+            "proof": [node.hex() for node in tree.inclusion_proof(index)]
+        }
+
+
+# --- background appender -------------------------------------------------------
+
+class MerkleAppender:
+    def __init__(self, interval_s: float, batch_size: int, session_factory=SessionLocal):
+        self.interval = interval_s
+        self.batch_size = batch_size
+        self._session_factory = session_factory
+        # Contests whose logged votes are known to carry their leaf index
+        self._indexed = set()
+        # Contests whose log does not match their votes; left alone until a restart
+        self._stalled = set()
+        self._sealed = set()
+        self._task = None
+        self.appended = 0
+        self.adopted = 0
+        self.sealed = 0
+        self.conflicts = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            if signing_key() is None:
+                logger.warning("MERKLE_SIGNING_KEY is not set: closed contests' roots are sealed without a signature")
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                busy = await run_in_threadpool(self.tick)
+            except Exception:
+                logger.exception("Merkle log append failed")
+                busy = False
+            # A full batch means a backlog; keep going without sleeping
+            if not busy:
+                await asyncio.sleep(self.interval)
+
+    def tick(self) -> bool:
+        """Append one batch per contest that has unlogged votes; True if any batch was full"""
+        db = self._session_factory()
+        try:
+            contests = db.query(Contest.id, Contest.shard, Contest.status, ContestResultSnapshot.contest_id).outerjoin(
+                ContestResultSnapshot, ContestResultSnapshot.contest_id == Contest.id
+            ).filter(Contest.status != ContestStatus.DRAFT).all()
+            busy = False
+            for contest_id, shard, status, frozen in contests:
+                if status != ContestStatus.CLOSED:
+                    self._sealed.discard(contest_id)
+                elif contest_id in self._sealed:
+                    continue
+                if contest_id in self._stalled:
+                    continue
+                with vote_shards.session(db, shard) as votes_db:
+                    busy |= self._advance(votes_db, contest_id, frozen is not None)
+            return busy
+        finally:
+            db.close()
+
+    def _advance(self, votes_db: Session, contest_id: int, frozen: bool) -> bool:
+        head = _head(votes_db, contest_id)
+        if head is not None and contest_id not in self._indexed and not self._adopt(votes_db, contest_id, head):
+            return False
+        rows = votes_db.query(Vote.id, Vote.vote_hash).filter(
+            Vote.contest_id == contest_id, Vote.merkle_index.is_(None)
+        ).order_by(Vote.id).limit(self.batch_size).all()
+        if rows:
+            self._append(votes_db, contest_id, head, rows)
+            return len(rows) == self.batch_size
+        if frozen and head is not None:
+            self._seal(votes_db, contest_id, head)
+        return False
+
+    def _adopt(self, votes_db: Session, contest_id: int, head: MerkleLog) -> bool:
+        """
+        Give leaf indexes to the votes of a log appended before votes carried them.
+
+        Those logs hold the contest's votes in id order, minus any vote whose
+        transaction committed after the settle window of the old appender.
+        Votes are matched to the leaves in order; a skipped vote keeps no
+        index and is appended as a new leaf. Returns False, leaving the
+        contest alone until a restart, when the leaves do not match the votes.
+        """
+        indexed = votes_db.query(Vote.id).filter(
+            Vote.contest_id == contest_id, Vote.merkle_index.isnot(None)
+        ).first()
+        if indexed is None and head.tree_size:
+            index, skipped, last_id, tile = 0, 0, 0, b""
+            while True:
+                page = votes_db.query(Vote.id, Vote.vote_hash).filter(
+                    Vote.contest_id == contest_id, Vote.id > last_id, Vote.id <= head.last_vote_id
+                ).order_by(Vote.id).limit(self.batch_size).all()
+                if not page:
+                    break
+                assigned = []
+                for vote_id, vote_hash in page:
+                    if index % TILE_WIDTH == 0 and index < head.tree_size:
+                        tile = _leaf_tile(votes_db, contest_id, index // TILE_WIDTH)
+                    offset = index % TILE_WIDTH * HASH_SIZE
+                    leaf = tile[offset:offset + HASH_SIZE] if index < head.tree_size else None
+                    if leaf == leaf_hash(bytes.fromhex(vote_hash)):
+                        assigned.append({"vote_id": vote_id, "leaf": index})
+                        index += 1
+                    else:
+                        skipped += 1
+                _set_leaf_indexes(votes_db, assigned)
+                last_id = page[-1][0]
+            if index != head.tree_size:
+                votes_db.rollback()
+                self._stalled.add(contest_id)
+                logger.error(
+                    "Merkle log of contest %s has %d leaves but only %d match its votes; not appending to it",
+                    contest_id, head.tree_size, index
+                )
+                return False
+            # One transaction: a half-adopted log would look fully indexed
+            votes_db.commit()
+            self.adopted += index
+            if skipped:
+                logger.warning("Merkle log of contest %s skipped %d votes; appending them now", contest_id, skipped)
+        self._indexed.add(contest_id)
+        return True
+
+    def _append(self, votes_db: Session, contest_id: int, head: Optional[MerkleLog], rows: list):
+        size = head.tree_size if head is not None else 0
+        tree = MerkleTree(TileStore(votes_db, contest_id), size)
+        tree.append([leaf_hash(bytes.fromhex(vote_hash)) for _, vote_hash in rows])
+        _set_leaf_indexes(votes_db, [{"vote_id": vote_id, "leaf": size + n} for n, (vote_id, _) in enumerate(rows)])
+        values = {
+            "tree_size": tree.size,
+            "last_vote_id": max(rows[-1][0], head.last_vote_id if head is not None else 0),
+            "root_hash": tree.root().hex(),
+            "updated_at": datetime.utcnow(),
+            # New votes after a reopen: the old signature only covers the old size
+            "sealed_at": None,
+            "signed_root": None,
+            "signature": None
+        }
+        votes_db.add(MerkleBatch(
+            contest_id=contest_id, first_index=size, first_vote_id=rows[0][0], last_vote_id=rows[-1][0]
+        ))
+        try:
+            if head is None:
+                votes_db.add(MerkleLog(contest_id=contest_id, **values))
+                votes_db.flush()
+                moved = False
+            else:
+                moved = not votes_db.execute(
+                    update(MerkleLog)
+                    .where(MerkleLog.contest_id == contest_id, MerkleLog.tree_size == size)
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+        except IntegrityError:
+            moved = True
+        if moved:
+            # Another worker appended this batch first
+            votes_db.rollback()
+            self.conflicts += 1
+            return
+        votes_db.commit()
+        votes_db.expire_all()
+        self.appended += len(rows)
+
+    def _seal(self, votes_db: Session, contest_id: int, head: MerkleLog):
+        if head.sealed_at is None:
+            sealed_at = datetime.utcnow()
+            key = signing_key()
+            statement = root_statement(contest_id, head.tree_size, head.root_hash, sealed_at)
+            # Without a key the log is still sealed (final), just not signed
+            signature = base64.b64encode(key.sign(statement.encode())).decode() if key is not None else None
+            sealed = votes_db.execute(
+                update(MerkleLog)
+                .where(MerkleLog.contest_id == contest_id, MerkleLog.tree_size == head.tree_size,
+                       MerkleLog.sealed_at.is_(None))
+                .values(sealed_at=sealed_at, signed_root=statement, signature=signature)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            votes_db.commit()
+            if sealed:
+                self.sealed += 1
+                logger.info("Sealed Merkle log of contest %s at %d votes", contest_id, head.tree_size)
+        self._sealed.add(contest_id)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "appended": self.appended,
+            "adopted": self.adopted,
+            "sealed": self.sealed,
+            "conflicts": self.conflicts,
+            "stalled_contests": sorted(self._stalled)
+        }
+
+
+merkle_appender = MerkleAppender(
+    interval_s=config.MERKLE_INTERVAL_S,
+    batch_size=config.MERKLE_BATCH_SIZE
+)
@@ -0,0 +1,115 @@
+"""
+Bounded process pool for bcrypt hashing and verification.
+
+bcrypt is deliberately slow (hundreds of milliseconds of CPU per call), so
+running it inline lets a burst of logins starve the workers that serve
+votes. Here it runs in PASSWORD_POOL_WORKERS separate processes. At most
+PASSWORD_POOL_MAX_QUEUE further calls may wait for a free worker; beyond
+that a call fails straight away with PasswordPoolBusy. A call that is not
+answered within PASSWORD_POOL_TIMEOUT_S fails with PasswordPoolTimeout.
+
+This module is imported by the worker processes, so it stays free of app
+imports beyond the config.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+from app.core import config
+
+_pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash(password: str) -> str:
+    return _pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return _pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+
+class PasswordPoolTimeout(Exception):
+    """Raised when a hash or verify call is not answered in time"""
+
+
+class PasswordPool:
+    def __init__(self, workers: int, max_queue: int, timeout: float):
+        self.workers = workers
+        self.capacity = workers + max_queue
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                # forkserver: never fork the (multi-threaded) app process itself
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("forkserver")
+                )
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, plain_password, hashed_password)
+
+    async def _run(self, fn, *args):
+        self.start()
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                raise PasswordPoolBusy("Password workers are saturated")
+            self._in_flight += 1
+            future = self._executor.submit(fn, *args)
+        # The slot is held until the worker is really done, even if the
+        # caller gave up, so capacity reflects the CPU actually committed
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timed_out += 1
+            raise PasswordPoolTimeout("Password check timed out")
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if not future.cancelled():
+                self.completed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "capacity": self.capacity,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out
+            }
+
+
+password_pool = PasswordPool(
+    workers=config.PASSWORD_POOL_WORKERS,
+    max_queue=config.PASSWORD_POOL_MAX_QUEUE,
+    timeout=config.PASSWORD_POOL_TIMEOUT_S
+)
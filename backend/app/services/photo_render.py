@@ -0,0 +1,116 @@
+"""
+Image probing and variant rendering for contestant photos.
+
+``render`` runs in the photo pipeline's worker processes, so this module
+stays free of app imports beyond the config. Pillow is optional: without
+it photo uploads are refused (see ``check_pillow``).
+"""
+import hashlib
+import io
+import os
+from typing import Dict, List, Tuple
+
+from app.core import config
+
+# Pillow format -> (file extension, media type)
+SOURCE_FORMATS = {
+    "JPEG": ("jpg", "image/jpeg"),
+    "PNG": ("png", "image/png"),
+    "WEBP": ("webp", "image/webp")
+}
+# Variant format -> (Pillow format, file extension)
+VARIANT_FORMATS = {"webp": ("WEBP", "webp"), "jpeg": ("JPEG", "jpg")}
+MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+# Hex digits of a variant's own SHA-256 in its file name (and ETag)
+VARIANT_HASH_LENGTH = 16
+
+
+def check_pillow():
+    """Raise RuntimeError when Pillow is not installed"""
+    try:
+        import PIL.Image  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Photo uploads require the 'Pillow' package")
+
+
+def _open(source):
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = config.PHOTO_MAX_PIXELS
+    try:
+        return Image.open(source)
+    except Image.DecompressionBombError:
+        raise ValueError(f"Image is larger than {config.PHOTO_MAX_PIXELS} pixels")
+    except Exception:
+        raise ValueError("File is not a supported image")
+
+
+def probe(data: bytes) -> dict:
+    """
+    Format and size of an uploaded image, without decoding its pixels.
+
+    Raises ValueError for anything that is not a JPEG, PNG or WebP image
+    within PHOTO_MAX_PIXELS.
+    """
+    image = _open(io.BytesIO(data))
+    if image.format not in SOURCE_FORMATS:
+        raise ValueError(f"Unsupported image format {image.format}, expected JPEG, PNG or WebP")
+    width, height = image.size
+    if width * height > config.PHOTO_MAX_PIXELS:
+        raise ValueError(f"Image is larger than {config.PHOTO_MAX_PIXELS} pixels")
+    try:
+        image.verify()
+    except Exception:
+        raise ValueError("Image file is truncated or corrupt")
+    extension, media_type = SOURCE_FORMATS[image.format]
+    return {"extension": extension, "content_type": media_type, "width": width, "height": height}
+
+
+def _write(directory: str, name: str, data: bytes):
+    path = os.path.join(directory, name)
+    if os.path.exists(path):
+        return
+    partial = f"{path}.{os.getpid()}.partial"
+    with open(partial, "wb") as stream:
+        stream.write(data)
+    os.replace(partial, path)
+
+
+def render(source: str, directory: str, sizes: List[Tuple[str, int]], formats: List[str], quality: int) -> Dict[str, dict]:
+    """
+    Write every size of ``source`` in every format into ``directory``.
+
+    Sizes are (name, longest edge) pairs; images are only ever scaled
+    down. Each file is named after its size and the start of its own
+    SHA-256, so its URL changes whenever its bytes do. Returns, per size
+    name, the width, height and file name per format.
+    """
+    from PIL import Image, ImageOps
+
+    image = _open(source)
+    largest = max(edge for _, edge in sizes)
+    # JPEGs decode straight at a fraction of their size (DCT scaling)
+    image.draft("RGB", (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+
+    variants = {}
+    # Largest first, each size scaled from the previous one
+    for name, edge in sorted(sizes, key=lambda size: -size[1]):
+        image = image.copy()
+        image.thumbnail((edge, edge), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        variant = {"width": image.width, "height": image.height}
+        for fmt in formats:
+            pil_format, extension = VARIANT_FORMATS[fmt]
+            frame = image.convert("RGB") if pil_format == "JPEG" and image.mode != "RGB" else image
+            buffer = io.BytesIO()
+            options = {"quality": quality, "method": 4} if pil_format == "WEBP" else \
+                {"quality": quality, "optimize": True, "progressive": True}
+            frame.save(buffer, pil_format, **options)
+            data = buffer.getvalue()
+            file_name = f"{name}-{hashlib.sha256(data).hexdigest()[:VARIANT_HASH_LENGTH]}.{extension}"
+            _write(directory, file_name, data)
+            variant[fmt] = file_name
+        variants[name] = variant
+    return variants
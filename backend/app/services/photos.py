@@ -0,0 +1,317 @@
+"""
+Contestant photo pipeline.
+
+An upload is probed (format and size, no pixel decoding), stored once in
+PHOTO_DIR under its SHA-256 and recorded as a pending Photo; the
+contestant's ``photo_url`` points at the original straight away. Each
+worker runs a PhotoPipeline task that claims pending photos with a
+conditional UPDATE and renders their variants in a process pool of
+PHOTO_WORKERS, so resizing never runs on the event loop or competes with
+vote handling for the GIL. A finished render is written to the Photo and
+copied, as URLs, into ``photo_variants`` of every contestant using it.
+
+Files are content-addressed: an original's URL holds its digest and a
+variant's file name holds the start of its own SHA-256. A URL's bytes
+never change, so they are served with an ETag taken from the URL and
+immutable caching, without a database read.
+"""
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core import config
+from app.database import SessionLocal
+from app.models import Contestant, Photo
+from app.schemas import PhotoVariant
+from app.services.cache import response_cache
+from app.services.photo_render import VARIANT_FORMATS, VARIANT_HASH_LENGTH, render
+
+logger = logging.getLogger(__name__)
+
+PHOTO_URL_PREFIX = "/api/photos"
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+FILE_PATTERN = re.compile(r"^(original|[a-z0-9_]+-(?P<hash>[0-9a-f]{%d}))\.(jpg|png|webp)$" % VARIANT_HASH_LENGTH)
+
+
+def photo_directory(digest: str) -> str:
+    return os.path.join(config.PHOTO_DIR, digest[:2], digest)
+
+
+def photo_file_url(digest: str, file_name: str) -> str:
+    return f"{PHOTO_URL_PREFIX}/{digest}/{file_name}"
+
+
+def original_url(photo: Photo) -> str:
+    return photo_file_url(photo.digest, f"original.{photo.extension}")
+
+
+def variant_urls(digest: str, variants: Optional[dict]) -> Optional[dict]:
+    """
+    A Photo's variants with URLs in place of file names, as served with contestants.
+
+    Each variant has exactly the PhotoVariant keys, in order (None for a
+    format not rendered), since contestant lists are dumped unvalidated.
+    """
+    if not variants:
+        return None
+    return {
+        name: {
+            key: photo_file_url(digest, variant[key]) if key in VARIANT_FORMATS and variant.get(key) else variant.get(key)
+            for key in PhotoVariant.model_fields
+        }
+        for name, variant in variants.items()
+    }
+
+
+def photo_file(digest: str, file_name: str) -> Optional[tuple]:
+    """Path and strong ETag of a stored photo file, or None if the name is not one we serve"""
+    match = FILE_PATTERN.match(file_name)
+    if not DIGEST_PATTERN.match(digest) or match is None:
+        return None
+    # Originals are named by their digest, variants by their own hash
+    etag = f'"{match.group("hash") or digest}"'
+    return os.path.join(photo_directory(digest), file_name), etag
+
+
+def store_original(data: bytes, info: dict) -> str:
+    """Write an upload under its digest (once) and return the digest"""
+    digest = hashlib.sha256(data).hexdigest()
+    directory = photo_directory(digest)
+    path = os.path.join(directory, f"original.{info['extension']}")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.partial"
+        with open(partial, "wb") as stream:
+            stream.write(data)
+        os.replace(partial, path)
+    return digest
+
+
+def attach_photo(db: Session, contestant_id: int, digest: str, info: dict, size: int) -> dict:
+    """Point a contestant at a stored original, queueing its variants unless already rendered"""
+    contestant = db.get(Contestant, contestant_id)
+    if contestant is None:
+        raise HTTPException(status_code=404, detail="Contestant not found")
+    photo = db.get(Photo, digest)
+    if photo is None:
+        photo = Photo(digest=digest, size_bytes=size, status="pending", attempts=0, **info)
+        db.add(photo)
+        try:
+            db.flush()
+        except IntegrityError:
+            # The same file was just uploaded through another request
+            db.rollback()
+            contestant, photo = db.get(Contestant, contestant_id), db.get(Photo, digest)
+    elif photo.status == "failed":
+        # Retry: the earlier failure may have been the disk, not the file
+        photo.status, photo.attempts, photo.error = "pending", 0, None
+
+    contestant.photo_digest = digest
+    contestant.photo_url = original_url(photo)
+    contestant.photo_variants = variant_urls(digest, photo.variants) if photo.status == "ready" else None
+    db.commit()
+    response_cache.invalidate(f"contestants:{contestant.contest_id}")
+    return {
+        "contestant_id": contestant_id,
+        "digest": digest,
+        "status": photo.status,
+        "photo_url": contestant.photo_url,
+        "photo_variants": contestant.photo_variants
+    }
+
+
+class PhotoPipeline:
+    def __init__(self, workers: int, claim_timeout_s: float, max_attempts: int, poll_s: float = 5,
+                 session_factory=SessionLocal):
+        self.workers = workers
+        self.claim_timeout = timedelta(seconds=claim_timeout_s)
+        self.max_attempts = max_attempts
+        self.poll_s = poll_s
+        self._session_factory = session_factory
+        self._executor = None
+        self._lock = threading.Lock()
+        self._task = None
+        self._loop = None
+        self._wake = None
+        self.rendered = 0
+        self.failed = 0
+        self.in_flight = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def wake(self):
+        """Look for pending photos now rather than at the next poll; safe from any thread"""
+        if self.running:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # forkserver: never fork the (multi-threaded) app process itself
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("forkserver")
+                )
+            return self._executor
+
+    async def _run(self):
+        while True:
+            try:
+                busy = await self.tick()
+            except Exception:
+                logger.exception("Photo pipeline tick failed")
+                busy = False
+            if not busy:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_s)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+    async def tick(self) -> bool:
+        """Render up to one batch of claimed photos; True if the batch was full"""
+        claimed = await run_in_threadpool(self.claim, self.workers)
+        if claimed:
+            await asyncio.gather(*(self._process(photo) for photo in claimed))
+        return len(claimed) == self.workers
+
+    def claim(self, limit: int) -> List[tuple]:
+        """Mark up to ``limit`` pending photos (or stale claims) as processing by this worker"""
+        now = datetime.utcnow()
+        claimable = or_(
+            Photo.status == "pending",
+            and_(Photo.status == "processing", Photo.claimed_at < now - self.claim_timeout)
+        )
+        db = self._session_factory()
+        try:
+            candidates = db.query(Photo.digest, Photo.extension, Photo.attempts).filter(claimable).order_by(
+                Photo.created_at
+            ).limit(limit).all()
+            claimed = []
+            for digest, extension, attempts in candidates:
+                if attempts >= self.max_attempts:
+                    self._finish(db, digest, error="Gave up after repeated render failures")
+                    continue
+                won = db.execute(
+                    update(Photo).where(Photo.digest == digest, claimable)
+                    .values(status="processing", claimed_at=now, attempts=Photo.attempts + 1)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                db.commit()
+                if won:
+                    claimed.append((digest, extension))
+            return claimed
+        finally:
+            db.close()
+
+    async def _process(self, photo: tuple):
+        digest, extension = photo
+        directory = photo_directory(digest)
+        source = os.path.join(directory, f"original.{extension}")
+        self.in_flight += 1
+        try:
+            future = self._pool().submit(
+                render, source, directory, config.PHOTO_SIZES, config.PHOTO_FORMATS, config.PHOTO_QUALITY
+            )
+            variants, error = await asyncio.wrap_future(future), None
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a new pool, and the
+            # claim is retried once it goes stale
+            logger.error("Photo worker pool broke while rendering %s", digest)
+            with self._lock:
+                broken, self._executor = self._executor, None
+            if broken is not None:
+                broken.shutdown(wait=False, cancel_futures=True)
+            return
+        except Exception as exc:
+            variants, error = None, str(exc) or type(exc).__name__
+        finally:
+            self.in_flight -= 1
+        await run_in_threadpool(self.finish, digest, variants, error)
+
+    def finish(self, digest: str, variants: Optional[dict] = None, error: Optional[str] = None):
+        db = self._session_factory()
+        try:
+            self._finish(db, digest, variants, error)
+        finally:
+            db.close()
+
+    def _finish(self, db: Session, digest: str, variants: Optional[dict] = None, error: Optional[str] = None):
+        """Record a render and hand its URLs to the contestants showing the photo"""
+        db.execute(
+            update(Photo).where(Photo.digest == digest)
+            .values(status="failed" if error else "ready", variants=variants, error=error,
+                    processed_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        contest_ids = set()
+        if not error:
+            contest_ids = {contest_id for (contest_id,) in db.query(Contestant.contest_id).filter(
+                Contestant.photo_digest == digest
+            ).distinct()}
+            db.execute(
+                update(Contestant).where(Contestant.photo_digest == digest)
+                .values(photo_variants=variant_urls(digest, variants))
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+        if error:
+            self.failed += 1
+            logger.warning("Photo %s could not be rendered: %s", digest, error)
+        else:
+            self.rendered += 1
+        response_cache.invalidate(*(f"contestants:{contest_id}" for contest_id in contest_ids))
+
+    def stats(self) -> dict:
+        db = self._session_factory()
+        try:
+            by_status = dict(db.query(Photo.status, func.count(Photo.digest)).group_by(Photo.status).all())
+        finally:
+            db.close()
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "photos": by_status
+        }
+
+
+photo_pipeline = PhotoPipeline(
+    workers=config.PHOTO_WORKERS,
+    claim_timeout_s=config.PHOTO_CLAIM_TIMEOUT_S,
+    max_attempts=config.PHOTO_MAX_ATTEMPTS
+)
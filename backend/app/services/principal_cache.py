@@ -0,0 +1,121 @@
+"""
+Cache of verified admin principals for ``get_current_admin``.
+
+A token that decoded and matched an active admin is remembered until
+ADMIN_AUTH_CACHE_TTL_S passes or the token expires, whichever is first, so
+authenticated requests skip both the JWT decode and the Admin query. Any
+change to an Admin object flushed by a Session drops that admin's entries
+right away and again once it commits. Other workers pick up the
+change when their entry expires, so keep the TTL short.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core import config
+from app.models.admin import Admin
+
+
+def detached_copy(admin: Admin) -> Admin:
+    """A session-less copy of an admin, safe to hand to any request"""
+    return Admin(**{column.name: getattr(admin, column.name) for column in Admin.__table__.columns})
+
+
+class PrincipalCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # token -> (Admin copy, monotonic expiry)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, token: str) -> Optional[Admin]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            item = self._entries.get(token)
+            if item is None or item[1] <= time.monotonic():
+                if item is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return item[0]
+
+    def put(self, token: str, admin: Admin, token_expires: Optional[int] = None):
+        """Remember a verified admin, never past the token's own ``exp``"""
+        if not self.enabled:
+            return
+        ttl = self.ttl
+        if token_expires is not None:
+            ttl = min(ttl, token_expires - datetime.utcnow().timestamp())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (detached_copy(admin), time.monotonic() + ttl)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, admin_id: int = None):
+        """Drop every cached token of an admin, or everything when no admin is given"""
+        with self._lock:
+            if admin_id is None:
+                self._entries.clear()
+            else:
+                stale = [token for token, (admin, _) in self._entries.items() if admin.id == admin_id]
+                for token in stale:
+                    del self._entries[token]
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "ttl_seconds": self.ttl
+            }
+
+
+principal_cache = PrincipalCache(config.ADMIN_AUTH_CACHE_TTL_S, config.ADMIN_AUTH_CACHE_MAX_ENTRIES)
+
+
+@event.listens_for(Session, "after_flush")
+def _forget_changed_admins(session: Session, flush_context):
+    changed = [obj for obj in (*session.dirty, *session.deleted) if isinstance(obj, Admin)]
+    if not changed:
+        return
+    pending = session.info.setdefault("changed_admins", set())
+    for admin in changed:
+        pending.add(admin.id)
+        principal_cache.invalidate(admin.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_committed_admins(session: Session):
+    # Drop again after commit, in case a request cached the pre-commit row
+    # between the flush and the commit
+    for admin_id in session.info.pop("changed_admins", ()):
+        principal_cache.invalidate(admin_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_admins(session: Session):
+    session.info.pop("changed_admins", None)
@@ -0,0 +1,345 @@
+"""
+Rate limiting for vote submissions, applied before the route runs.
+
+``VoteRateLimitMiddleware`` reads the small JSON body of ``POST
+/api/votes/`` and checks two limits, each over a sliding window:
+
+- per voter: (contest_id, voter_identifier), RATE_LIMIT_VOTER;
+- per client address: (contest_id, vote_method, client IP), RATE_LIMIT_IP.
+
+A request over either limit is answered 429 with Retry-After, without
+touching the database or parsing the body into a model. Both limits are
+checked before either is counted, so a request refused by one does not
+use up the other. Limits are
+written ``<count>/<seconds>`` (``0`` disables one). They can be overridden
+per channel (RATE_LIMIT_CHANNELS, e.g. ``sms:ip=0`` for SMS gateways that
+send every vote from one address) and per contest (RATE_LIMIT_CONTESTS,
+e.g. ``42:voter=1/60``). A contest override beats a channel override.
+
+Windows use the sliding-window counter approximation: a key keeps two
+counts, for its current and previous fixed window, and the previous
+one is weighted by how much of it still overlaps the sliding window. The
+memory store keeps a key until it has been idle for two windows, and
+never more than RATE_LIMIT_MAX_KEYS keys, dropping the least recently
+used. RATE_LIMIT_BACKEND=redis shares the counts between workers.
+"""
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.core import config
+
+VOTE_PATHS = ("/api/votes/", "/api/votes")
+
+MAX_BODY_BYTES = 16 * 1024
+
+# (count, window seconds); a count of 0 means unlimited
+Limit = Tuple[int, float]
+
+
+def parse_limit(value: str) -> Optional[Limit]:
+    """``"30/60"`` -> (30, 60.0); ``"0"`` or ``""`` -> None (unlimited)"""
+    value = value.strip()
+    if value in ("", "0"):
+        return None
+    count, _, seconds = value.partition("/")
+    limit = (int(count), float(seconds or 1))
+    if limit[0] < 0 or limit[1] <= 0:
+        raise ValueError(f"Invalid rate limit '{value}', expected <count>/<seconds>")
+    return limit if limit[0] else None
+
+
+def parse_overrides(value: str) -> Dict[Tuple[str, str], Optional[Limit]]:
+    """``"sms:ip=0,42:voter=1/60"`` -> {("sms", "ip"): None, ("42", "voter"): (1, 60.0)}"""
+    overrides = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        target, _, limit = item.partition("=")
+        scope, _, kind = target.partition(":")
+        if kind not in ("voter", "ip") or not scope:
+            raise ValueError(f"Invalid rate limit override '{item}', expected <scope>:<voter|ip>=<count>/<seconds>")
+        overrides[(scope.strip(), kind)] = parse_limit(limit)
+    return overrides
+
+
+class RateLimitStore:
+    """Storage interface: counts hits per key over a sliding window"""
+
+    async def hit(self, key: str, limit: Limit, now: float) -> float:
+        """Count a hit if it fits the limit and return 0, else return seconds until it would fit"""
+        return await self.hit_all([(key, limit)], now)
+
+    async def hit_all(self, hits: List[Tuple[str, Limit]], now: float) -> float:
+        """Count a hit on every key if each fits its limit and return 0, else the longest wait (counting none)"""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+def retry_after(limit: Limit, previous: float, current: float, now: float) -> float:
+    """Seconds until one more hit fits under ``limit``, at window fraction f"""
+    count, window = limit
+    offset = now % window
+    if current + 1 > count:
+        # Only the next window helps, where this window's count becomes the
+        # previous one: current * (1 - f) + 1 <= count
+        return window - offset + (1 - (count - 1) / current) * window
+    # Later in this window: previous * (1 - f) + current + 1 <= count
+    return max(0.0, (1 - (count - current - 1) / previous) * window - offset)
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """In-process sliding-window counters; one tuple per live key"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # key -> (window index, previous count, current count, idle-after time)
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    async def hit_all(self, hits, now):
+        with self._lock:
+            wait, counts = 0.0, []
+            for key, limit in hits:
+                count, window = limit
+                index = int(now // window)
+                state = self._keys.get(key)
+                if state is None or state[0] < index - 1:
+                    previous = current = 0
+                elif state[0] == index - 1:
+                    previous, current = state[2], 0
+                else:
+                    previous, current = state[1], state[2]
+                if previous * (1 - (now % window) / window) + current + 1 > count:
+                    wait = max(wait, retry_after(limit, previous, current, now))
+                counts.append((key, window, index, previous, current))
+            for key, window, index, previous, current in counts:
+                self._keys[key] = (index, previous, current if wait else current + 1, (index + 2) * window)
+                self._keys.move_to_end(key)
+            self._evict(now)
+        return wait
+
+    def _evict(self, now: float):
+        # Least recently hit first: stop at the first key still in use
+        keys = self._keys
+        while keys:
+            oldest = next(iter(keys))
+            if keys[oldest][3] > now and len(keys) <= self.max_keys:
+                break
+            del keys[oldest]
+            self.evicted += 1
+
+    def stats(self):
+        with self._lock:
+            return {"keys": len(self._keys), "max_keys": self.max_keys, "evicted": self.evicted}
+
+
+# KEYS: per hit, current window counter and previous window counter
+# ARGV: per hit, limit, weight of the previous window and counter TTL in ms
+# Returns whether every hit fit (and was counted), then each hit's counts
+_SLIDING_WINDOW_LUA = """
+local counts, allowed = {}, 1
+for i = 1, #KEYS / 2 do
+    local current = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+    counts[2 * i - 1], counts[2 * i] = previous, current
+    if previous * tonumber(ARGV[3 * i - 1]) + current + 1 > tonumber(ARGV[3 * i - 2]) then
+        allowed = 0
+    end
+end
+if allowed == 1 then
+    for i = 1, #KEYS / 2 do
+        redis.call('INCR', KEYS[2 * i - 1])
+        redis.call('PEXPIRE', KEYS[2 * i - 1], ARGV[3 * i])
+    end
+end
+return {allowed, unpack(counts)}
+"""
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """
+    Counters in any Redis-compatible server, shared by every worker.
+
+    Each key is two counters (current and previous window) that expire on
+    their own. Needs the optional ``redis`` package unless a client is
+    passed in; the client must be a ``redis.asyncio`` one.
+    """
+
+    def __init__(self, url: str = None, client=None, prefix: str = "yivote:ratelimit:"):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package")
+            client = redis.Redis.from_url(url)
+        self._client = client
+        self._prefix = prefix
+        self._script = client.register_script(_SLIDING_WINDOW_LUA)
+
+    async def hit_all(self, hits, now):
+        keys, args = [], []
+        for key, (count, window) in hits:
+            index = int(now // window)
+            keys += [f"{self._prefix}{key}:{index}", f"{self._prefix}{key}:{index - 1}"]
+            args += [count, 1 - (now % window) / window, int(window * 2000)]
+        allowed, *counts = await self._script(keys=keys, args=args)
+        if allowed:
+            return 0.0
+        wait = 0.0
+        for (_, limit), previous, current in zip(hits, counts[::2], counts[1::2]):
+            previous, current = int(previous), int(current)
+            count, window = limit
+            if previous * (1 - (now % window) / window) + current + 1 > count:
+                wait = max(wait, retry_after(limit, previous, current, now))
+        return wait
+
+
+class RateLimiter:
+    """Resolves the limits for a vote and checks them against the store"""
+
+    def __init__(
+        self,
+        store: RateLimitStore,
+        voter_limit: Optional[Limit],
+        ip_limit: Optional[Limit],
+        channel_overrides: dict = None,
+        contest_overrides: dict = None
+    ):
+        self.store = store
+        self.defaults = {"voter": voter_limit, "ip": ip_limit}
+        self.channel_overrides = channel_overrides or {}
+        self.contest_overrides = contest_overrides or {}
+        self.allowed = 0
+        self.rejected = 0
+
+    def limit_for(self, kind: str, contest_id: str, channel: str) -> Optional[Limit]:
+        for overrides, scope in ((self.contest_overrides, contest_id), (self.channel_overrides, channel)):
+            if (scope, kind) in overrides:
+                return overrides[(scope, kind)]
+        return self.defaults[kind]
+
+    async def check(self, contest_id, voter_identifier, channel: str, client_ip: str) -> float:
+        """0 when the vote may go ahead, else the seconds to wait before retrying"""
+        contest_id = str(contest_id)
+        now = time.time()
+        checks = (
+            ("voter", f"voter:{contest_id}:{voter_identifier}"),
+            ("ip", f"ip:{contest_id}:{channel}:{client_ip}")
+        )
+        hits = []
+        for kind, key in checks:
+            if kind == "voter" and voter_identifier is None:
+                continue
+            limit = self.limit_for(kind, contest_id, channel)
+            if limit is not None:
+                hits.append((key, limit))
+        wait = await self.store.hit_all(hits, now) if hits else 0.0
+        if wait:
+            self.rejected += 1
+        else:
+            self.allowed += 1
+        return wait
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.store).__name__,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            **self.store.stats()
+        }
+
+
+class VoteRateLimitMiddleware:
+    """
+    ASGI middleware that rate-limits vote submissions before routing.
+
+    The body is read once (votes are a few hundred bytes), checked, and
+    replayed to the app unchanged. Bodies that are not a JSON object are
+    only limited per address; the route rejects them anyway.
+    """
+
+    def __init__(self, app, limiter: "RateLimiter" = None, trust_forwarded: bool = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+        self.trust_forwarded = config.RATE_LIMIT_TRUST_FORWARDED if trust_forwarded is None else trust_forwarded
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http" or scope["method"] != "POST"
+            or scope["path"] not in VOTE_PATHS or not config.RATE_LIMIT_ENABLED
+        ):
+            return await self.app(scope, receive, send)
+
+        messages, body = [], b""
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            body += message.get("body", b"")
+            if not message.get("more_body") or len(body) > MAX_BODY_BYTES:
+                break
+
+        vote = {}
+        if len(body) <= MAX_BODY_BYTES:
+            try:
+                vote = json.loads(body)
+            except ValueError:
+                pass
+        if not isinstance(vote, dict):
+            vote = {}
+        wait = await self.limiter.check(
+            vote.get("contest_id"),
+            vote.get("voter_identifier"),
+            str(vote.get("vote_method") or "web"),
+            self.client_ip(scope)
+        )
+        if wait:
+            return await self.reject(send, wait)
+
+        async def replay():
+            return messages.pop(0) if messages else await receive()
+
+        await self.app(scope, replay, send)
+
+    def client_ip(self, scope) -> str:
+        if self.trust_forwarded:
+            for name, value in scope.get("headers", ()):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    async def reject(send, wait: float):
+        body = b'{"detail":"Too many votes, please retry later"}'
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(wait))).encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def build_store() -> RateLimitStore:
+    if config.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitStore(config.RATE_LIMIT_REDIS_URL)
+    return MemoryRateLimitStore(config.RATE_LIMIT_MAX_KEYS)
+
+
+rate_limiter = RateLimiter(
+    build_store(),
+    voter_limit=parse_limit(config.RATE_LIMIT_VOTER),
+    ip_limit=parse_limit(config.RATE_LIMIT_IP),
+    channel_overrides=parse_overrides(config.RATE_LIMIT_CHANNELS),
+    contest_overrides=parse_overrides(config.RATE_LIMIT_CONTESTS)
+)
@@ -0,0 +1,114 @@
+import json
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import TypeAdapter
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.sharding import vote_shards
+from app.models import Contest, Contestant, ContestantTally, ContestResultSnapshot
+from app.models.contest import ContestStatus
+from app.schemas import VoteResults
+from app.services.tallies import reconcile_tallies
+from app.utils.serialization import dump_trusted
+
+VoteResultsAdapter = TypeAdapter(VoteResults)
+
+
+def contest_tallies(db: Session, contest: Contest, contestant_ids: Optional[list] = None) -> dict:
+    """
+    contestant_id -> vote count, read from the shard holding the contest's votes
+
+    ``contestant_ids`` limits the read to those contestants, e.g. one page.
+    """
+    with vote_shards.session(db, contest.shard) as votes_db:
+        query = votes_db.query(ContestantTally.contestant_id, ContestantTally.vote_count).filter(
+            ContestantTally.contest_id == contest.id
+        )
+        if contestant_ids is not None:
+            query = query.filter(ContestantTally.contestant_id.in_(contestant_ids))
+        return dict(query.all())
+
+
+def build_vote_results(db: Session, contest_id: int) -> dict:
+    """
+    Results payload for a contest
+
+    Served from the frozen snapshot once the contest is closed and frozen,
+    otherwise computed from the maintained tallies.
+    """
+    contest = db.query(Contest).filter(Contest.id == contest_id).first()
+    if not contest:
+        raise HTTPException(status_code=404, detail="Contest not found")
+    if contest.status == ContestStatus.CLOSED:
+        snapshot = db.get(ContestResultSnapshot, contest_id)
+        if snapshot is not None:
+            # The contest may have been renamed since it was frozen
+            return {**json.loads(snapshot.results), "contest_name": contest.name}
+    return tally_vote_results(db, contest)
+
+
+def tally_vote_results(db: Session, contest: Contest) -> dict:
+    """Compute the results payload for a contest from the maintained tallies"""
+    contest_id = contest.id
+    contestants = db.query(Contestant.id, Contestant.name).filter(
+        Contestant.contest_id == contest_id
+    ).all()
+    tallies = contest_tallies(db, contest)
+    
+    # Plain tuples: attribute access on result rows dominates for large contests
+    counted = [(contestant_id, name, tallies.get(contestant_id, 0)) for contestant_id, name in contestants]
+    total_votes = sum(vote_count for _, _, vote_count in counted)
+    
+    result_items = []
+    for contestant_id, name, vote_count in counted:
+        percentage = (vote_count / total_votes * 100) if total_votes > 0 else 0.0
+        result_items.append({
+            "contestant_id": contestant_id,
+            "contestant_name": name,
+            "vote_count": vote_count,
+            "percentage": round(percentage, 2)
+        })
+    
+    result_items.sort(key=lambda x: x["vote_count"], reverse=True)
+    
+    return {
+        "contest_id": contest_id,
+        "contest_name": contest.name,
+        "total_votes": total_votes,
+        "results": result_items
+    }
+
+
+def freeze_results(db: Session, contest_id: int) -> bool:
+    """
+    Store a closed contest's final results as its snapshot.
+
+    Tallies are recounted from the votes first, so the snapshot is exact
+    even if a tally had drifted. Returns False when the contest is not
+    closed or is already frozen (possibly by another worker).
+    """
+    contest = db.get(Contest, contest_id)
+    if contest is None or contest.status != ContestStatus.CLOSED:
+        return False
+    if db.get(ContestResultSnapshot, contest_id) is not None:
+        return False
+    reconcile_tallies(db, contest_id=contest_id, fix=True)
+    results = tally_vote_results(db, contest)
+    db.add(ContestResultSnapshot(
+        contest_id=contest_id,
+        total_votes=results["total_votes"],
+        results=dump_trusted(results).decode()
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
+
+def unfreeze_results(db: Session, contest_id: int) -> bool:
+    """Drop a contest's snapshot, e.g. when it is reopened; the caller commits"""
+    return db.query(ContestResultSnapshot).filter(ContestResultSnapshot.contest_id == contest_id).delete() > 0
@@ -0,0 +1,268 @@
+"""
+Time-bucketed vote rollups and the analytics built on them.
+
+``record_rollups`` runs with ``record_votes``, inside the transaction
+that inserts the votes, adding each vote to its minute, hour and day
+bucket for its contestant and vote method. Analytics read only these
+rows, never the votes table. Regions are looked up on the
+contestants when a query runs, so editing a contestant's region
+re-labels their past votes too. ``reconcile_rollups`` compares rollup
+totals with the votes table and rebuilds contests that drifted.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Iterator, Optional
+
+from fastapi import HTTPException
+from pydantic import TypeAdapter
+from sqlalchemy import bindparam, delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.sharding import vote_shards
+from app.models import Contest, Contestant, Vote, VoteArchive, VoteRollup
+from app.schemas import VoteAnalytics
+
+GRANULARITIES = ("minute", "hour", "day")
+
+REBUILD_PAGE_SIZE = 50000
+
+VoteAnalyticsAdapter = TypeAdapter(VoteAnalytics)
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Start of the minute, hour or day bucket holding ``timestamp``"""
+    if granularity == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket_counts(rows) -> Counter:
+    """
+    Count votes per rollup key.
+
+    Keys are (contest_id, granularity, bucket_start, contestant_id,
+    vote_method). ``rows`` are vote dicts with contest_id,
+    contestant_id, vote_method and timestamp.
+    """
+    counts = Counter()
+    for row in rows:
+        method = row.get("vote_method") or ""
+        for granularity in GRANULARITIES:
+            counts[(
+                row["contest_id"], granularity, bucket_start(row["timestamp"], granularity),
+                row["contestant_id"], method
+            )] += 1
+    return counts
+
+
+ROLLUP_KEY = ("contest_id", "granularity", "bucket_start", "contestant_id", "vote_method")
+
+_rollups = VoteRollup.__table__
+
+# Prebuilt Core statement, cheap enough to run once per bucket
+_add_to_bucket = _rollups.update().where(
+    *(_rollups.c[name] == bindparam(f"key_{name}") for name in ROLLUP_KEY)
+).values(vote_count=_rollups.c.vote_count + bindparam("added"))
+
+
+def _add(db: Session, key: tuple, count: int) -> int:
+    params = {f"key_{name}": value for name, value in zip(ROLLUP_KEY, key)}
+    return db.execute(_add_to_bucket, {**params, "added": count}).rowcount
+
+
+def record_rollups(db: Session, rows: list):
+    """
+    Add newly inserted votes to their rollup buckets.
+
+    Runs inside the caller's transaction, like the tally update. Buckets
+    that do not exist yet are created with one INSERT inside a savepoint.
+    If a concurrent writer created one of them first, they are retried one
+    at a time so the race never surfaces as an IntegrityError, which
+    callers read as a duplicate vote.
+    """
+    new = [(key, count) for key, count in bucket_counts(rows).items() if not _add(db, key, count)]
+    if not new:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(_rollups), [
+                {**dict(zip(ROLLUP_KEY, key)), "vote_count": count} for key, count in new
+            ])
+    except IntegrityError:
+        for key, count in new:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(_rollups).values(**dict(zip(ROLLUP_KEY, key)), vote_count=count))
+            except IntegrityError:
+                _add(db, key, count)
+
+
+def build_vote_analytics(
+    db: Session,
+    contest_id: int,
+    granularity: str = "minute",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    group_by: Optional[str] = None
+) -> dict:
+    """
+    Vote counts per bucket, optionally broken down by method, region or contestant.
+
+    ``since`` is rounded down to its bucket. Buckets starting at or after
+    ``until`` are left out. Points are ordered by bucket, then group.
+    """
+    contest = db.query(Contest.id, Contest.shard).filter(Contest.id == contest_id).first()
+    if not contest:
+        raise HTTPException(status_code=404, detail="Contest not found")
+
+    key_column = {
+        "vote_method": VoteRollup.vote_method,
+        "region": VoteRollup.contestant_id,
+        "contestant": VoteRollup.contestant_id
+    }.get(group_by)
+
+    query = select(
+        VoteRollup.bucket_start,
+        *([key_column] if key_column is not None else []),
+        func.sum(VoteRollup.vote_count)
+    ).where(VoteRollup.contest_id == contest.id, VoteRollup.granularity == granularity)
+    if since is not None:
+        query = query.where(VoteRollup.bucket_start >= bucket_start(since, granularity))
+    if until is not None:
+        query = query.where(VoteRollup.bucket_start < until)
+    group_columns = [VoteRollup.bucket_start] + ([key_column] if key_column is not None else [])
+    query = query.group_by(*group_columns)
+
+    with vote_shards.session(db, contest.shard) as votes_db:
+        rows = votes_db.execute(query).all()
+
+    if group_by == "region":
+        regions = dict(db.query(Contestant.id, Contestant.region).filter(Contestant.contest_id == contest.id))
+        merged = Counter()
+        for start, contestant_id, count in rows:
+            merged[(start, regions.get(contestant_id))] += count
+        rows = [(start, region, count) for (start, region), count in merged.items()]
+
+    series = []
+    for row in rows:
+        if group_by is None:
+            start, count = row
+            group = None
+        else:
+            start, group, count = row
+            if group_by == "contestant":
+                group = str(group)
+            group = group or None
+        series.append({"bucket_start": start, "group": group, "vote_count": int(count)})
+    series.sort(key=lambda point: (point["bucket_start"], point["group"] or ""))
+
+    return {
+        "contest_id": contest.id,
+        "granularity": granularity,
+        "group_by": group_by,
+        "total_votes": sum(point["vote_count"] for point in series),
+        "series": series
+    }
+
+
+def _iter_vote_buckets(votes_db: Session, contest_id: int) -> Iterator[list]:
+    """A contest's votes as rollup input dicts, in keyset pages on id"""
+    query = select(Vote.id, Vote.contestant_id, Vote.vote_method, Vote.timestamp).where(
+        Vote.contest_id == contest_id
+    )
+    last_id = 0
+    while True:
+        page = votes_db.execute(query.where(Vote.id > last_id).order_by(Vote.id).limit(REBUILD_PAGE_SIZE)).all()
+        if not page:
+            return
+        yield [
+            {"contest_id": contest_id, "contestant_id": contestant_id, "vote_method": method, "timestamp": timestamp}
+            for _, contestant_id, method, timestamp in page
+            if timestamp is not None
+        ]
+        last_id = page[-1][0]
+
+
+def rebuild_rollups(votes_db: Session, contest_id: int):
+    """Replace a contest's rollups with a recount of its votes (caller commits)"""
+    counts = Counter()
+    for page in _iter_vote_buckets(votes_db, contest_id):
+        counts.update(bucket_counts(page))
+    votes_db.execute(delete(VoteRollup).where(VoteRollup.contest_id == contest_id))
+    if counts:
+        votes_db.execute(insert(VoteRollup), [
+            {
+                "contest_id": key[0],
+                "granularity": key[1],
+                "bucket_start": key[2],
+                "contestant_id": key[3],
+                "vote_method": key[4],
+                "vote_count": count
+            }
+            for key, count in counts.items()
+        ])
+
+
+def reconcile_rollups(db: Session, contest_id: Optional[int] = None, fix: bool = True) -> list:
+    """
+    Compare day-level rollup totals with the votes table.
+
+    Returns one entry per contest whose rollups drifted. Drift is checked
+    per contestant and vote method. With ``fix`` those contests are
+    rebuilt from their votes and committed. Archived contests are skipped.
+    """
+    contests = db.query(Contest.id, Contest.shard).outerjoin(
+        VoteArchive, VoteArchive.contest_id == Contest.id
+    ).filter(VoteArchive.contest_id.is_(None))
+    if contest_id is not None:
+        contests = contests.filter(Contest.id == contest_id)
+    by_shard = defaultdict(list)
+    for id_, shard in contests:
+        by_shard[shard].append(id_)
+
+    drift = []
+    for shard, contest_ids in sorted(by_shard.items()):
+        with vote_shards.session(db, shard) as votes_db:
+            drift.extend(_reconcile_shard(votes_db, contest_ids, contest_id, fix))
+    return drift
+
+
+def _reconcile_shard(votes_db: Session, contest_ids: list, contest_id: Optional[int], fix: bool) -> list:
+    actual = select(
+        Vote.contest_id, Vote.contestant_id, func.coalesce(Vote.vote_method, ""), func.count(Vote.id)
+    ).where(Vote.timestamp.is_not(None))
+    stored = select(
+        VoteRollup.contest_id, VoteRollup.contestant_id, VoteRollup.vote_method, func.sum(VoteRollup.vote_count)
+    ).where(VoteRollup.granularity == "day")
+    if contest_id is not None:
+        actual = actual.where(Vote.contest_id == contest_id)
+        stored = stored.where(VoteRollup.contest_id == contest_id)
+    actual = votes_db.execute(actual.group_by(Vote.contest_id, Vote.contestant_id, Vote.vote_method)).all()
+    stored = votes_db.execute(
+        stored.group_by(VoteRollup.contest_id, VoteRollup.contestant_id, VoteRollup.vote_method)
+    ).all()
+
+    actual_by_contest, stored_by_contest = defaultdict(Counter), defaultdict(Counter)
+    for contest, contestant_id, method, count in actual:
+        actual_by_contest[contest][(contestant_id, method)] += count
+    for contest, contestant_id, method, count in stored:
+        stored_by_contest[contest][(contestant_id, method)] += int(count)
+
+    drift = []
+    for contest in contest_ids:
+        actual_counts, stored_counts = actual_by_contest[contest], stored_by_contest[contest]
+        if actual_counts == stored_counts:
+            continue
+        drift.append({
+            "contest_id": contest,
+            "stored": sum(stored_counts.values()),
+            "actual": sum(actual_counts.values())
+        })
+        if fix:
+            rebuild_rollups(votes_db, contest)
+    if fix and drift:
+        votes_db.commit()
+    return drift
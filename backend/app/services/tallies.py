@@ -0,0 +1,128 @@
+from collections import Counter, defaultdict
+from typing import Optional
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.sharding import vote_shards
+from app.models import Contest, Contestant, ContestantTally, Vote, VoteArchive
+from app.services.rollups import record_rollups
+from app.services.voter_filter import voter_filters
+
+
+def record_votes(db: Session, rows: list):
+    """
+    Add newly inserted votes to the per-contestant tallies.
+
+    Runs inside the caller's transaction so a vote and its tally increment
+    commit (or roll back) together. ``rows`` are vote dicts carrying
+    ``contest_id``, ``contestant_id``, ``vote_method`` and ``timestamp``.
+    The time-bucketed rollups are updated in the same transaction, and the
+    voters are added to the duplicate-voter filter before it commits.
+    """
+    counts = Counter((row["contest_id"], row["contestant_id"]) for row in rows)
+    for (contest_id, contestant_id), count in counts.items():
+        if _add(db, contestant_id, count):
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(insert(ContestantTally).values(
+                    contestant_id=contestant_id,
+                    contest_id=contest_id,
+                    vote_count=count
+                ))
+        except IntegrityError:
+            # A concurrent first vote created the row
+            _add(db, contestant_id, count)
+    record_rollups(db, rows)
+    voter_filters.add_rows(rows)
+
+
+def _add(db: Session, contestant_id: int, count: int) -> bool:
+    return bool(db.execute(
+        update(ContestantTally)
+        .where(ContestantTally.contestant_id == contestant_id)
+        .values(vote_count=ContestantTally.vote_count + count)
+        .execution_options(synchronize_session=False)
+    ).rowcount)
+
+
+def create_tally(db: Session, contestant_id: int, contest_id: int):
+    """Start a new contestant's tally at zero on its shard, unless a vote got there first"""
+    try:
+        with db.begin_nested():
+            db.execute(insert(ContestantTally).values(
+                contestant_id=contestant_id, contest_id=contest_id, vote_count=0
+            ))
+    except IntegrityError:
+        pass
+
+
+def reconcile_tallies(db: Session, contest_id: Optional[int] = None, fix: bool = True) -> list:
+    """
+    Recount votes from the ``votes`` table and compare with the stored tallies.
+
+    Returns one entry per contestant whose tally drifted (or is missing).
+    With ``fix`` the tallies are rewritten from the recount and committed.
+    Each vote shard is recounted against the contestants on the primary.
+    Archived contests have no votes left to recount and are skipped.
+    """
+    contestants = db.query(Contestant.id, Contestant.contest_id, Contest.shard).join(
+        Contest, Contest.id == Contestant.contest_id
+    ).outerjoin(
+        VoteArchive, VoteArchive.contest_id == Contest.id
+    ).filter(VoteArchive.contest_id.is_(None))
+    if contest_id is not None:
+        contestants = contestants.filter(Contestant.contest_id == contest_id)
+    by_shard = defaultdict(list)
+    for contestant_id, contestant_contest_id, shard in contestants:
+        by_shard[shard].append((contestant_id, contestant_contest_id))
+
+    drift = []
+    for shard, shard_contestants in sorted(by_shard.items()):
+        with vote_shards.session(db, shard) as votes_db:
+            drift.extend(_reconcile_shard(votes_db, shard_contestants, contest_id, fix))
+    return drift
+
+
+def _reconcile_shard(votes_db: Session, contestants: list, contest_id: Optional[int], fix: bool) -> list:
+    actual = votes_db.query(Vote.contestant_id, func.count(Vote.id))
+    stored = votes_db.query(ContestantTally.contestant_id, ContestantTally.vote_count)
+    if contest_id is not None:
+        actual = actual.filter(Vote.contest_id == contest_id)
+        stored = stored.filter(ContestantTally.contest_id == contest_id)
+    actual = dict(actual.group_by(Vote.contestant_id).all())
+    stored = dict(stored.all())
+
+    drift = []
+    for contestant_id, contestant_contest_id in contestants:
+        vote_count = actual.get(contestant_id, 0)
+        stored_count = stored.get(contestant_id)
+        if stored_count == vote_count:
+            continue
+        drift.append({
+            "contest_id": contestant_contest_id,
+            "contestant_id": contestant_id,
+            "stored": stored_count,
+            "actual": vote_count
+        })
+        if not fix:
+            continue
+        if stored_count is None:
+            votes_db.execute(insert(ContestantTally).values(
+                contestant_id=contestant_id,
+                contest_id=contestant_contest_id,
+                vote_count=vote_count
+            ))
+        else:
+            votes_db.execute(
+                update(ContestantTally)
+                .where(ContestantTally.contestant_id == contestant_id)
+                .values(vote_count=vote_count)
+                .execution_options(synchronize_session=False)
+            )
+
+    if fix:
+        votes_db.commit()
+    return drift
@@ -0,0 +1,366 @@
+"""
+Archival of closed contests' votes out of the hot ``votes`` table.
+
+Once a contest is closed and its results are frozen, nothing reads its
+votes row by row except exports and Merkle proofs. ``archive_contest``
+writes them, in id order, to one file per contest in VOTE_ARCHIVE_DIR
+(gzipped NDJSON, or Parquet with pyarrow) and records it as a VoteArchive
+on the primary. From then on exports and proofs read the file, and results
+keep coming from the snapshot. Next to the file goes a vote_hash -> leaf
+index table for the contest's Merkle log, so a proof finds its leaf in a
+read or two. ``purge_contest`` then deletes the rows from
+the contest's shard in short transactions, so the table and its indexes
+only hold contests that are still being voted on or audited live.
+
+A contest is only archived when its snapshot counts as many votes as are
+written to the file and, if it has a Merkle log, that log is sealed: the
+file is then the complete, final record. Archived contests cannot be
+reopened, and tally and rollup reconciliation leaves them alone.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core import config
+from app.core.sharding import vote_shards
+from app.models import Contest, ContestResultSnapshot, MerkleLog, Vote, VoteArchive
+from app.models.contest import ContestStatus
+from app.services.vote_export import EXPORT_COLUMNS, check_export_format, encode_votes, iter_vote_pages
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMATS = ("ndjson", "parquet")
+ARCHIVE_EXTENSIONS = {"ndjson": "ndjson.gz", "parquet": "parquet"}
+VOTE_METHOD = EXPORT_COLUMNS.index("vote_method")
+VOTE_HASH = EXPORT_COLUMNS.index("vote_hash")
+# Leaf index table slot: vote hash, then leaf index + 1 (0 marks an empty slot)
+LEAF_SLOT = struct.Struct(">32sQ")
+
+
+class ArchiveError(Exception):
+    """Raised when a contest cannot be archived"""
+
+
+class _HashingFile:
+    """Write-through wrapper that counts and hashes what reaches the file"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data) -> int:
+        self.digest.update(data)
+        self.size += len(data)
+        return self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def check_archive_format(fmt: str):
+    """Raise ValueError for an unknown format and RuntimeError when its dependency is missing"""
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unsupported archive format '{fmt}', expected one of {', '.join(ARCHIVE_FORMATS)}")
+    check_export_format(fmt)
+
+
+def archive_file(archive: VoteArchive) -> str:
+    return os.path.join(config.VOTE_ARCHIVE_DIR, archive.file_name)
+
+
+def get_archive(db: Session, contest_id: int) -> Optional[VoteArchive]:
+    return db.get(VoteArchive, contest_id)
+
+
+def archivable_contests(db: Session, closed_for: timedelta) -> List[int]:
+    """Contests frozen at least ``closed_for`` ago (closed by date or by hand) and not archived yet"""
+    return [contest_id for (contest_id,) in db.query(Contest.id).join(
+        ContestResultSnapshot, ContestResultSnapshot.contest_id == Contest.id
+    ).outerjoin(
+        VoteArchive, VoteArchive.contest_id == Contest.id
+    ).filter(
+        Contest.status == ContestStatus.CLOSED,
+        ContestResultSnapshot.frozen_at <= datetime.utcnow() - closed_for,
+        VoteArchive.contest_id.is_(None)
+    ).order_by(Contest.id)]
+
+
+def archive_contest(db: Session, contest_id: int, fmt: str = None, page_size: int = 10000) -> VoteArchive:
+    """
+    Write a closed, frozen contest's votes to its archive file and record it.
+
+    Returns the existing archive if the contest is already archived. The
+    file is written under a temporary name and only renamed into place
+    once it is complete and its row count matches the frozen results.
+    """
+    fmt = fmt or config.VOTE_ARCHIVE_FORMAT
+    check_archive_format(fmt)
+    existing = get_archive(db, contest_id)
+    if existing is not None:
+        return existing
+    contest = db.get(Contest, contest_id)
+    if contest is None:
+        raise ArchiveError(f"Contest {contest_id} not found")
+    snapshot = db.get(ContestResultSnapshot, contest_id)
+    if contest.status != ContestStatus.CLOSED or snapshot is None:
+        raise ArchiveError(f"Contest {contest_id} is not closed with frozen results yet")
+
+    file_name = f"contest-{contest_id}-votes.{ARCHIVE_EXTENSIONS[fmt]}"
+    path = os.path.join(config.VOTE_ARCHIVE_DIR, file_name)
+    partial = path + ".partial"
+    leaf_index_file = None
+    leaves_partial = os.path.join(config.VOTE_ARCHIVE_DIR, f"contest-{contest_id}-votes.leaves.partial")
+    os.makedirs(config.VOTE_ARCHIVE_DIR, exist_ok=True)
+    count, first_id, last_id = 0, None, None
+
+    with vote_shards.session(db, contest.shard) as votes_db:
+        head = votes_db.get(MerkleLog, contest_id)
+        if (head is not None or (config.MERKLE_ENABLED and snapshot.total_votes)) and \
+                (head is None or head.sealed_at is None):
+            raise ArchiveError(f"Merkle log of contest {contest_id} is not sealed yet")
+
+        def pages():
+            nonlocal count, first_id, last_id
+            for page in iter_vote_pages(votes_db, contest_id, page_size=page_size):
+                count += len(page)
+                first_id = page[0][0] if first_id is None else first_id
+                last_id = page[-1][0]
+                yield page
+
+        try:
+            with open(partial, "wb") as raw:
+                target = _HashingFile(raw)
+                # Parquet pages are zstd-compressed already
+                stream = gzip.GzipFile(fileobj=target, mode="wb", mtime=0) if fmt == "ndjson" else target
+                for chunk in encode_votes(fmt, pages()):
+                    stream.write(chunk)
+                if stream is not target:
+                    stream.close()
+                raw.flush()
+                os.fsync(raw.fileno())
+            if count != snapshot.total_votes:
+                raise ArchiveError(
+                    f"Contest {contest_id} has {count} votes but its frozen results count {snapshot.total_votes}"
+                )
+            if head is not None:
+                leaf_index_file = f"contest-{contest_id}-votes.leaves"
+                write_leaf_index(leaves_partial, _leaf_entries(votes_db, contest_id, page_size), count)
+                os.replace(leaves_partial, os.path.join(config.VOTE_ARCHIVE_DIR, leaf_index_file))
+            os.replace(partial, path)
+        except BaseException:
+            for leftover in (partial, leaves_partial):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            raise
+
+    archive = VoteArchive(
+        contest_id=contest_id, format=fmt, file_name=file_name, leaf_index_file=leaf_index_file, vote_count=count,
+        first_vote_id=first_id, last_vote_id=last_id, size_bytes=target.size, sha256=target.digest.hexdigest()
+    )
+    db.add(archive)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker archived it first, to the same file name
+        db.rollback()
+        return get_archive(db, contest_id)
+    logger.info("Archived %d votes of contest %s to %s (%d bytes)", count, contest_id, path, target.size)
+    return archive
+
+
+def purge_contest(db: Session, archive: VoteArchive, chunk_size: int = None) -> int:
+    """
+    Delete an archived contest's rows from the votes table; returns how many.
+
+    Runs in transactions of ``chunk_size`` rows so vote writes on the shard
+    are never held up for long. Only ids the archive covers are deleted.
+    """
+    chunk_size = chunk_size or config.VOTE_ARCHIVE_PURGE_CHUNK
+    contest_id, last_vote_id = archive.contest_id, archive.last_vote_id
+    shard = db.query(Contest.shard).filter(Contest.id == contest_id).scalar()
+    deleted = 0
+    with vote_shards.session(db, shard) as votes_db:
+        while last_vote_id is not None:
+            ids = votes_db.execute(
+                select(Vote.id).where(Vote.contest_id == contest_id, Vote.id <= last_vote_id)
+                .order_by(Vote.id).limit(chunk_size)
+            ).scalars().all()
+            if not ids:
+                break
+            votes_db.execute(delete(Vote).where(Vote.id.in_(ids)).execution_options(synchronize_session=False))
+            votes_db.commit()
+            deleted += len(ids)
+        left = votes_db.query(Vote.id).filter(Vote.contest_id == contest_id).count()
+    if left:
+        logger.warning("Contest %s has %d votes newer than its archive; they were kept", contest_id, left)
+    db.execute(
+        update(VoteArchive).where(VoteArchive.contest_id == contest_id)
+        .values(purged_at=datetime.utcnow()).execution_options(synchronize_session=False)
+    )
+    db.commit()
+    db.refresh(archive)
+    return deleted
+
+
+def purgeable_archives(db: Session, delay: timedelta) -> List[VoteArchive]:
+    """Archives at least ``delay`` old whose rows are still in the votes table"""
+    return db.query(VoteArchive).filter(
+        VoteArchive.purged_at.is_(None), VoteArchive.archived_at <= datetime.utcnow() - delay
+    ).order_by(VoteArchive.contest_id).all()
+
+
+# --- reading archives ----------------------------------------------------------
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _ndjson_rows(path: str) -> Iterator[tuple]:
+    with gzip.open(path, "rt", encoding="utf-8") as stream:
+        for line in stream:
+            record = json.loads(line)
+            if record["timestamp"] is not None:
+                record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+            yield tuple(record[name] for name in EXPORT_COLUMNS)
+
+
+def _parquet_rows(path: str, batch_size: int) -> Iterator[tuple]:
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=list(EXPORT_COLUMNS)):
+        for record in batch.to_pylist():
+            yield tuple(record[name] for name in EXPORT_COLUMNS)
+
+
+def check_archive(archive: VoteArchive):
+    """Raise ArchiveError when an archive's file is not readable here"""
+    path = archive_file(archive)
+    if not os.path.exists(path):
+        raise ArchiveError(f"Archive of contest {archive.contest_id} is missing: {path}")
+
+
+def iter_archive_rows(archive: VoteArchive, page_size: int = 10000) -> Iterator[tuple]:
+    """Every vote row of an archive in EXPORT_COLUMNS order, oldest id first"""
+    check_archive(archive)
+    path = archive_file(archive)
+    if archive.format == "parquet":
+        return _parquet_rows(path, page_size)
+    return _ndjson_rows(path)
+
+
+def iter_archive_pages(
+    archive: VoteArchive,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    vote_method: Optional[str] = None,
+    page_size: int = 10000
+) -> Iterator[list]:
+    """``iter_vote_pages`` over an archive file, with the same filters"""
+    since, until = _naive_utc(since), _naive_utc(until)
+    page = []
+    for row in iter_archive_rows(archive, page_size):
+        timestamp = row[-1]
+        if since is not None and (timestamp is None or timestamp < since):
+            continue
+        if until is not None and (timestamp is None or timestamp >= until):
+            continue
+        if vote_method is not None and row[VOTE_METHOD] != vote_method:
+            continue
+        page.append(row)
+        if len(page) == page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def _leaf_entries(votes_db: Session, contest_id: int, page_size: int) -> Iterator[Tuple[str, int]]:
+    """``(vote_hash, merkle_index)`` of every vote of a contest whose log is sealed"""
+    last_id = 0
+    while True:
+        page = votes_db.query(Vote.id, Vote.vote_hash, Vote.merkle_index).filter(
+            Vote.contest_id == contest_id, Vote.id > last_id
+        ).order_by(Vote.id).limit(page_size).all()
+        if not page:
+            return
+        for _, vote_hash, leaf in page:
+            if leaf is None:
+                raise ArchiveError(f"Vote {vote_hash} of contest {contest_id} is not in its Merkle log")
+            yield vote_hash, leaf
+        last_id = page[-1][0]
+
+
+def _slot(key: bytes, slots: int) -> int:
+    return int.from_bytes(key[:8], "big") % slots
+
+
+def write_leaf_index(path: str, entries: Iterable[Tuple[str, int]], count: int):
+    """
+    Write a vote_hash -> leaf index table for ``count`` votes to ``path``.
+
+    An open-addressing hash table of LEAF_SLOT slots, 3/4 full, built in
+    place through mmap so memory stays flat whatever the contest size.
+    """
+    slots = count * 4 // 3 + 1
+    with open(path, "w+b") as stream:
+        stream.truncate(slots * LEAF_SLOT.size)
+        with mmap.mmap(stream.fileno(), 0) as table:
+            written = 0
+            for vote_hash, leaf in entries:
+                written += 1
+                if written > count:
+                    raise ArchiveError(f"More than {count} votes for a leaf index table of {count}")
+                key = bytes.fromhex(vote_hash)
+                slot = _slot(key, slots)
+                while LEAF_SLOT.unpack_from(table, slot * LEAF_SLOT.size)[1]:
+                    slot = (slot + 1) % slots
+                LEAF_SLOT.pack_into(table, slot * LEAF_SLOT.size, key, leaf + 1)
+            table.flush()
+        os.fsync(stream.fileno())
+
+
+def archive_leaf_index(archive: VoteArchive, vote_hash: str) -> Optional[int]:
+    """
+    Merkle leaf index of an archived vote, or None if it is not in the archive.
+
+    Looked up in the leaf index table written with the archive. Archives
+    without one (written before those tables, or of a contest without a
+    log) are scanned; their rows are in id order, the leaf order then.
+    """
+    if archive.leaf_index_file is None:
+        for index, row in enumerate(iter_archive_rows(archive)):
+            if row[VOTE_HASH] == vote_hash:
+                return index
+        return None
+
+    path = os.path.join(config.VOTE_ARCHIVE_DIR, archive.leaf_index_file)
+    if not os.path.exists(path):
+        raise ArchiveError(f"Leaf index of contest {archive.contest_id} is missing: {path}")
+    try:
+        key = bytes.fromhex(vote_hash)
+    except ValueError:
+        return None
+    with open(path, "rb") as stream:
+        slots = os.fstat(stream.fileno()).st_size // LEAF_SLOT.size
+        slot = _slot(key, slots)
+        while True:
+            stream.seek(slot * LEAF_SLOT.size)
+            stored, leaf = LEAF_SLOT.unpack(stream.read(LEAF_SLOT.size))
+            if not leaf:
+                return None
+            if stored == key:
+                return leaf - 1
+            slot = (slot + 1) % slots
@@ -0,0 +1,176 @@
+"""
+Streaming vote export for auditors.
+
+Votes of one contest are read from its shard in pages of ``page_size``
+rows using keyset pagination on ``id`` (``WHERE id > last_id ORDER BY id``,
+served by the (contest_id, id) index), and each page is encoded and handed
+out before the next one is read. Memory stays flat however many rows the
+contest has, and a page costs the same at row 50M as at row 0.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.sharding import vote_shards
+from app.models import Vote
+
+EXPORT_FORMATS = ("csv", "ndjson", "parquet")
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+EXPORT_COLUMNS = (
+    "id", "contest_id", "contestant_id", "voter_identifier",
+    "vote_method", "vote_hash", "ip_address", "timestamp"
+)
+
+
+def iter_vote_pages(
+    db: Session,
+    contest_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    vote_method: Optional[str] = None,
+    page_size: int = 10000
+) -> Iterator[list]:
+    """Yield lists of vote rows (tuples in EXPORT_COLUMNS order), oldest id first"""
+    columns = [getattr(Vote, name) for name in EXPORT_COLUMNS]
+    query = select(*columns).where(Vote.contest_id == contest_id)
+    if since is not None:
+        query = query.where(Vote.timestamp >= since)
+    if until is not None:
+        query = query.where(Vote.timestamp < until)
+    if vote_method is not None:
+        query = query.where(Vote.vote_method == vote_method)
+
+    last_id = 0
+    while True:
+        page = db.execute(query.where(Vote.id > last_id).order_by(Vote.id).limit(page_size)).all()
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1][0]
+
+
+def _csv_chunks(pages: Iterator[list]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for page in pages:
+        writer.writerows(
+            row[:-1] + (row[-1].isoformat() if row[-1] else None,) for row in page
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(pages: Iterator[list]) -> Iterator[bytes]:
+    for page in pages:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=datetime.isoformat) + "\n"
+            for row in page
+        ).encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that collects bytes until the caller drains them"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_chunks(pages: Iterator[list]) -> Iterator[bytes]:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package")
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("contest_id", pa.int64()),
+        ("contestant_id", pa.int64()),
+        ("voter_identifier", pa.string()),
+        ("vote_method", pa.string()),
+        ("vote_hash", pa.string()),
+        ("ip_address", pa.string()),
+        ("timestamp", pa.timestamp("us"))
+    ])
+    sink = _ChunkSink()
+    # One row group per page: each page is flushed to the client as soon as it is written
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for page in pages:
+            columns = list(zip(*page))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def check_export_format(fmt: str):
+    """Raise ValueError for an unknown format and RuntimeError when its dependency is missing"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}', expected one of {', '.join(EXPORT_FORMATS)}")
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Parquet export requires the 'pyarrow' package")
+
+
+def encode_votes(fmt: str, pages: Iterator[list]) -> Iterator[bytes]:
+    """Encode pages of vote rows (EXPORT_COLUMNS order) as chunks of a csv, ndjson or parquet file"""
+    encode = {"csv": _csv_chunks, "ndjson": _ndjson_chunks, "parquet": _parquet_chunks}[fmt]
+    return encode(pages)
+
+
+def export_votes(fmt: str, shard: int, contest_id: int, archive=None, **filters) -> Iterator[bytes]:
+    """
+    Stream a contest's votes as encoded chunks, one per page.
+
+    Opens its own session on the contest's shard, so it can run after the
+    request that started it has released its own session. Votes of an
+    archived contest (its ``archive``) are read from the archive file.
+    """
+    if archive is not None:
+        from app.services.vote_archive import iter_archive_pages
+
+        yield from encode_votes(fmt, iter_archive_pages(archive, **filters))
+        return
+    db = vote_shards.open_session(shard)
+    try:
+        yield from encode_votes(fmt, iter_vote_pages(db, contest_id, **filters))
+    finally:
+        db.close()
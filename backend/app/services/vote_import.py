@@ -0,0 +1,234 @@
+import csv
+import hashlib
+import json
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, Optional, TextIO, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.sharding import vote_shards
+from app.models import Contest, Vote
+from app.services.cache import response_cache
+from app.services.contest_registry import contest_registry
+from app.services.tallies import record_votes
+from app.services.voter_filter import voter_filters
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Stay below SQLite's bound-parameter limit when checking for existing voters
+IN_CLAUSE_CHUNK = 900
+
+
+def detect_format(filename: Optional[str], explicit: Optional[str] = None) -> str:
+    """Pick the import format from an explicit value or the file extension"""
+    if explicit:
+        fmt = explicit.lower()
+    elif filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        fmt = "ndjson"
+    else:
+        fmt = "csv"
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format '{fmt}', expected one of {', '.join(IMPORT_FORMATS)}")
+    return fmt
+
+
+def read_rows(stream: TextIO, fmt: str) -> Iterator[Tuple[int, Optional[dict]]]:
+    """
+    Yield ``(line_number, record)`` pairs from a CSV or NDJSON text stream.
+
+    Records are parsed one line at a time; an NDJSON line that is not valid
+    JSON yields ``None`` so the importer can reject it by line number.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, record if isinstance(record, dict) else None
+
+
+class VoteImporter:
+    """
+    Set-based bulk vote import for carrier (SMS/USSD) and offline batches.
+
+    Applies the same rules as ``cast_vote`` (contest exists and is open at
+    the vote's timestamp, contestant belongs to the contest, one vote per
+    voter per contest) but per batch: contests are validated through the
+    contest registry, duplicate voters are checked with one IN query per
+    contest per batch, and accepted rows go in with a multi-row INSERT and a
+    single commit per vote shard. Memory stays bounded by ``batch_size``
+    regardless of file length.
+    """
+
+    def __init__(self, db: Session, batch_size: int = 5000, default_method: str = "sms"):
+        self.db = db
+        self.batch_size = batch_size
+        self.default_method = default_method
+        self.total = 0
+        self.accepted = 0
+        self.rejected = 0
+
+    def summary(self) -> dict:
+        return {"total": self.total, "accepted": self.accepted, "rejected": self.rejected}
+
+    def run(self, rows: Iterable[Tuple[int, Optional[dict]]]) -> Iterator[dict]:
+        """Import the rows, yielding one ``{"line", "error"}`` dict per rejected row"""
+        batch = []
+        for line_number, record in rows:
+            self.total += 1
+            try:
+                vote = self._parse(record)
+            except (KeyError, TypeError, ValueError) as exc:
+                yield self._reject(line_number, f"Invalid row: {exc}")
+                continue
+
+            error = self._validate(vote)
+            if error:
+                yield self._reject(line_number, error)
+                continue
+
+            batch.append((line_number, vote))
+            if len(batch) >= self.batch_size:
+                yield from self._flush(batch)
+                batch = []
+
+        if batch:
+            yield from self._flush(batch)
+
+    def _reject(self, line_number: int, error: str) -> dict:
+        self.rejected += 1
+        return {"line": line_number, "error": error}
+
+    def _parse(self, record: Optional[dict]) -> dict:
+        if record is None:
+            raise ValueError("not a JSON object")
+        voter_identifier = str(record["voter_identifier"] or "").strip()
+        if not 5 <= len(voter_identifier) <= 200:
+            raise ValueError("voter_identifier must be 5-200 characters")
+        timestamp = record.get("timestamp")
+        timestamp = datetime.fromisoformat(timestamp) if timestamp else datetime.utcnow()
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        return {
+            "contest_id": int(record["contest_id"]),
+            "contestant_id": int(record["contestant_id"]),
+            "voter_identifier": voter_identifier,
+            "vote_method": record.get("vote_method") or self.default_method,
+            "ip_address": record.get("ip_address") or None,
+            "timestamp": timestamp
+        }
+
+    def _validate(self, vote: dict) -> Optional[str]:
+        contest, error = contest_registry.validate(self.db, vote["contest_id"], vote["contestant_id"], vote["timestamp"])
+        if contest is not None:
+            vote["shard"], vote["version"] = contest.shard, contest.version
+        return error
+
+    def _recheck(self, batch: list) -> Iterator[dict]:
+        """
+        Validate again the votes whose contest changed since they were validated.
+
+        Mirrors the version guard of single votes: contests are re-read on
+        the primary just before each batch insert, so a contest closed or
+        edited by another worker mid-import stops taking votes. Yields
+        rejections and returns the votes still valid.
+        """
+        contest_ids = {vote["contest_id"] for _, vote in batch}
+        versions = dict(self.db.query(Contest.id, Contest.version).filter(Contest.id.in_(contest_ids)))
+        refreshed, valid = set(), []
+        for line_number, vote in batch:
+            contest_id = vote["contest_id"]
+            if versions.get(contest_id) != vote.pop("version"):
+                if contest_id not in refreshed:
+                    contest_registry.invalidate(contest_id)
+                    refreshed.add(contest_id)
+                error = self._validate(vote)
+                if error:
+                    yield self._reject(line_number, error)
+                    continue
+                del vote["shard"], vote["version"]
+            valid.append((line_number, vote))
+        return valid
+
+    def _existing_voters(self, votes_db: Session, contest_id: int, voters: list) -> set:
+        # Voters the duplicate-voter filter has never seen need no lookup
+        voters = [voter for voter in voters if voter_filters.check(contest_id, voter) is not False]
+        existing = set()
+        for start in range(0, len(voters), IN_CLAUSE_CHUNK):
+            existing.update(
+                voter for (voter,) in votes_db.query(Vote.voter_identifier).filter(
+                    Vote.contest_id == contest_id,
+                    Vote.voter_identifier.in_(voters[start:start + IN_CLAUSE_CHUNK])
+                )
+            )
+        return existing
+
+    def _flush(self, batch: list) -> Iterator[dict]:
+        by_shard = defaultdict(list)
+        for line_number, vote in batch:
+            by_shard[vote.pop("shard")].append((line_number, vote))
+        for shard, shard_batch in by_shard.items():
+            shard_batch = yield from self._recheck(shard_batch)
+            if not shard_batch:
+                continue
+            with vote_shards.session(self.db, shard) as votes_db:
+                yield from self._flush_shard(votes_db, shard_batch)
+
+    def _flush_shard(self, votes_db: Session, batch: list) -> Iterator[dict]:
+        voters_by_contest = defaultdict(list)
+        for _, vote in batch:
+            voters_by_contest[vote["contest_id"]].append(vote["voter_identifier"])
+        existing = {
+            (contest_id, voter)
+            for contest_id, voters in voters_by_contest.items()
+            for voter in self._existing_voters(votes_db, contest_id, voters)
+        }
+
+        rows = []
+        for line_number, vote in batch:
+            key = (vote["contest_id"], vote["voter_identifier"])
+            if key in existing:
+                yield self._reject(line_number, "You have already voted in this contest")
+                continue
+            existing.add(key)
+            hash_string = f"{vote['contest_id']}{vote['contestant_id']}{vote['voter_identifier']}{vote['timestamp']}"
+            vote["vote_hash"] = hashlib.sha256(hash_string.encode()).hexdigest()
+            rows.append(vote)
+
+        if rows:
+            try:
+                votes_db.execute(insert(Vote), rows)
+                record_votes(votes_db, rows)
+                votes_db.commit()
+                self.accepted += len(rows)
+            except IntegrityError:
+                # A concurrent writer took one of these voters after the
+                # IN check; retry row by row to find the conflicts
+                votes_db.rollback()
+                yield from self._insert_rows(votes_db, batch, rows)
+            for contest_id in voters_by_contest:
+                response_cache.invalidate(f"results:{contest_id}", f"contestants:{contest_id}")
+
+    def _insert_rows(self, votes_db: Session, batch: list, rows: list) -> Iterator[dict]:
+        line_numbers = {id(vote): line_number for line_number, vote in batch}
+        for vote in rows:
+            try:
+                votes_db.execute(insert(Vote), [vote])
+                record_votes(votes_db, [vote])
+                votes_db.commit()
+                self.accepted += 1
+            except IntegrityError:
+                votes_db.rollback()
+                yield self._reject(line_numbers[id(vote)], "You have already voted in this contest")
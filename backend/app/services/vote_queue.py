@@ -0,0 +1,350 @@
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app.core import config
+from app.core.sharding import PRIMARY_SHARD, VoteShards, vote_shards
+from app.models import Contest, RejectedVote, Vote
+from app.services.cache import response_cache
+from app.services.contest_registry import contest_registry
+from app.services.tallies import record_votes
+
+logger = logging.getLogger(__name__)
+
+FLUSH_RETRIES = 3
+
+
+class VoteQueueFull(Exception):
+    """Raised when the ingestion queue cannot accept another vote"""
+
+
+class VoteWriter:
+    """
+    Write-behind vote ingestion.
+
+    Validated votes are queued in memory and a single background thread
+    flushes them with multi-row INSERTs, committing once per batch (and
+    vote shard) together with the matching tally increments. A batch is written when it reaches
+    ``batch_size`` rows or when ``batch_interval`` has elapsed since its first
+    row, whichever comes first. ``stop()`` drains the queue so every
+    acknowledged vote is committed on graceful shutdown.
+
+    A batch the database still refuses after FLUSH_RETRIES attempts is
+    spilled to an fsynced file in ``spill_dir`` instead of being dropped,
+    and written again every ``spill_retry_s`` and at the next start.
+
+    Voters already hold a 202 receipt, so a row refused at write time (its
+    contest closed or changed since it was queued, or the unique index found
+    an earlier vote) is recorded in ``rejected_votes`` with the reason rather
+    than dropped; GET /api/votes/receipt/{contest_id}/{vote_hash} reports it.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, batch_interval_ms: int, spill_dir: str,
+                 spill_retry_s: float, shards: VoteShards = vote_shards):
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval_ms / 1000
+        self.spill_dir = spill_dir
+        self.spill_retry_s = spill_retry_s
+        self._shards = shards
+        self._queue = queue.Queue(maxsize=max_size)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self.written = 0
+        self.failed = 0
+        self.spilled = 0
+        self.rejected = defaultdict(int)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        """Start the background writer thread"""
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="vote-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Stop accepting votes and wait until every queued vote is committed"""
+        with self._lock:
+            self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, row: dict, version: int, shard: int = PRIMARY_SHARD) -> bool:
+        """
+        Queue a validated vote row for writing to its contest's vote shard.
+
+        ``version`` is the contest version the row was validated against;
+        the row is validated again when it is written if that changed.
+        Returns False if the same voter already has a vote waiting in the
+        queue for this contest. Raises VoteQueueFull when the queue is at
+        capacity or the writer is shutting down.
+        """
+        key = (row["contest_id"], row["voter_identifier"])
+        with self._lock:
+            if self._stopping.is_set() or not self.running:
+                raise VoteQueueFull("Vote writer is not accepting votes")
+            if key in self._pending:
+                return False
+            try:
+                self._queue.put_nowait((shard, row, version))
+            except queue.Full:
+                raise VoteQueueFull("Vote queue is full")
+            self._pending.add(key)
+        return True
+
+    def _run(self):
+        spills_left = not self._replay_spills(recover=True)
+        next_replay = time.monotonic() + self.spill_retry_s
+        while True:
+            batch = self._take_batch()
+            if batch:
+                by_shard, versions = defaultdict(list), {}
+                for shard, row, version in batch:
+                    by_shard[shard].append(row)
+                    versions[row["vote_hash"]] = version
+                for shard, rows in by_shard.items():
+                    spills_left = not self._flush(shard, rows, versions) or spills_left
+            elif self._stopping.is_set() and self._queue.empty():
+                break
+            if spills_left and time.monotonic() >= next_replay:
+                spills_left = not self._replay_spills()
+                next_replay = time.monotonic() + self.spill_retry_s
+
+    def _take_batch(self) -> list:
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = self.batch_interval if deadline is None else deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if deadline is None:
+                deadline = time.monotonic() + self.batch_interval
+            batch.append(item)
+        return batch
+
+    def _flush(self, shard: int, batch: list, versions: dict) -> bool:
+        """Write a batch, spilling it to disk if the database keeps failing; False when spilled"""
+        unwritten = list(batch)
+        for attempt in range(1, FLUSH_RETRIES + 1):
+            if self._write(shard, unwritten, versions):
+                self._release(batch)
+                return True
+            logger.error("Vote batch flush failed (attempt %d/%d)", attempt, FLUSH_RETRIES)
+            time.sleep(self.batch_interval * attempt)
+        # Spilled voters stay pending here until their votes are written
+        spilled = {id(row) for row in unwritten}
+        self._release([row for row in batch if id(row) not in spilled])
+        self._spill(shard, unwritten, versions)
+        return False
+
+    def _write(self, shard: int, batch: list, versions: dict) -> bool:
+        primary = self._shards.open_session(PRIMARY_SHARD)
+        try:
+            with self._shards.session(primary, shard) as db:
+                try:
+                    self._recheck(primary, batch, versions)
+                    if batch:
+                        db.execute(insert(Vote), batch)
+                        record_votes(db, batch)
+                        db.commit()
+                        self.written += len(batch)
+                except IntegrityError:
+                    db.rollback()
+                    return self._flush_rows(db, primary, batch)
+                except SQLAlchemyError:
+                    db.rollback()
+                    primary.rollback()
+                    logger.exception("Vote batch of %d rows could not be written to shard %d", len(batch), shard)
+                    return False
+        finally:
+            primary.close()
+        return True
+
+    def _recheck(self, primary, batch: list, versions: dict):
+        """
+        Validate again the rows whose contest changed since they were queued.
+
+        The version guard of direct votes, once per batch: contest versions
+        are re-read on the primary just before the insert, and rows the
+        contest no longer accepts are recorded as rejected and removed from
+        ``batch``.
+        """
+        contest_ids = {row["contest_id"] for row in batch}
+        current = dict(primary.query(Contest.id, Contest.version).filter(Contest.id.in_(contest_ids)))
+        refreshed, valid, rejects = set(), [], []
+        for row in batch:
+            contest_id = row["contest_id"]
+            if current.get(contest_id) != versions.get(row["vote_hash"]):
+                if contest_id not in refreshed:
+                    contest_registry.invalidate(contest_id)
+                    refreshed.add(contest_id)
+                _, error = contest_registry.validate(primary, contest_id, row["contestant_id"], row["timestamp"])
+                if error:
+                    rejects.append((row, error))
+                    continue
+                versions[row["vote_hash"]] = current.get(contest_id)
+            valid.append(row)
+        if rejects:
+            self._record_rejects(primary, rejects, "contest")
+        batch[:] = valid
+
+    def _record_rejects(self, primary, rejects: list, reason: str):
+        """Store refused rows by receipt hash; a row recorded by an earlier attempt is skipped"""
+        for row, error in rejects:
+            try:
+                with primary.begin_nested():
+                    primary.execute(insert(RejectedVote), [{
+                        "vote_hash": row["vote_hash"],
+                        "contest_id": row["contest_id"],
+                        "contestant_id": row["contestant_id"],
+                        "voter_identifier": row["voter_identifier"],
+                        "vote_method": row["vote_method"],
+                        "timestamp": row["timestamp"],
+                        "reason": error
+                    }])
+            except IntegrityError:
+                pass
+        primary.commit()
+        self.rejected[reason] += len(rejects)
+        logger.warning(
+            "Rejected %d queued votes (%s): %s", len(rejects), reason, [row["vote_hash"] for row, _ in rejects]
+        )
+
+    def _release(self, batch: list):
+        with self._lock:
+            for row in batch:
+                self._pending.discard((row["contest_id"], row["voter_identifier"]))
+        for contest_id in {row["contest_id"] for row in batch}:
+            response_cache.invalidate(f"results:{contest_id}", f"contestants:{contest_id}")
+
+    def _spill(self, shard: int, batch: list, versions: dict):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"votes-{shard}-{time.time_ns()}-{os.getpid()}.ndjson")
+        try:
+            with open(path + ".partial", "w", encoding="utf-8") as stream:
+                for row in batch:
+                    timestamp = row["timestamp"]
+                    stream.write(json.dumps({
+                        **row,
+                        "timestamp": timestamp and timestamp.isoformat(),
+                        "contest_version": versions.get(row["vote_hash"])
+                    }) + "\n")
+                stream.flush()
+                os.fsync(stream.fileno())
+            os.replace(path + ".partial", path)
+        except OSError:
+            # Nowhere left to keep them: this is the only case votes are lost
+            self.failed += len(batch)
+            self._release(batch)
+            logger.exception(
+                "Dropped %d queued votes that could not be spilled: %s", len(batch), [row["vote_hash"] for row in batch]
+            )
+            return
+        self.spilled += len(batch)
+        logger.error("Spilled %d queued votes to %s; they are retried every %ss", len(batch), path, self.spill_retry_s)
+
+    def _replay_spills(self, recover: bool = False) -> bool:
+        """
+        Write spilled batches again, oldest first; True when none are left.
+
+        A file is claimed by renaming it, so workers sharing ``spill_dir``
+        never replay the same batch. With ``recover``, claims left behind
+        by a worker that died mid-replay are released first.
+        """
+        if recover:
+            for claimed in glob.glob(os.path.join(self.spill_dir, "*.ndjson.*.replaying")):
+                pid = int(claimed.rsplit(".", 2)[1])
+                if pid == os.getpid() or not _process_alive(pid):
+                    os.replace(claimed, claimed.rsplit(".", 2)[0])
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, "*.ndjson"))):
+            claimed = f"{path}.{os.getpid()}.replaying"
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue
+            shard = int(os.path.basename(path).split("-")[1])
+            with open(claimed, encoding="utf-8") as stream:
+                batch = [json.loads(line) for line in stream]
+            versions = {}
+            for row in batch:
+                versions[row["vote_hash"]] = row.pop("contest_version", None)
+                if row["timestamp"] is not None:
+                    row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+            if shard >= self._shards.count or not self._write(shard, list(batch), versions):
+                os.replace(claimed, path)
+                return False
+            os.remove(claimed)
+            self.spilled -= min(self.spilled, len(batch))
+            self._release(batch)
+            logger.info("Replayed %d spilled votes from %s", len(batch), path)
+        return True
+
+    def _flush_rows(self, db, primary, batch: list) -> bool:
+        """
+        Fall back to one row per statement so a single conflict does not sink the batch.
+
+        On a database error the rows handled so far are removed from
+        ``batch`` and False is returned, so only the rest is retried.
+        """
+        for done, row in enumerate(batch):
+            try:
+                try:
+                    db.execute(insert(Vote), [row])
+                    record_votes(db, [row])
+                    db.commit()
+                    self.written += 1
+                except IntegrityError:
+                    db.rollback()
+                    # A replayed spill can hold rows committed just before a crash
+                    if db.query(Vote.id).filter(Vote.vote_hash == row["vote_hash"]).first() is None:
+                        self._record_rejects(primary, [(row, "You have already voted in this contest")], "duplicate")
+            except SQLAlchemyError:
+                db.rollback()
+                primary.rollback()
+                logger.exception("Vote row could not be written")
+                del batch[:done]
+                return False
+        return True
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+vote_writer = VoteWriter(
+    max_size=config.VOTE_QUEUE_MAX_SIZE,
+    batch_size=config.VOTE_BATCH_SIZE,
+    batch_interval_ms=config.VOTE_BATCH_INTERVAL_MS,
+    spill_dir=config.VOTE_SPILL_DIR,
+    spill_retry_s=config.VOTE_SPILL_RETRY_S
+)
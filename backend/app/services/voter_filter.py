@@ -0,0 +1,326 @@
+"""
+Per-contest duplicate-voter prefilter.
+
+Each open contest gets a scalable Bloom filter of the voter identifiers
+that have voted in it. Direct vote writes insert and let the unique index
+on (contest_id, voter_identifier) reject repeats; a voter the filter has
+probably seen ("maybe": real repeats and about VOTER_FILTER_FP_RATE of new
+voters) is looked up first instead, so a repeat costs a read rather than a
+failed INSERT under the write lock. The importer drops voters it has never
+seen from its IN checks. Queued votes do not use it (see below).
+
+Filters are built by a background thread: at startup for active
+contests, and on first use for any other contest. Until a contest's
+filter is built every answer is "unknown" and the database is asked as
+before. Votes are added by ``record_votes`` in the inserting transaction,
+and the thread re-reads each shard's newest votes every
+VOTER_FILTER_REFRESH_S to pick up votes written by other workers. Filters
+of closed contests are dropped.
+
+Bits are only ever set, and a voter is added before their vote commits,
+so in this worker a voter who voted is never reported as new. A vote
+committed by another worker is only seen after the next refresh; a repeat
+vote through a second worker in that window is rejected by the unique
+index at once. Queued votes are acknowledged before they reach the index,
+so they always get the lookup and never rely on the filter.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func, select
+
+from app.core import config
+from app.core.sharding import vote_shards
+from app.database import SessionLocal
+from app.models import Contest, Vote
+from app.models.contest import ContestStatus
+
+logger = logging.getLogger(__name__)
+
+# Each new stage doubles the capacity and halves the false-positive rate,
+# so the stages together stay under the configured rate
+GROWTH = 2
+TIGHTENING = 0.5
+BUILD_CHUNK = 50000
+
+
+def _key_hashes(voter_identifier: str):
+    digest = hashlib.blake2b(voter_identifier.encode(), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    """Fixed-capacity Bloom filter over a bit array, with double hashing"""
+
+    __slots__ = ("capacity", "fp_rate", "size", "hashes", "bits", "count")
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.size = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def contains(self, h1: int, h2: int) -> bool:
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, h1: int, h2: int):
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def estimated_fp_rate(self) -> float:
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class VoterFilter:
+    """Scalable Bloom filter of one contest's voter identifiers"""
+
+    def __init__(self, fp_rate: float, capacity: int):
+        self.fp_rate = fp_rate
+        self.stages = [BloomFilter(capacity, fp_rate * TIGHTENING)]
+        self.ready = False
+        # Adds are read-modify-write on shared bytes; checks need no lock
+        self._lock = threading.Lock()
+
+    def __contains__(self, voter_identifier: str) -> bool:
+        h1, h2 = _key_hashes(voter_identifier)
+        return any(stage.contains(h1, h2) for stage in reversed(self.stages))
+
+    def add_many(self, voter_identifiers: Iterable[str]):
+        for voter_identifier in voter_identifiers:
+            h1, h2 = _key_hashes(voter_identifier)
+            # Locked per voter so a build never holds up the vote path
+            with self._lock:
+                # Re-reads overlap, so skip voters already present to keep
+                # the counts that drive growth honest
+                if any(stage.contains(h1, h2) for stage in self.stages):
+                    continue
+                stage = self.stages[-1]
+                if stage.count >= stage.capacity:
+                    stage = BloomFilter(stage.capacity * GROWTH, stage.fp_rate * TIGHTENING)
+                    self.stages.append(stage)
+                stage.add(h1, h2)
+
+    @property
+    def count(self) -> int:
+        return sum(stage.count for stage in self.stages)
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(len(stage.bits) for stage in self.stages)
+
+    def stats(self) -> dict:
+        count = self.count
+        return {
+            "ready": self.ready,
+            "voters": count,
+            "stages": len(self.stages),
+            "memory_bytes": self.memory_bytes,
+            "bits_per_voter": round(self.memory_bytes * 8 / count, 1) if count else None,
+            "estimated_fp_rate": 1 - math.prod(1 - stage.estimated_fp_rate() for stage in self.stages)
+        }
+
+
+class VoterFilters:
+    def __init__(self, fp_rate: float, initial_capacity: int, refresh_s: float, settle_s: float,
+                 session_factory=SessionLocal):
+        self.fp_rate = fp_rate
+        self.initial_capacity = initial_capacity
+        self.refresh_s = refresh_s
+        self.settle = settle_s
+        self._session_factory = session_factory
+        self._filters: Dict[int, VoterFilter] = {}
+        self._shard_of: Dict[int, int] = {}
+        self._wanted = set()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        # shard -> [(monotonic time, highest vote id seen)], oldest first
+        self._seen: Dict[int, deque] = {}
+        self.checks = {"new": 0, "maybe": 0, "unknown": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Build filters for active contests and keep them current in a background thread"""
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="voter-filter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._filters.clear()
+        self._shard_of.clear()
+        self._wanted.clear()
+        self._seen.clear()
+
+    def check(self, contest_id: int, voter_identifier: str) -> Optional[bool]:
+        """
+        Whether a voter may have voted in a contest.
+
+        False means definitely not, True means maybe (look it up), and None
+        means the contest's filter is not built yet.
+        """
+        voter_filter = self._filters.get(contest_id)
+        if voter_filter is None or not voter_filter.ready:
+            if voter_filter is None and self.running and contest_id not in self._wanted:
+                self._wanted.add(contest_id)
+                self._wake.set()
+            self.checks["unknown"] += 1
+            return None
+        if voter_identifier in voter_filter:
+            self.checks["maybe"] += 1
+            return True
+        self.checks["new"] += 1
+        return False
+
+    def add_rows(self, rows: list):
+        """Add inserted vote rows; runs in the inserting transaction, before it commits"""
+        by_contest = {}
+        for row in rows:
+            voter_filter = self._filters.get(row["contest_id"])
+            if voter_filter is not None and row.get("voter_identifier"):
+                by_contest.setdefault(voter_filter, []).append(row["voter_identifier"])
+        for voter_filter, voters in by_contest.items():
+            voter_filter.add_many(voters)
+
+    def _run(self):
+        try:
+            self._wanted.update(self._active_contests())
+        except Exception:
+            logger.exception("Could not list active contests for voter filters")
+        while not self._stopping.is_set():
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Voter filter refresh failed")
+            self._wake.wait(self.refresh_s)
+            self._wake.clear()
+
+    def _active_contests(self) -> list:
+        db = self._session_factory()
+        try:
+            return [contest_id for (contest_id,) in db.query(Contest.id).filter(Contest.status == ContestStatus.ACTIVE)]
+        finally:
+            db.close()
+
+    def tick(self, now: float = None):
+        """Catch up on new votes, drop closed contests' filters and build requested ones"""
+        now = time.monotonic() if now is None else now
+        for shard in set(self._shard_of.values()):
+            self._catch_up(shard, now)
+
+        db = self._session_factory()
+        try:
+            contests = dict(db.query(Contest.id, Contest.status).filter(
+                Contest.id.in_(set(self._filters) | self._wanted)
+            ).all())
+            for contest_id in list(self._filters):
+                if contests.get(contest_id) in (None, ContestStatus.CLOSED):
+                    del self._filters[contest_id]
+                    del self._shard_of[contest_id]
+            while self._wanted and not self._stopping.is_set():
+                contest_id = self._wanted.pop()
+                if contests.get(contest_id) not in (None, ContestStatus.CLOSED):
+                    self._build(db, contest_id, now)
+        finally:
+            db.close()
+
+    def _highest(self, votes_db) -> int:
+        return votes_db.query(func.max(Vote.id)).scalar() or 0
+
+    def _settled(self, shard: int, now: float) -> int:
+        """Highest vote id of the shard seen at least ``settle`` seconds ago"""
+        seen = self._seen[shard]
+        while len(seen) > 1 and seen[1][0] <= now - self.settle:
+            seen.popleft()
+        return seen[0][1]
+
+    def _catch_up(self, shard: int, now: float):
+        """
+        Add votes written since the last refresh, by any worker.
+
+        Re-reads from the highest id seen ``settle`` seconds ago, so a vote
+        whose transaction took a lower id but committed later is not missed.
+        """
+        votes_db = vote_shards.open_session(shard)
+        try:
+            rows = votes_db.execute(
+                select(Vote.id, Vote.contest_id, Vote.voter_identifier)
+                .where(Vote.id > self._settled(shard, now))
+                .order_by(Vote.id)
+            ).all()
+        finally:
+            votes_db.close()
+        if rows:
+            self._seen[shard].append((now, rows[-1][0]))
+            self.add_rows([{"contest_id": contest_id, "voter_identifier": voter} for _, contest_id, voter in rows])
+
+    def _build(self, db, contest_id: int, now: float):
+        shard = db.query(Contest.shard).filter(Contest.id == contest_id).scalar()
+        votes_db = vote_shards.open_session(shard)
+        try:
+            if shard not in self._seen:
+                # Catch-ups start from here, so nothing committed after the
+                # scan below takes its snapshot is missed
+                self._seen[shard] = deque([(now, self._highest(votes_db))])
+            voters = votes_db.query(func.count(Vote.id)).filter(Vote.contest_id == contest_id).scalar()
+            voter_filter = VoterFilter(self.fp_rate, max(self.initial_capacity, voters + voters // 4))
+            # Registered before the scan so votes inserted meanwhile land in it
+            self._filters[contest_id] = voter_filter
+            self._shard_of[contest_id] = shard
+            started = time.perf_counter()
+            result = votes_db.execute(
+                select(Vote.voter_identifier).where(Vote.contest_id == contest_id)
+                .execution_options(yield_per=BUILD_CHUNK)
+            )
+            for chunk in result.scalars().partitions():
+                voter_filter.add_many(chunk)
+                if self._stopping.is_set():
+                    return
+        finally:
+            votes_db.close()
+        voter_filter.ready = True
+        logger.info(
+            "Voter filter for contest %s: %d voters, %d KiB, built in %.1fs",
+            contest_id, voter_filter.count, voter_filter.memory_bytes // 1024, time.perf_counter() - started
+        )
+
+    def stats(self) -> dict:
+        filters = dict(self._filters)
+        return {
+            "running": self.running,
+            "checks": dict(self.checks),
+            "memory_bytes": sum(voter_filter.memory_bytes for voter_filter in filters.values()),
+            "contests": {contest_id: voter_filter.stats() for contest_id, voter_filter in sorted(filters.items())}
+        }
+
+
+voter_filters = VoterFilters(
+    fp_rate=config.VOTER_FILTER_FP_RATE,
+    initial_capacity=config.VOTER_FILTER_INITIAL_CAPACITY,
+    refresh_s=config.VOTER_FILTER_REFRESH_S,
+    settle_s=config.VOTER_FILTER_SETTLE_S
+)
@@ -0,0 +1,156 @@
+"""
+Keyset pagination and sparse field selection for list endpoints.
+
+List endpoints keep returning a plain JSON array, so existing clients are
+unaffected. Passing any of ``limit``, ``cursor``, ``fields`` or
+``include_total`` switches a request to paged mode:
+
+- rows come in ascending ``id`` order, at most ``limit`` (default
+  LIST_DEFAULT_LIMIT) per page;
+- the opaque cursor for the next page goes in ``X-Next-Cursor`` and in a
+  ``Link: <...>; rel="next"`` header, and is absent on the last page;
+- ``fields=id,name`` returns only those fields, and only their columns
+  are read from the database;
+- ``include_total=true`` adds the number of matching rows, ignoring the
+  cursor, as ``X-Total-Count``.
+"""
+import base64
+import binascii
+import json
+from functools import lru_cache
+from typing import List, Optional
+
+from fastapi import HTTPException, Query, Request, Response
+from pydantic import ConfigDict, TypeAdapter, create_model
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import config
+
+
+class ListParams:
+    """Query parameters shared by the paged list endpoints (a FastAPI dependency)"""
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(
+            None, ge=1, le=config.LIST_MAX_LIMIT, description="Page size; enables paging"
+        ),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name"),
+        include_total: bool = Query(False, description="Add X-Total-Count with the number of matching rows")
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = fields
+        self.include_total = include_total
+
+    @property
+    def paged(self) -> bool:
+        return any((self.limit, self.cursor, self.fields, self.include_total))
+
+    @property
+    def page_size(self) -> int:
+        return self.limit or config.LIST_DEFAULT_LIMIT
+
+    @property
+    def after_id(self) -> int:
+        return decode_cursor(self.cursor) if self.cursor else 0
+
+    def selected(self, model: type) -> tuple:
+        """Requested fields of ``model`` in declaration order; always includes id"""
+        names = list(model.model_fields)
+        if not self.fields:
+            return tuple(names)
+        requested = {name.strip() for name in self.fields.split(",") if name.strip()}
+        unknown = requested - set(names)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}; choose from {', '.join(names)}"
+            )
+        requested.add("id")
+        return tuple(name for name in names if name in requested)
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        last_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))["id"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(last_id, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last_id
+
+
+@lru_cache(maxsize=256)
+def list_adapter(model: type, fields: tuple) -> TypeAdapter:
+    """TypeAdapter for a list of ``model`` narrowed to ``fields``"""
+    if fields == tuple(model.model_fields):
+        return TypeAdapter(List[model])
+    narrowed = create_model(
+        f"{model.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields}
+    )
+    return TypeAdapter(List[narrowed])
+
+
+def selected_columns(entity, fields: tuple) -> list:
+    """Table columns of ``entity`` among ``fields``; computed fields are left to the caller"""
+    return [getattr(entity, name) for name in fields if name in entity.__table__.c]
+
+
+def page_query(statement, id_column, params: ListParams):
+    """Keyset page of ``statement``: rows after the cursor, by id, one extra to detect a next page"""
+    return statement.where(id_column > params.after_id).order_by(id_column).limit(params.page_size + 1)
+
+
+def count_query(statement):
+    return select(func.count()).select_from(statement.order_by(None).subquery())
+
+
+def page_response(
+    request: Request, params: ListParams, model: type, rows: list, total: Optional[int] = None
+) -> Response:
+    """
+    Serialize a page fetched with ``page_query``.
+
+    ``rows`` may hold one row more than the page size, which only signals
+    that a next page exists.
+    """
+    fields = params.selected(model)
+    headers = {}
+    if len(rows) > params.page_size:
+        rows = rows[:params.page_size]
+        next_cursor = encode_cursor(rows[-1]["id"] if isinstance(rows[-1], dict) else rows[-1].id)
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    if total is not None:
+        headers["X-Total-Count"] = str(total)
+    adapter = list_adapter(model, fields)
+    body = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def respond_page(request: Request, params: ListParams, db: Session, model: type, entity, *criteria) -> Response:
+    """One page of ``entity`` rows matching ``criteria``, serialized as ``model``"""
+    statement = select(*selected_columns(entity, params.selected(model))).where(*criteria)
+    rows = db.execute(page_query(statement, entity.id, params)).all()
+    total = db.scalar(count_query(statement)) if params.include_total else None
+    return page_response(request, params, model, rows, total)
+
+
+async def respond_page_async(
+    request: Request, params: ListParams, db: AsyncSession, model: type, entity, *criteria
+) -> Response:
+    """Same as ``respond_page`` on an AsyncSession"""
+    statement = select(*selected_columns(entity, params.selected(model))).where(*criteria)
+    rows = (await db.execute(page_query(statement, entity.id, params))).all()
+    total = await db.scalar(count_query(statement)) if params.include_total else None
+    return page_response(request, params, model, rows, total)
@@ -8,6 +8,8 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models.admin import Admin
+from app.services.password_pool import password_pool, PasswordPoolBusy, PasswordPoolTimeout
+from app.services.principal_cache import principal_cache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -25,6 +27,24 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the password worker pool"""
+    return await _on_password_pool(password_pool.verify(plain_password, hashed_password))
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the password worker pool"""
+    return await _on_password_pool(password_pool.hash(password))
+
+async def _on_password_pool(call):
+    try:
+        return await call
+    except (PasswordPoolBusy, PasswordPoolTimeout):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in attempts in progress, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -41,7 +61,16 @@ def get_current_admin(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> Admin:
-    """Get the current authenticated admin user"""
+    """
+    Get the current authenticated admin user
+
+    Recently verified tokens are served from the principal cache without
+    decoding the JWT or querying the admin again.
+    """
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -66,6 +95,7 @@ def get_current_admin(
             detail="Admin account is inactive"
         )
     
+    principal_cache.put(token, admin, payload.get("exp"))
     return admin
 
 def get_current_active_admin(
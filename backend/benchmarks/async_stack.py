@@ -0,0 +1,110 @@
+"""
+Sync vs async database stack under concurrency.
+
+    cd backend
+    python -m benchmarks.async_stack --requests 4000 --concurrency 200
+
+Drives ``cast_vote`` and ``get_vote_results`` in-process over ASGI (needs
+``httpx``). The async stack is the real app (async routes on the aiosqlite /
+asyncpg engine); the sync stack mounts the same logic as plain ``def``
+routes, which FastAPI runs on its threadpool. The response cache is
+disabled so every request reaches the database. Failed requests (e.g.
+SQLite "database is locked" under write contention) are counted as errors.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.common import use_database, seed_contest, percentiles, report
+
+
+def build_sync_app():
+    from contextlib import contextmanager
+    from fastapi import FastAPI, Response
+    from app.database import SessionLocal
+    from app.routes.votes import record_vote
+    from app.schemas import VoteCreate, VoteResponse, VoteResults
+    from app.services.results import build_vote_results
+
+    sync_app = FastAPI()
+
+    # Sessions are opened and closed inside the route's worker thread: with a
+    # yield dependency the teardown needs a second threadpool slot, which
+    # deadlocks once every slot is blocked on pool checkout
+    @contextmanager
+    def session():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @sync_app.post("/api/votes/", response_model=VoteResponse, status_code=201)
+    def cast_vote(vote: VoteCreate, response: Response):
+        with session() as db:
+            return record_vote(db, vote, response)
+
+    @sync_app.get("/api/votes/results/{contest_id}", response_model=VoteResults)
+    def get_vote_results(contest_id: int):
+        with session() as db:
+            return build_vote_results(db, contest_id)
+
+    return sync_app
+
+
+async def drive(app, label: str, requests: int, concurrency: int, contest_id: int, contestant_ids: list):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for endpoint in ("cast_vote", "get_vote_results"):
+            latencies = []
+            errors = 0
+            counter = iter(range(requests))
+
+            async def worker():
+                nonlocal errors
+                for i in counter:
+                    started = time.perf_counter()
+                    if endpoint == "cast_vote":
+                        response = await client.post("/api/votes/", json={
+                            "contest_id": contest_id,
+                            "contestant_id": contestant_ids[i % len(contestant_ids)],
+                            "voter_identifier": f"{label}-voter-{i:09d}"
+                        })
+                    else:
+                        response = await client.get(f"/api/votes/results/{contest_id}")
+                    latencies.append(time.perf_counter() - started)
+                    errors += response.status_code >= 400
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+            report(f"{label} {endpoint}", requests, elapsed, errors=errors, **percentiles(latencies, (50, 99)))
+
+    from app.database import async_engine
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    use_database(args.database_url)
+    os.environ["CACHE_BACKEND"] = "none"
+    from app.database import SessionLocal
+    from app.main import app
+
+    for label, target in (("sync", build_sync_app()), ("async", app)):
+        db = SessionLocal()
+        contest_id, contestant_ids = seed_contest(db, contestants=20, name=f"{label} stack")
+        db.close()
+        asyncio.run(drive(target, label, args.requests, args.concurrency, contest_id, contestant_ids))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def use_database(url: str = None) -> str:
+    """
+    Point the app at a benchmark database.
+
+    Must be called before anything under ``app`` is imported, because the
+    engine is created at import time from DATABASE_URL.
+    """
+    if url is None:
+        url = f"sqlite:///{tempfile.mktemp(prefix='yivote-bench-', suffix='.db')}"
+    os.environ["DATABASE_URL"] = url
+    # Load generators send every vote from one address; benchmarks.rate_limit
+    # measures the limiter on its own
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    return url
+
+
+def seed_contest(db, contestants: int = 10, name: str = "Benchmark contest"):
+    """Create an active contest with the given number of contestants"""
+    from app.models import Contest, Contestant
+    from app.models.contest import ContestStatus
+
+    now = datetime.utcnow()
+    contest = Contest(
+        name=name,
+        start_date=now - timedelta(days=1),
+        end_date=now + timedelta(days=1),
+        status=ContestStatus.ACTIVE
+    )
+    db.add(contest)
+    db.flush()
+    db.add_all(
+        Contestant(contest_id=contest.id, name=f"Contestant {i}", region=f"Region {i % 16}")
+        for i in range(contestants)
+    )
+    db.commit()
+    contestant_ids = [c.id for c in contest.contestants]
+    return contest.id, contestant_ids
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def report(label: str, count: int, elapsed: float, **extra):
+    rate = count / elapsed if elapsed else 0
+    details = " ".join(f"{key}={value}" for key, value in extra.items())
+    print(f"{label:<28} {count:>10} in {elapsed:8.3f}s  {rate:12.1f}/s  {details}")
+
+
+def percentiles(samples: list, points=(50, 95, 99)) -> dict:
+    """Latency percentiles in milliseconds from a list of durations in seconds"""
+    if not samples:
+        return {f"p{point}": None for point in points}
+    ordered = sorted(samples)
+    return {
+        f"p{point}": round(ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))] * 1000, 2)
+        for point in points
+    }
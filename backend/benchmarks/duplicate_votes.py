@@ -0,0 +1,94 @@
+"""
+Concurrent duplicate-vote check.
+
+    cd backend
+    python -m benchmarks.duplicate_votes --voters 50 --attempts 20
+
+For each voter, fires --attempts simultaneous ``record_vote`` calls from a
+thread pool and verifies that exactly one was accepted, that the others
+were rejected as repeat votes, and that the votes table and tallies agree.
+Exits non-zero if any voter ends up with more or fewer than one vote.
+"""
+import argparse
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import use_database, seed_contest, Timer, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--voters", type=int, default=50)
+    parser.add_argument("--attempts", type=int, default=20, help="Parallel votes fired per voter")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    use_database(args.database_url)
+    from fastapi import HTTPException, Response
+    from sqlalchemy import func
+    from app.core.migrations import upgrade
+    from app.database import engine, SessionLocal
+    from app.models import Vote, ContestantTally
+    from app.routes.votes import record_vote
+    from app.schemas import VoteCreate
+    upgrade(engine)
+
+    db = SessionLocal()
+    contest_id, contestant_ids = seed_contest(db, contestants=5, name="Duplicate race")
+    db.close()
+
+    outcomes = Counter()
+    lock = threading.Lock()
+
+    def attempt(voter: int, barrier: threading.Barrier, index: int):
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            record_vote(
+                session,
+                VoteCreate(
+                    contest_id=contest_id,
+                    contestant_id=contestant_ids[index % len(contestant_ids)],
+                    voter_identifier=f"race-voter-{voter:06d}"
+                ),
+                Response()
+            )
+            outcome = "accepted"
+        except HTTPException as exc:
+            outcome = f"{exc.status_code} {exc.detail}"
+        except Exception as exc:
+            outcome = f"error {type(exc).__name__}"
+        finally:
+            session.close()
+        with lock:
+            outcomes[outcome] += 1
+
+    with Timer() as elapsed:
+        with ThreadPoolExecutor(args.attempts) as pool:
+            for voter in range(args.voters):
+                barrier = threading.Barrier(args.attempts)
+                list(pool.map(lambda index: attempt(voter, barrier, index), range(args.attempts)))
+
+    db = SessionLocal()
+    per_voter = db.query(Vote.voter_identifier, func.count(Vote.id)).filter(
+        Vote.contest_id == contest_id
+    ).group_by(Vote.voter_identifier).all()
+    tallied = db.query(func.sum(ContestantTally.vote_count)).filter(
+        ContestantTally.contest_id == contest_id
+    ).scalar()
+    db.close()
+
+    report("duplicate race", args.voters * args.attempts, elapsed.elapsed, **{
+        key.replace(" ", "_"): value for key, value in outcomes.items()
+    })
+    bad = [voter for voter, count in per_voter if count != 1]
+    print(f"voters with a vote: {len(per_voter)}/{args.voters}  tallied: {tallied}  violations: {len(bad)}")
+    ok = not bad and len(per_voter) == args.voters and tallied == args.voters and outcomes["accepted"] == args.voters
+    print("OK" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Fast JSON path for results and contestant lists, on a large contest.
+
+    cd backend
+    python -m benchmarks.fast_json --contestants 10000 --requests 50
+
+Seeds one contest with --contestants contestants and a tally for each,
+then measures:
+
+- serialization alone: validate + dump (the schema path) against the
+  trusted dump, with orjson and with pydantic's untyped serializer;
+- GET /api/votes/results/{id} and GET /api/contestants/contest/{id} over
+  ASGI with the response cache off, FAST_JSON_ENABLED off and on.
+
+Every fast body is checked to be byte-identical to the schema path's.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.common import use_database, seed_contest, Timer, report, percentiles
+
+
+def serialization(db, contest_id: int, rounds: int):
+    from app.routes.contestants import ContestantListAdapter, list_contestants
+    from app.services.results import VoteResultsAdapter, build_vote_results
+    from app.utils import serialization as fast
+
+    for label, adapter, data in (
+        ("results", VoteResultsAdapter, build_vote_results(db, contest_id)),
+        ("contestants", ContestantListAdapter, list_contestants(db, contest_id))
+    ):
+        expected = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+        orjson = fast.orjson
+        for name, use_orjson in (("validate+dump", None), ("trusted pydantic", False), ("trusted orjson", True)):
+            if use_orjson and orjson is None:
+                print(f"{label}: {name:<18} skipped (orjson is not installed)")
+                continue
+            fast.orjson = orjson if use_orjson else None
+            dump = (lambda: adapter.dump_json(adapter.validate_python(data, from_attributes=True))) \
+                if use_orjson is None else (lambda: fast.dump_trusted(data))
+            with Timer() as timer:
+                for _ in range(rounds):
+                    body = dump()
+            fast.orjson = orjson
+            assert body == expected, f"{label}: {name} output differs from the schema path"
+            report(f"{label}: {name}", rounds, timer.elapsed,
+                   ms_per_dump=round(timer.elapsed / rounds * 1000, 2), kb=len(body) // 1024)
+
+
+async def endpoints(contest_id: int, requests: int):
+    import httpx
+    from app.core import config
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    bodies = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, path in (
+            ("results", f"/api/votes/results/{contest_id}"),
+            ("contestants", f"/api/contestants/contest/{contest_id}")
+        ):
+            for enabled in (False, True):
+                config.FAST_JSON_ENABLED = enabled
+                await client.get(path)
+                latencies = []
+                started = time.perf_counter()
+                for _ in range(requests):
+                    sent = time.perf_counter()
+                    response = await client.get(path)
+                    latencies.append(time.perf_counter() - sent)
+                    response.raise_for_status()
+                elapsed = time.perf_counter() - started
+                bodies[enabled] = response.content
+                report(f"{label}: fast {'on' if enabled else 'off'}", requests, elapsed,
+                       **percentiles(latencies))
+            assert bodies[True] == bodies[False], f"{path}: fast path body differs"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--contestants", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20, help="Dumps per serializer")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    # Every request should build and serialize its body
+    os.environ["CACHE_BACKEND"] = "none"
+    use_database(args.database_url)
+    from app.main import app  # noqa: F401  creates the tables
+    from app.database import SessionLocal, async_engine
+    from app.models import Contest
+    from app.services.tallies import record_votes
+    from app.core.sharding import vote_shards
+
+    db = SessionLocal()
+    contest_id, contestant_ids = seed_contest(db, contestants=args.contestants, name="Fast JSON")
+    contest = db.get(Contest, contest_id)
+    with vote_shards.session(db, contest.shard) as votes_db:
+        record_votes(votes_db, [
+            {"contest_id": contest_id, "contestant_id": contestant_id, "vote_method": "web",
+             "timestamp": contest.start_date}
+            for n, contestant_id in enumerate(contestant_ids) for _ in range(n % 7)
+        ])
+        votes_db.commit()
+
+    serialization(db, contest_id, args.rounds)
+    db.close()
+
+    async def run():
+        await endpoints(contest_id, args.requests)
+        await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
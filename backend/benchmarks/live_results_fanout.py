@@ -0,0 +1,115 @@
+"""
+Live results fan-out load test.
+
+    cd backend
+    python -m benchmarks.live_results_fanout --subscribers 5000 --seconds 10
+
+Holds thousands of concurrent subscribers on one contest while votes are
+written in the background, then reports how many aggregate queries ran
+(should be about one per tick, independent of subscriber count), how many
+updates were delivered or coalesced, and the fan-out delay from publish to
+the last subscriber receiving it.
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+from benchmarks.common import use_database, seed_contest, report
+
+
+def write_votes(contest_id: int, contestant_ids: list, stop: threading.Event, per_commit: int = 50):
+    from sqlalchemy import insert
+    from app.database import SessionLocal
+    from app.models import Vote
+    from app.services.tallies import record_votes
+
+    db = SessionLocal()
+    written = 0
+    try:
+        while not stop.is_set():
+            rows = [
+                {
+                    "contest_id": contest_id,
+                    "contestant_id": contestant_ids[(written + i) % len(contestant_ids)],
+                    "voter_identifier": f"fanout-voter-{written + i:09d}",
+                    "vote_method": "web",
+                    "vote_hash": f"fanout-{written + i:058d}",
+                }
+                for i in range(per_commit)
+            ]
+            db.execute(insert(Vote), rows)
+            record_votes(db, rows)
+            db.commit()
+            written += per_commit
+            time.sleep(0.01)
+    finally:
+        db.close()
+    return written
+
+
+async def run(subscribers: int, seconds: float, tick_ms: int, slow_every: int):
+    from app.database import SessionLocal
+    from app.services.live_results import ResultsBroadcaster
+
+    db = SessionLocal()
+    contest_id, contestant_ids = seed_contest(db, contestants=20, name="Fan-out contest")
+    db.close()
+
+    broadcaster = ResultsBroadcaster(tick_ms=tick_ms)
+    received = [0] * subscribers
+    receive_times = {}
+    coalesced = [0] * subscribers
+    deadline = time.monotonic() + seconds
+
+    async def consume(index: int):
+        async with broadcaster.subscribe(contest_id) as subscription:
+            while time.monotonic() < deadline:
+                try:
+                    payload = await subscription.get(timeout=max(deadline - time.monotonic(), 0.001))
+                except asyncio.TimeoutError:
+                    break
+                received[index] += 1
+                receive_times.setdefault(payload, []).append(time.perf_counter())
+                if slow_every and index % slow_every == 0:
+                    await asyncio.sleep(tick_ms / 1000 * 3)
+            coalesced[index] = subscription.coalesced
+
+    stop = threading.Event()
+    writer = threading.Thread(target=write_votes, args=(contest_id, contestant_ids, stop), daemon=True)
+    writer.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(consume(i) for i in range(subscribers)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    writer.join()
+    await broadcaster.shutdown()
+
+    spreads = sorted(max(times) - min(times) for times in receive_times.values() if len(times) > 1)
+    report("aggregate queries", broadcaster.aggregations, elapsed, tick_ms=tick_ms)
+    report("updates published", broadcaster.published, elapsed)
+    report("updates delivered", sum(received), elapsed, subscribers=subscribers)
+    report("updates coalesced", sum(coalesced), elapsed, slow_every=slow_every)
+    if spreads:
+        print(f"fan-out spread  p50={spreads[len(spreads) // 2] * 1000:.2f}ms  max={spreads[-1] * 1000:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--tick-ms", type=int, default=250)
+    parser.add_argument("--slow-every", type=int, default=10, help="Make every Nth subscriber a slow consumer (0 = none)")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    use_database(args.database_url)
+    from app.database import engine, Base
+    import app.models  # noqa: F401
+    Base.metadata.create_all(bind=engine)
+
+    asyncio.run(run(args.subscribers, args.seconds, args.tick_ms, args.slow_every))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Vote latency during a login storm.
+
+    cd backend
+    python -m benchmarks.login_storm --seconds 10 --voters 20 --logins 50
+
+Runs --voters clients casting votes for --seconds, three times over ASGI
+(needs ``httpx``): on their own, alongside --logins clients hammering
+POST /api/admin/login (bcrypt on the password worker pool), and alongside
+the same storm against a copy of the old login that verifies inline on
+the request threadpool. Reports vote latency percentiles for each run,
+plus login outcomes (200 vs fast 503 rejections).
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+from benchmarks.common import use_database, seed_contest, percentiles, report
+
+
+def add_inline_login(app):
+    """The pre-pool login: bcrypt runs inline on a threadpool thread"""
+    from fastapi import Depends, HTTPException
+    from sqlalchemy.orm import Session
+    from app.database import get_db
+    from app.models import Admin
+    from app.schemas import AdminLogin
+    from app.utils.security import verify_password
+
+    def inline_login(credentials: AdminLogin, db: Session = Depends(get_db)):
+        admin = db.query(Admin).filter(Admin.email == credentials.email).first()
+        if not admin or not verify_password(credentials.password, admin.hashed_password):
+            raise HTTPException(status_code=401, detail="Incorrect email or password")
+        return {"ok": True}
+
+    app.add_api_route("/bench/login-inline", inline_login, methods=["POST"])
+
+
+async def run_phase(app, label: str, args, contest_id: int, contestant_ids: list, login_path: str = None):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    deadline = time.perf_counter() + args.seconds
+    vote_latencies, login_latencies = [], []
+    login_outcomes = Counter()
+    vote_errors = 0
+    counter = iter(range(10 ** 9))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def voter():
+            nonlocal vote_errors
+            while time.perf_counter() < deadline:
+                i = next(counter)
+                started = time.perf_counter()
+                response = await client.post("/api/votes/", json={
+                    "contest_id": contest_id,
+                    "contestant_id": contestant_ids[i % len(contestant_ids)],
+                    "voter_identifier": f"{label}-voter-{i:09d}"
+                })
+                vote_latencies.append(time.perf_counter() - started)
+                vote_errors += response.status_code >= 400
+
+        async def login_client():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.post(login_path, json={
+                    "email": "storm@example.com", "password": "storm-password"
+                })
+                login_latencies.append(time.perf_counter() - started)
+                login_outcomes[response.status_code] += 1
+                if response.status_code == 503:
+                    await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+
+        clients = [voter() for _ in range(args.voters)]
+        if login_path:
+            clients += [login_client() for _ in range(args.logins)]
+        started = time.perf_counter()
+        await asyncio.gather(*clients)
+        elapsed = time.perf_counter() - started
+
+    report(f"{label}: votes", len(vote_latencies), elapsed, errors=vote_errors, **percentiles(vote_latencies))
+    if login_path:
+        report(f"{label}: logins", len(login_latencies), elapsed,
+               **{f"http_{code}": count for code, count in sorted(login_outcomes.items())},
+               **percentiles(login_latencies, (50, 99)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--voters", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    use_database(args.database_url)
+    from app.database import SessionLocal, async_engine
+    from app.main import app
+    from app.models import Admin
+    from app.services.password_pool import password_pool
+    from app.utils.security import get_password_hash
+
+    add_inline_login(app)
+    db = SessionLocal()
+    db.add(Admin(email="storm@example.com", username="storm", full_name="Storm",
+                 hashed_password=get_password_hash("storm-password"), role="admin"))
+    db.commit()
+    contest_id, contestant_ids = seed_contest(db, contestants=10, name="Login storm")
+    db.close()
+
+    async def phases():
+        await run_phase(app, "baseline", args, contest_id, contestant_ids)
+        await run_phase(app, "pooled storm", args, contest_id, contestant_ids, "/api/admin/login")
+        await run_phase(app, "inline storm", args, contest_id, contestant_ids, "/bench/login-inline")
+        await async_engine.dispose()
+
+    asyncio.run(phases())
+    print("password pool:", password_pool.stats())
+    password_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Merkle log appends, roots and inclusion proofs on a large contest.
+
+    cd backend
+    python -m benchmarks.merkle_log --leaves 10000000 --batch 10000
+
+Appends --leaves synthetic leaf hashes to one contest's tiled tree in
+batches of --batch, the way the background appender does (append, then
+recompute the root, then commit), and reports:
+
+- append + incremental root time per batch, and tiles read per root;
+- inclusion proof generation and verification p50/p95/p99 over
+  --proofs random leaves, each from a cold tile cache, and tiles read
+  per proof;
+- the database size per million leaves.
+
+The final root is checked against a from-scratch computation over the
+same leaves, and every proof is verified against it.
+
+--votes then runs the real appender over that many cast votes in a
+second contest, to measure end-to-end throughput including the reads
+from the votes table.
+"""
+import argparse
+import hashlib
+import os
+import random
+import time
+
+from benchmarks.common import use_database, seed_contest, Timer, report, percentiles
+
+
+def synthetic_leaves(start: int, count: int):
+    from app.services.merkle_log import leaf_hash
+
+    return [leaf_hash(hashlib.sha256(str(n).encode()).digest()) for n in range(start, start + count)]
+
+
+def tree_operations(db, contest_id: int, leaves: int, batch: int, proofs: int):
+    from app.services.merkle_log import MerkleTree, TileStore, stream_root, verify_inclusion
+
+    append_times, root_reads = [], []
+    size = 0
+    with Timer() as total:
+        while size < leaves:
+            chunk = synthetic_leaves(size, min(batch, leaves - size))
+            started = time.perf_counter()
+            tiles = TileStore(db, contest_id)
+            tree = MerkleTree(tiles, size)
+            tree.append(chunk)
+            reads = tiles.reads
+            root = tree.root()
+            db.commit()
+            append_times.append(time.perf_counter() - started)
+            root_reads.append(tiles.reads - reads)
+            size = tree.size
+    report("append + root per batch", size, total.elapsed, batches=len(append_times),
+           max_root_tile_reads=max(root_reads), **percentiles(append_times))
+
+    with Timer() as timer:
+        cold_root = MerkleTree(TileStore(db, contest_id), size).root()
+    report("root, cold tiles", 1, timer.elapsed)
+
+    with Timer() as timer:
+        _, expected = stream_root(
+            leaf for start in range(0, size, batch) for leaf in synthetic_leaves(start, min(batch, size - start))
+        )
+    assert root == cold_root == expected, "tiled root differs from the from-scratch root"
+    report("root from scratch", size, timer.elapsed)
+
+    rng = random.Random(7)
+    indexes = [rng.randrange(size) for _ in range(proofs)]
+    proof_times, verify_times, proof_reads, paths = [], [], [], []
+    for index in indexes:
+        started = time.perf_counter()
+        tiles = TileStore(db, contest_id)
+        tree = MerkleTree(tiles, size)
+        path = tree.inclusion_proof(index)
+        leaf = tree.leaf(index)
+        proof_times.append(time.perf_counter() - started)
+        proof_reads.append(tiles.reads)
+        paths.append((index, leaf, path))
+    for index, leaf, path in paths:
+        started = time.perf_counter()
+        assert verify_inclusion(leaf, index, size, path, root), f"proof for leaf {index} does not verify"
+        verify_times.append(time.perf_counter() - started)
+    report("inclusion proof", proofs, sum(proof_times), path_length=len(paths[0][2]),
+           max_tile_reads=max(proof_reads), **percentiles(proof_times))
+    report("verify proof", proofs, sum(verify_times), **percentiles(verify_times))
+
+
+def appender(db, votes: int, batch: int):
+    from datetime import datetime
+    from sqlalchemy import insert
+    from app.core.sharding import vote_shards
+    from app.models import Contest, MerkleLog, Vote
+    from app.services.merkle_log import MerkleAppender
+    from app.services.tallies import record_votes
+
+    contest_id, contestant_ids = seed_contest(db, contestants=10, name="Merkle appender")
+    contest = db.get(Contest, contest_id)
+    with vote_shards.session(db, contest.shard) as votes_db:
+        for start in range(0, votes, 50000):
+            rows = [
+                {"contest_id": contest_id, "contestant_id": contestant_ids[n % 10], "voter_identifier": f"v{n}",
+                 "vote_method": "web", "vote_hash": hashlib.sha256(f"merkle-{n}".encode()).hexdigest(),
+                 "timestamp": datetime.utcnow()}
+                for n in range(start, min(votes, start + 50000))
+            ]
+            votes_db.execute(insert(Vote), rows)
+            record_votes(votes_db, rows)
+            votes_db.commit()
+
+    worker = MerkleAppender(interval_s=0, batch_size=batch)
+    with Timer() as timer:
+        while worker.tick():
+            pass
+    with vote_shards.session(db, contest.shard) as votes_db:
+        assert votes_db.get(MerkleLog, contest_id).tree_size == votes
+    report("appender end to end", votes, timer.elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--leaves", type=int, default=10000000)
+    parser.add_argument("--batch", type=int, default=10000)
+    parser.add_argument("--proofs", type=int, default=1000)
+    parser.add_argument("--votes", type=int, default=100000, help="Votes for the end-to-end appender run (0 = skip)")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    url = use_database(args.database_url)
+    from app.main import app  # noqa: F401  creates the tables
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    contest_id, _ = seed_contest(db, contestants=1, name="Merkle log")
+    tree_operations(db, contest_id, args.leaves, args.batch, args.proofs)
+    if url.startswith("sqlite:///"):
+        megabytes = os.path.getsize(url[len("sqlite:///"):]) / 1e6
+        print(f"database size {megabytes:.1f} MB ({megabytes / args.leaves * 1e6:.1f} MB per million leaves)")
+    if args.votes:
+        appender(db, args.votes, args.batch)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Contestant photo rendering and serving.
+
+    cd backend
+    python -m benchmarks.photo_pipeline --photos 24 --requests 2000
+
+Generates --photos JPEGs of --width x --height pixels in a temporary
+PHOTO_DIR and renders their variants (PHOTO_SIZES in WebP and JPEG),
+first one after another in this process and then through the pipeline's
+process pool of PHOTO_WORKERS. Reports renders per second and bytes per
+variant against the original. Then, over ASGI, fetches a card variant
+--requests times each as a full GET, a conditional GET that the ETag
+turns into a 304, and a 16 KiB range request, with p50/p95/p99.
+"""
+import argparse
+import asyncio
+import io
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.common import use_database, Timer, report, percentiles
+
+
+def make_photo(width: int, height: int, seed: int) -> bytes:
+    """A noisy JPEG, so encoders cannot shortcut flat colour"""
+    from PIL import Image, ImageFilter
+
+    rng = random.Random(seed)
+    image = Image.frombytes("RGB", (width // 8, height // 8), rng.randbytes(width // 8 * height // 8 * 3))
+    image = image.resize((width, height), Image.Resampling.BILINEAR).filter(ImageFilter.SMOOTH)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def variant_sizes(directory: str, variants: dict) -> dict:
+    return {
+        f"{name}.{fmt}": os.path.getsize(os.path.join(directory, variant[fmt]))
+        for name, variant in variants.items() for fmt in variant if fmt not in ("width", "height")
+    }
+
+
+async def serve(client, url: str, requests: int, label: str, **headers):
+    latencies, statuses = [], set()
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        statuses.add(response.status_code)
+    report(label, requests, sum(latencies), status=",".join(map(str, sorted(statuses))), **percentiles(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--photos", type=int, default=24)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per serving mode")
+    args = parser.parse_args()
+
+    os.environ["PHOTO_DIR"] = tempfile.mkdtemp(prefix="yivote-photos-")
+    os.environ["CACHE_BACKEND"] = "none"
+    use_database()
+    import httpx
+    from app.core import config
+    from app.main import app
+    from app.services.photo_render import probe, render
+    from app.services.photos import photo_directory, store_original, variant_urls
+
+    with Timer() as timer:
+        originals = [make_photo(args.width, args.height, seed) for seed in range(args.photos)]
+    report("generate originals", args.photos, timer.elapsed,
+           mb=round(sum(map(len, originals)) / 1e6, 1))
+    digests = [store_original(data, probe(data)) for data in originals]
+    jobs = [
+        (os.path.join(photo_directory(digest), "original.jpg"), photo_directory(digest),
+         config.PHOTO_SIZES, config.PHOTO_FORMATS, config.PHOTO_QUALITY)
+        for digest in digests
+    ]
+
+    half = len(jobs) // 2
+    with Timer() as timer:
+        for job in jobs[:half]:
+            render(*job)
+    report("render in process", half, timer.elapsed)
+
+    workers = config.PHOTO_WORKERS
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("forkserver")) as pool:
+        # Start the workers before timing
+        list(pool.map(abs, range(workers)))
+        with Timer() as timer:
+            rendered = list(pool.map(render, *zip(*jobs[half:])))
+    report(f"render in pool ({workers} workers)", len(rendered), timer.elapsed)
+
+    sizes = variant_sizes(jobs[-1][1], rendered[-1])
+    print(f"original {len(originals[-1]) / 1e3:.0f} KB; variants (KB):",
+          {name: round(size / 1e3, 1) for name, size in sizes.items()})
+
+    from app.database import async_engine
+    url = variant_urls(digests[-1], rendered[-1])["card"]["webp"]
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            etag = (await client.get(url)).headers["etag"]
+            await serve(client, url, args.requests, "GET card.webp")
+            await serve(client, url, args.requests, "GET card.webp If-None-Match", **{"If-None-Match": etag})
+            await serve(client, url, args.requests, "GET card.webp Range 16 KiB", Range="bytes=0-16383")
+        await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Cost of the vote rate limiter.
+
+    cd backend
+    python -m benchmarks.rate_limit --checks 200000 --requests 2000
+
+Measures three things:
+
+- ``RateLimiter.check`` on the memory store, for allowed votes (distinct
+  voters) and rejected ones (one voter over the limit);
+- store memory per tracked key, for --keys keys;
+- a duplicate-vote flood over ASGI (needs ``httpx``): latency of the 429
+  answered by the middleware, against the 400 "already voted" that
+  the route answers after its database work when the limiter is off.
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from benchmarks.common import use_database, seed_contest, Timer, report, percentiles
+
+
+async def check_cost(checks: int):
+    from app.services.rate_limit import MemoryRateLimitStore, RateLimiter
+
+    limiter = RateLimiter(MemoryRateLimitStore(checks + 1), voter_limit=(5, 60), ip_limit=None)
+    with Timer() as allowed:
+        for i in range(checks):
+            await limiter.check(1, f"voter-{i}", "web", "10.0.0.1")
+    report("check: allowed", checks, allowed.elapsed, us_per_check=round(allowed.elapsed / checks * 1e6, 2))
+
+    with Timer() as rejected:
+        for _ in range(checks):
+            await limiter.check(1, "flooder", "web", "10.0.0.1")
+    report("check: rejected", checks, rejected.elapsed,
+           us_per_check=round(rejected.elapsed / checks * 1e6, 2), rejected=limiter.rejected)
+
+
+async def key_memory(keys: int):
+    from app.services.rate_limit import MemoryRateLimitStore
+
+    store = MemoryRateLimitStore(keys)
+    now = time.time()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(keys):
+        await store.hit(f"voter:1:+23320{i:09d}", (5, 60.0), now)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    report("store: keys", keys, 0, mb=round(used / 1e6, 1), bytes_per_key=round(used / keys))
+
+
+async def flood(app, contest_id: int, contestant_id: int, requests: int, limited: bool):
+    import httpx
+    from app.core import config
+
+    config.RATE_LIMIT_ENABLED = limited
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    vote = {"contest_id": contest_id, "contestant_id": contestant_id, "voter_identifier": f"flooder-{limited}"}
+    latencies, statuses = [], {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/api/votes/", json=vote)
+        started = time.perf_counter()
+        for _ in range(requests):
+            sent = time.perf_counter()
+            response = await client.post("/api/votes/", json=vote)
+            latencies.append(time.perf_counter() - sent)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        elapsed = time.perf_counter() - started
+    label = "flood: limiter on" if limited else "flood: limiter off"
+    report(label, requests, elapsed, **{f"http_{code}": count for code, count in statuses.items()},
+           **percentiles(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--checks", type=int, default=200000)
+    parser.add_argument("--keys", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    use_database(args.database_url)
+    from app.database import SessionLocal, async_engine
+    from app.main import app
+
+    db = SessionLocal()
+    contest_id, contestant_ids = seed_contest(db, contestants=5, name="Rate limit")
+    db.close()
+
+    async def run():
+        await check_cost(args.checks)
+        await key_memory(args.keys)
+        await flood(app, contest_id, contestant_ids[0], args.requests, limited=False)
+        await flood(app, contest_id, contestant_ids[0], args.requests, limited=True)
+        await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Read-replica routing under a mixed vote/read load, with SQLite file copies.
+
+    cd backend
+    python -m benchmarks.read_replicas --replicas 2 --duration 10
+
+Seeds a contest on a temporary SQLite primary and copies the database
+into --replicas files, which serve as replicas. The copies are never
+refreshed, so the staleness limit is raised for the run. Then, over ASGI
+with the response cache off, --writers tasks cast votes while --readers
+tasks fetch results and contestant lists, first with every read on the
+primary and then with reads routed to the replicas (--policy). Reports
+read latency and vote throughput for both.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.common import use_database, seed_contest, report, percentiles
+
+
+def copy_database(source: str, target: str):
+    """Consistent copy of a live SQLite database (WAL included)"""
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+
+async def mixed_load(client, contest_id: int, contestant_ids: list, writers: int, readers: int,
+                     duration: float, label: str):
+    deadline = time.perf_counter() + duration
+    voters = itertools.count()
+    reads, votes, errors = [], [], 0
+
+    async def write():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            n = next(voters)
+            started = time.perf_counter()
+            response = await client.post("/api/votes/", json={
+                "contest_id": contest_id, "contestant_id": contestant_ids[n % len(contestant_ids)],
+                "voter_identifier": f"replica-bench-{label}-{n:08d}"
+            })
+            votes.append(time.perf_counter() - started)
+            errors += response.status_code >= 400
+
+    async def read():
+        nonlocal errors
+        paths = itertools.cycle((f"/api/votes/results/{contest_id}", f"/api/contestants/contest/{contest_id}"))
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.get(next(paths))
+            reads.append(time.perf_counter() - started)
+            errors += response.status_code >= 400
+
+    await asyncio.gather(*(write() for _ in range(writers)), *(read() for _ in range(readers)))
+    report(f"{label}: reads", len(reads), duration, errors=errors, **percentiles(reads))
+    report(f"{label}: votes", len(votes), duration, **percentiles(votes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--replicas", type=int, default=2)
+    parser.add_argument("--policy", choices=("round_robin", "least_loaded"), default="round_robin")
+    parser.add_argument("--contestants", type=int, default=1000)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="yivote-replicas-")
+    primary = os.path.join(workdir, "primary.db")
+    replicas = [os.path.join(workdir, f"replica-{n}.db") for n in range(1, args.replicas + 1)]
+    os.environ.update({
+        "CACHE_BACKEND": "none",
+        "READ_REPLICA_URLS": ",".join(f"sqlite:///{path}" for path in replicas),
+        "READ_REPLICA_POLICY": args.policy,
+        "READ_REPLICA_MAX_STALENESS_S": "86400",
+        "READ_REPLICA_CHECK_S": "0.2"
+    })
+    use_database(f"sqlite:///{primary}")
+    import httpx
+    from app.main import app
+    from app.core.replicas import read_replicas
+    from app.database import SessionLocal, async_engine
+
+    db = SessionLocal()
+    contest_id, contestant_ids = seed_contest(db, contestants=args.contestants, name="Read replicas")
+    db.close()
+    # The copies carry this heartbeat; their lag is its age
+    read_replicas.beat()
+    for path in replicas:
+        copy_database(primary, path)
+
+    async def run():
+        routes = read_replicas.routes
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+                read_replicas.routes = frozenset()
+                await mixed_load(client, contest_id, contestant_ids, args.writers, args.readers,
+                                 args.duration, "primary only")
+                read_replicas.routes = routes
+                await asyncio.sleep(0.5)
+                assert read_replicas.usable(), "no replica passed the lag check"
+                await mixed_load(client, contest_id, contestant_ids, args.writers, args.readers,
+                                 args.duration, f"{args.replicas} replicas")
+                print("sessions per database:", read_replicas.stats()["reads"])
+        await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
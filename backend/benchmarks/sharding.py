@@ -0,0 +1,142 @@
+"""
+Vote sharding across several SQLite files.
+
+    cd backend
+    python -m benchmarks.sharding --shards 3 --contests 6 --votes 3000
+
+Points the app at a primary SQLite file plus --shards vote shard files,
+creates contests through the API and casts votes over ASGI (the async
+route) with --concurrency clients. Then checks that every contest's votes
+landed only on its shard, that results and tallies agree with the votes,
+and that the cross-shard admin listing comes back merged newest first.
+Exits non-zero on any mismatch.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import use_database, percentiles, report
+
+
+async def run(args) -> bool:
+    import httpx
+    from sqlalchemy import func
+    from app.core.sharding import vote_shards
+    from app.database import SessionLocal
+    from app.main import app
+    from app.models import Contest, Vote
+    from app.services.tallies import reconcile_tallies
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        now = datetime.utcnow()
+        contests = {}
+        for i in range(args.contests):
+            contest = (await client.post("/api/contests/", json={
+                "name": f"Sharded contest {i}",
+                "start_date": (now - timedelta(days=1)).isoformat(),
+                "end_date": (now + timedelta(days=1)).isoformat()
+            })).json()
+            await client.put(f"/api/contests/{contest['id']}", json={"status": "active"})
+            contests[contest["id"]] = [
+                (await client.post("/api/contestants/", json={"name": f"C{j}", "contest_id": contest["id"]})).json()["id"]
+                for j in range(5)
+            ]
+
+        contest_ids = list(contests)
+        latencies = []
+        errors = 0
+        counter = iter(range(args.votes))
+
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                contest_id = contest_ids[i % len(contest_ids)]
+                started = time.perf_counter()
+                response = await client.post("/api/votes/", json={
+                    "contest_id": contest_id,
+                    "contestant_id": contests[contest_id][i % 5],
+                    "voter_identifier": f"shard-voter-{i:09d}"
+                })
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code >= 400
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        report("cast_vote (sharded)", args.votes, time.perf_counter() - started, errors=errors,
+               **percentiles(latencies))
+
+        repeat = await client.post("/api/votes/", json={
+            "contest_id": contest_ids[0], "contestant_id": contests[contest_ids[0]][0],
+            "voter_identifier": "shard-voter-000000000"
+        })
+
+        await client.post("/api/admin/setup-first-admin", json={
+            "email": "bench@example.com", "password": "benchmark", "full_name": "Bench", "username": "bench"
+        })
+        token = (await client.post("/api/admin/login", json={
+            "email": "bench@example.com", "password": "benchmark"
+        })).json()["access_token"]
+        started = time.perf_counter()
+        listing = (await client.get("/api/votes/", params={"limit": 200},
+                                    headers={"Authorization": f"Bearer {token}"})).json()
+        report("list_votes fan-out", len(listing), time.perf_counter() - started)
+
+        totals = {
+            contest_id: (await client.get(f"/api/votes/results/{contest_id}")).json()["total_votes"]
+            for contest_id in contest_ids
+        }
+
+    db = SessionLocal()
+    placement = dict(db.query(Contest.id, Contest.shard).filter(Contest.id.in_(contest_ids)))
+    drift = reconcile_tallies(db, fix=False)
+    db.close()
+
+    def counts(votes_db):
+        return dict(votes_db.query(Vote.contest_id, func.count(Vote.id)).group_by(Vote.contest_id).all())
+
+    per_shard = vote_shards.fan_out(counts)
+    ok = errors == 0 and repeat.status_code == 400 and not drift
+    for shard, shard_counts in enumerate(per_shard):
+        print(f"shard {shard}: {shard_counts}")
+        for contest_id, count in shard_counts.items():
+            if placement.get(contest_id) != shard or totals[contest_id] != count:
+                print(f"  contest {contest_id}: {count} votes here, placed on {placement.get(contest_id)}, "
+                      f"results say {totals[contest_id]}")
+                ok = False
+    stored = sum(sum(shard_counts.values()) for shard_counts in per_shard)
+    timestamps = [vote["timestamp"] for vote in listing]
+    ok = ok and stored == args.votes and timestamps == sorted(timestamps, reverse=True) and len(listing) == 200
+    print(f"votes stored: {stored}/{args.votes}  drifted tallies: {len(drift)}  repeat vote: {repeat.status_code}")
+
+    from app.database import async_engine
+    await async_engine.dispose()
+    await vote_shards.dispose()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--shards", type=int, default=3)
+    parser.add_argument("--contests", type=int, default=6)
+    parser.add_argument("--votes", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    use_database()
+    os.environ["VOTE_SHARD_URLS"] = ",".join(
+        f"sqlite:///{tempfile.mktemp(prefix=f'yivote-shard{i}-', suffix='.db')}"
+        for i in range(1, args.shards + 1)
+    )
+    os.environ["CACHE_BACKEND"] = "none"
+    ok = asyncio.run(run(args))
+    print("OK" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Vote analytics from rollups, checked against the raw votes table.
+
+    cd backend
+    python -m benchmarks.vote_analytics --rows 500000
+
+Imports --rows votes spread over the last --hours through ``VoteImporter``,
+which keeps the rollups up to date like every other write path. Then every
+granularity and breakdown of GET /api/votes/analytics/{id} (needs
+``httpx``) is compared with the same numbers computed by GROUP BY over the
+votes table. Also checks that ``reconcile_rollups`` repairs a tampered
+bucket. Reports how long each source takes and exits non-zero on any
+mismatch.
+"""
+import argparse
+import sys
+from collections import Counter
+from datetime import datetime, timedelta
+
+from benchmarks.common import use_database, seed_contest, Timer, report
+
+SQLITE_BUCKETS = {"minute": "%Y-%m-%d %H:%M:00", "hour": "%Y-%m-%d %H:00:00", "day": "%Y-%m-%d 00:00:00"}
+
+
+def import_votes(db, rows: int, hours: float, contest_id: int, contestant_ids: list):
+    from app.services.vote_import import VoteImporter
+
+    start = datetime.utcnow() - timedelta(hours=hours)
+    step = hours * 3600 / rows
+    methods = ["sms", "ussd", "web", None]
+
+    def records():
+        for i in range(rows):
+            yield i + 1, {
+                "contest_id": contest_id,
+                "contestant_id": contestant_ids[i % len(contestant_ids)],
+                "voter_identifier": f"+23320{i:09d}",
+                "vote_method": methods[i % 7 % 4],
+                "timestamp": (start + timedelta(seconds=i * step)).isoformat()
+            }
+
+    importer = VoteImporter(db, batch_size=5000)
+    for _ in importer.run(records()):
+        pass
+    return importer
+
+
+def raw_series(db, contest_id: int, granularity: str, group_by: str = None,
+               since: datetime = None, until: datetime = None) -> Counter:
+    """(bucket_start, group) -> count straight from the votes table"""
+    from sqlalchemy import func, select
+    from app.models import Contestant, Vote
+    from app.services.rollups import bucket_start
+
+    if db.get_bind().dialect.name == "sqlite":
+        bucket = func.strftime(SQLITE_BUCKETS[granularity], Vote.timestamp)
+    else:
+        bucket = func.date_trunc(granularity, Vote.timestamp)
+    group = {
+        None: None,
+        "vote_method": Vote.vote_method,
+        "contestant": Vote.contestant_id,
+        "region": Contestant.region
+    }[group_by]
+
+    query = select(bucket, *([group] if group is not None else []), func.count(Vote.id)).where(
+        Vote.contest_id == contest_id
+    )
+    if group_by == "region":
+        query = query.join(Contestant, Contestant.id == Vote.contestant_id)
+    query = query.group_by(bucket, *([group] if group is not None else []))
+
+    counts = Counter()
+    for row in db.execute(query):
+        start = row[0] if isinstance(row[0], datetime) else datetime.fromisoformat(row[0])
+        key = None if group is None else (str(row[1]) if row[1] is not None else None)
+        if since is not None and start < bucket_start(since, granularity):
+            continue
+        if until is not None and start >= until:
+            continue
+        counts[(start, key or None)] += row[-1]
+    return counts
+
+
+def api_series(client, contest_id: int, params: dict) -> Counter:
+    response = client.get(f"/api/votes/analytics/{contest_id}", params=params)
+    response.raise_for_status()
+    return Counter({
+        (datetime.fromisoformat(point["bucket_start"]), point["group"]): point["vote_count"]
+        for point in response.json()["series"]
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--hours", type=float, default=20)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    use_database(args.database_url)
+    from fastapi.testclient import TestClient
+    from sqlalchemy import update
+    from app.database import SessionLocal
+    from app.main import app
+    from app.models import Contestant, VoteRollup
+    from app.services.rollups import reconcile_rollups
+
+    failures = 0
+    with TestClient(app) as client:
+        db = SessionLocal()
+        contest_id, contestant_ids = seed_contest(db, contestants=25, name="Analytics contest")
+        db.query(Contestant).filter(Contestant.id == contestant_ids[0]).update({"region": None})
+        db.commit()
+        with Timer() as imported:
+            importer = import_votes(db, args.rows, args.hours, contest_id, contestant_ids)
+        report("import (votes + rollups)", importer.accepted, imported.elapsed)
+
+        until = datetime.utcnow() - timedelta(hours=args.hours / 2)
+        since = until - timedelta(hours=1, seconds=30)
+        cases = [
+            {"granularity": granularity, **({"group_by": group_by} if group_by else {})}
+            for granularity in ("minute", "hour", "day")
+            for group_by in (None, "vote_method", "region", "contestant")
+        ]
+        cases.append({"granularity": "minute", "group_by": "region",
+                      "since": since.isoformat(), "until": until.isoformat()})
+
+        for params in cases:
+            label = " ".join(str(value)[:16] for value in params.values())
+            with Timer() as from_raw:
+                expected = raw_series(
+                    db, contest_id, params["granularity"], params.get("group_by"),
+                    since if "since" in params else None, until if "until" in params else None
+                )
+            with Timer() as from_rollups:
+                actual = api_series(client, contest_id, params)
+            ok = actual == expected
+            failures += not ok
+            report(label, sum(actual.values()), from_rollups.elapsed,
+                   raw_ms=round(from_raw.elapsed * 1000, 1),
+                   rollup_ms=round(from_rollups.elapsed * 1000, 1),
+                   buckets=len(actual), match="OK" if ok else "MISMATCH")
+
+        db.execute(update(VoteRollup).where(VoteRollup.contest_id == contest_id).values(vote_count=1))
+        db.commit()
+        drift = reconcile_rollups(db, contest_id=contest_id)
+        # A range not asked for before, so the answer is not served from the response cache
+        fresh = {"granularity": "hour", "since": "2000-01-01T00:00:00"}
+        repaired = len(drift) == 1 and api_series(client, contest_id, fresh) == raw_series(db, contest_id, "hour")
+        failures += not repaired
+        print(f"reconcile after tampering: {'OK' if repaired else 'FAILED'} {drift}")
+        db.close()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Archiving closed contests out of the hot votes table.
+
+    cd backend
+    python -m benchmarks.vote_archive --closed 9 --votes 500000 --live-votes 200000
+
+Seeds --closed closed, frozen contests of --votes votes each and one
+active contest of --live-votes votes on a temporary SQLite database, then
+archives and purges the closed ones the way ``archive-votes`` does.
+Reports, before and after:
+
+- the votes table and its indexes in MB (SQLite dbstat) and free pages;
+- a full ``reconcile-tallies`` pass, which scans every hot vote;
+- repeat-voter lookups on the active contest, p50/p95/p99;
+
+plus archive and purge throughput, archive bytes per vote against the
+table and index bytes per vote, and exporting a closed contest from the
+hot table versus from its archive (--format).
+
+The first closed contest also gets a sealed Merkle log, so its archive
+comes with a leaf index table: --proofs inclusion proofs are then served
+from it, against finding the leaf by scanning the archive.
+"""
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.common import use_database, seed_contest, Timer, report, percentiles
+
+SEED_CHUNK = 50000
+
+
+def seed_votes(db, contest_id: int, contestant_ids: list, votes: int):
+    from sqlalchemy import insert
+    from app.models import Vote
+    from app.services.tallies import record_votes
+
+    now = datetime.utcnow()
+    for start in range(0, votes, SEED_CHUNK):
+        rows = [
+            {"contest_id": contest_id, "contestant_id": contestant_ids[n % len(contestant_ids)],
+             "voter_identifier": f"voter-{contest_id}-{n:09d}", "vote_method": ("web", "sms", "ussd")[n % 3],
+             "vote_hash": hashlib.sha256(f"archive-{contest_id}-{n}".encode()).hexdigest(),
+             "ip_address": f"10.0.{n % 256}.{n // 256 % 256}", "timestamp": now}
+            for n in range(start, min(votes, start + SEED_CHUNK))
+        ]
+        db.execute(insert(Vote), rows)
+        record_votes(db, rows)
+        db.commit()
+
+
+def table_sizes(db) -> dict:
+    """MB used by the votes table and each of its indexes, and free pages in the file"""
+    from sqlalchemy import text
+
+    rows = db.execute(text(
+        "SELECT dbstat.name, SUM(pgsize) FROM dbstat JOIN sqlite_master ON sqlite_master.name = dbstat.name "
+        "WHERE sqlite_master.tbl_name = 'votes' GROUP BY dbstat.name ORDER BY dbstat.name"
+    )).all()
+    sizes = {name: round(size / 1e6, 1) for name, size in rows}
+    sizes["free_pages"] = db.execute(text("PRAGMA freelist_count")).scalar()
+    return sizes
+
+
+def measure(db, label: str, live_contest: int, live_votes: int, probes: int):
+    from app.models import Vote
+    from app.services.tallies import reconcile_tallies
+
+    sizes = table_sizes(db)
+    print(f"{label}: votes table and indexes (MB): {sizes}")
+    with Timer() as timer:
+        drift = reconcile_tallies(db, fix=False)
+    report(f"{label}: reconcile tallies", db.query(Vote.id).count(), timer.elapsed, drift=len(drift))
+
+    rng = random.Random(3)
+    latencies = []
+    for _ in range(probes):
+        voter = f"voter-{live_contest}-{rng.randrange(live_votes):09d}"
+        started = time.perf_counter()
+        db.query(Vote.id).filter(Vote.contest_id == live_contest, Vote.voter_identifier == voter).first()
+        latencies.append(time.perf_counter() - started)
+    report(f"{label}: repeat-voter lookup", probes, sum(latencies), **percentiles(latencies))
+    return sizes
+
+
+def proof_lookups(db, archive, votes: int, proofs: int):
+    from app.models import VoteArchive
+    from app.services.merkle_log import inclusion_proof
+    from app.services.vote_archive import archive_leaf_index
+
+    rng = random.Random(5)
+    hashes = [
+        hashlib.sha256(f"archive-{archive.contest_id}-{rng.randrange(votes)}".encode()).hexdigest()
+        for _ in range(proofs)
+    ]
+    latencies = []
+    for vote_hash in hashes:
+        started = time.perf_counter()
+        inclusion_proof(db, archive.contest_id, vote_hash)
+        latencies.append(time.perf_counter() - started)
+    report("proof from archive", proofs, sum(latencies), **percentiles(latencies))
+
+    # The same archive without its table, as archives written before it
+    unindexed = VoteArchive(contest_id=archive.contest_id, format=archive.format, file_name=archive.file_name)
+    scans = hashes[:max(1, proofs // 100)]
+    for label, target, lookups in (("leaf index", archive, hashes), ("archive scan", unindexed, scans)):
+        latencies = []
+        for vote_hash in lookups:
+            started = time.perf_counter()
+            assert archive_leaf_index(target, vote_hash) is not None
+            latencies.append(time.perf_counter() - started)
+        report(f"leaf lookup by {label}", len(lookups), sum(latencies), **percentiles(latencies))
+
+
+def seal_merkle_log(contest_id: int):
+    from app.services.merkle_log import MerkleAppender, merkle_root
+    from app.database import SessionLocal
+
+    worker = MerkleAppender(interval_s=0, batch_size=10000)
+    with Timer() as timer:
+        while worker.tick():
+            pass
+        worker.tick()
+    db = SessionLocal()
+    assert merkle_root(db, contest_id)["sealed"]
+    db.close()
+    report("append and seal Merkle log", worker.appended, timer.elapsed)
+
+
+def export_digest(fmt: str, shard: int, contest_id: int, archive=None):
+    """Size and SHA-256 of an export"""
+    from app.services.vote_export import export_votes
+
+    digest, size = hashlib.sha256(), 0
+    for chunk in export_votes(fmt, shard, contest_id, archive=archive):
+        digest.update(chunk)
+        size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--closed", type=int, default=9, help="Closed contests to archive")
+    parser.add_argument("--votes", type=int, default=500000, help="Votes per closed contest")
+    parser.add_argument("--live-votes", type=int, default=200000, help="Votes in the active contest")
+    parser.add_argument("--probes", type=int, default=20000, help="Repeat-voter lookups per measurement")
+    parser.add_argument("--format", choices=("ndjson", "parquet"), default="ndjson")
+    parser.add_argument("--proofs", type=int, default=2000, help="Inclusion proofs from the first archive")
+    args = parser.parse_args()
+
+    os.environ["VOTE_ARCHIVE_DIR"] = tempfile.mkdtemp(prefix="yivote-archive-")
+    os.environ["VOTE_ARCHIVE_FORMAT"] = args.format
+    # Seeded votes skip the Merkle appender; only the first contest gets a log
+    os.environ["MERKLE_ENABLED"] = "false"
+    use_database()
+    from app.main import app  # noqa: F401  creates the tables
+    from app.database import SessionLocal
+    from app.models import Contest
+    from app.models.contest import ContestStatus
+    from app.services.results import freeze_results
+    from app.services.vote_archive import archive_contest, purge_contest
+
+    db = SessionLocal()
+    closed = []
+    with Timer() as timer:
+        for n in range(args.closed):
+            contest_id, contestant_ids = seed_contest(db, contestants=10, name=f"Closed {n}")
+            seed_votes(db, contest_id, contestant_ids, args.votes)
+            db.get(Contest, contest_id).status = ContestStatus.CLOSED
+            db.commit()
+            assert freeze_results(db, contest_id)
+            closed.append(contest_id)
+            if n == 0:
+                seal_merkle_log(contest_id)
+        live_contest, contestant_ids = seed_contest(db, contestants=10, name="Live")
+        seed_votes(db, live_contest, contestant_ids, args.live_votes)
+    report("seed votes", args.closed * args.votes + args.live_votes, timer.elapsed)
+
+    before = measure(db, "before", live_contest, args.live_votes, args.probes)
+    with Timer() as timer:
+        hot_export = export_digest("csv", 0, closed[0])
+    report("export csv from votes", args.votes, timer.elapsed, mb=round(hot_export[0] / 1e6, 1))
+
+    archives = []
+    with Timer() as timer:
+        for contest_id in closed:
+            archives.append(archive_contest(db, contest_id, args.format))
+    archived_bytes = sum(archive.size_bytes for archive in archives)
+    report(f"archive ({args.format})", args.closed * args.votes, timer.elapsed,
+           mb=round(archived_bytes / 1e6, 1))
+    with Timer() as timer:
+        purged = sum(purge_contest(db, archive) for archive in archives)
+    report("purge hot rows", purged, timer.elapsed)
+
+    after = measure(db, "after", live_contest, args.live_votes, args.probes)
+    with Timer() as timer:
+        archive_export = export_digest("csv", 0, closed[0], archive=archives[0])
+    assert archive_export == hot_export, "export from the archive differs from the hot export"
+    report("export csv from archive", args.votes, timer.elapsed, mb=round(archive_export[0] / 1e6, 1))
+    leaves_mb = os.path.getsize(os.path.join(os.environ["VOTE_ARCHIVE_DIR"], archives[0].leaf_index_file)) / 1e6
+    print(f"leaf index table {leaves_mb:.1f} MB ({leaves_mb * 1e6 / args.votes:.0f} B/vote)")
+    proof_lookups(db, archives[0], args.votes, args.proofs)
+
+    total_votes = args.closed * args.votes + args.live_votes
+    hot_mb = sum(size for name, size in before.items() if name != "free_pages")
+    print(f"table + indexes {hot_mb / total_votes * 1e6:.0f} B/vote, "
+          f"archive {archived_bytes / (args.closed * args.votes):.0f} B/vote")
+    print(f"hot votes table + indexes {hot_mb:.1f} MB -> "
+          f"{sum(size for name, size in after.items() if name != 'free_pages'):.1f} MB; "
+          f"{after['free_pages']} free pages are reused by new votes (VACUUM returns them to the OS)")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Streaming vote export throughput.
+
+    cd backend
+    python -m benchmarks.vote_export --rows 1000000 --format csv ndjson
+
+Seeds --rows votes into one contest, then streams them through
+``export_votes`` into a null sink for each format and reports rows/second,
+bytes written and peak resident memory, which should stay flat as --rows
+grows (only one page is held at a time). On SQLite, run with
+SQLITE_MMAP_SIZE=0: mapped database pages otherwise count towards RSS.
+"""
+import argparse
+import resource
+from datetime import datetime, timedelta
+
+from benchmarks.common import use_database, seed_contest, Timer, report
+
+
+def seed_votes(db, rows: int, contest_id: int, contestant_ids: list, chunk: int = 50000):
+    from app.models import Vote
+
+    start = datetime.utcnow() - timedelta(hours=12)
+    for offset in range(0, rows, chunk):
+        db.execute(Vote.__table__.insert(), [
+            {
+                "contest_id": contest_id,
+                "contestant_id": contestant_ids[i % len(contestant_ids)],
+                "voter_identifier": f"+23320{i:09d}",
+                "vote_method": "ussd" if i % 3 else "sms",
+                "vote_hash": f"{i:064x}",
+                "ip_address": "10.0.0.1",
+                "timestamp": start + timedelta(milliseconds=i)
+            }
+            for i in range(offset, min(rows, offset + chunk))
+        ])
+        db.commit()
+
+
+def peak_rss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--format", nargs="+", choices=["csv", "ndjson", "parquet"], default=["csv", "ndjson"])
+    parser.add_argument("--page-size", type=int, default=10000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    use_database(args.database_url)
+    from app.database import engine, Base, SessionLocal
+    import app.models  # noqa: F401
+    from app.services.vote_export import export_votes
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        contest_id, contestant_ids = seed_contest(db, contestants=25, name="Export contest")
+        with Timer() as seeded:
+            seed_votes(db, args.rows, contest_id, contestant_ids)
+    finally:
+        db.close()
+    report("seed", args.rows, seeded.elapsed, peak_rss_mb=peak_rss_mb())
+
+    for fmt in args.format:
+        written = 0
+        with Timer() as exported:
+            for chunk in export_votes(fmt, 0, contest_id, page_size=args.page_size):
+                written += len(chunk)
+        report(f"export {fmt}", args.rows, exported.elapsed,
+               mb=round(written / 1e6, 1), peak_rss_mb=peak_rss_mb())
+
+
+if __name__ == "__main__":
+    main()
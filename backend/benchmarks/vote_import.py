@@ -0,0 +1,79 @@
+"""
+Bulk vote import throughput.
+
+    cd backend
+    python -m benchmarks.vote_import --rows 1000000 --format csv
+
+Generates a carrier-style dump (with a small share of duplicate and
+invalid rows), imports it through ``VoteImporter`` and reports rows/second
+and peak resident memory, which should stay flat as --rows grows.
+"""
+import argparse
+import json
+import os
+import resource
+import tempfile
+
+from benchmarks.common import use_database, seed_contest, Timer, report
+
+
+def write_dump(path: str, fmt: str, rows: int, contest_id: int, contestant_ids: list):
+    with open(path, "w", newline="") as out:
+        if fmt == "csv":
+            out.write("contest_id,contestant_id,voter_identifier,vote_method\n")
+        for i in range(rows):
+            # Every 50th row repeats an earlier voter, every 200th names an unknown contestant
+            voter = f"+23320{(i - 1 if i % 50 == 0 and i else i):09d}"
+            contestant_id = 0 if i % 200 == 199 else contestant_ids[i % len(contestant_ids)]
+            method = "ussd" if i % 3 else "sms"
+            if fmt == "csv":
+                out.write(f"{contest_id},{contestant_id},{voter},{method}\n")
+            else:
+                out.write(json.dumps({
+                    "contest_id": contest_id,
+                    "contestant_id": contestant_id,
+                    "voter_identifier": voter,
+                    "vote_method": method
+                }) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    use_database(args.database_url)
+    from app.database import engine, Base, SessionLocal
+    import app.models  # noqa: F401
+    from app.services.vote_import import VoteImporter, read_rows
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    contest_id, contestant_ids = seed_contest(db, contestants=25, name="Import contest")
+
+    fd, path = tempfile.mkstemp(suffix=f".{args.format}")
+    os.close(fd)
+    try:
+        with Timer() as generated:
+            write_dump(path, args.format, args.rows, contest_id, contestant_ids)
+        report("generate", args.rows, generated.elapsed, mb=round(os.path.getsize(path) / 1e6, 1))
+
+        importer = VoteImporter(db, batch_size=args.batch_size)
+        with Timer() as imported:
+            with open(path, newline="") as stream:
+                for _ in importer.run(read_rows(stream, args.format)):
+                    pass
+    finally:
+        db.close()
+        os.remove(path)
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    report("import", importer.total, imported.elapsed,
+           accepted=importer.accepted, rejected=importer.rejected, peak_rss_mb=round(peak_mb, 1))
+
+
+if __name__ == "__main__":
+    main()
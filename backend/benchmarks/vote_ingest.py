@@ -0,0 +1,77 @@
+"""
+Vote ingestion throughput: per-request commit vs the write-behind queue.
+
+    cd backend
+    python -m benchmarks.vote_ingest --votes 20000 --concurrency 16
+
+Calls ``record_vote`` (the body of ``cast_vote``) directly from a thread
+pool so the numbers reflect the DB path rather than HTTP.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import use_database, seed_contest, Timer, report
+
+
+def cast_votes(mode: str, votes: int, concurrency: int):
+    from fastapi import HTTPException, Response
+    from app.database import SessionLocal
+    from app.routes.votes import record_vote
+    from app.schemas import VoteCreate
+    from app.services.vote_queue import vote_writer
+
+    db = SessionLocal()
+    contest_id, contestant_ids = seed_contest(db, name=f"Ingest {mode}")
+    db.close()
+
+    def one(i: int) -> int:
+        session = SessionLocal()
+        try:
+            record_vote(
+                session,
+                VoteCreate(
+                    contest_id=contest_id,
+                    contestant_id=contestant_ids[i % len(contestant_ids)],
+                    voter_identifier=f"{mode}-voter-{i:09d}",
+                    vote_method="sms"
+                ),
+                Response()
+            )
+            return 0
+        except HTTPException:
+            return 1
+        finally:
+            session.close()
+
+    if mode == "queued":
+        vote_writer.start()
+    with Timer() as acked:
+        with ThreadPoolExecutor(concurrency) as pool:
+            errors = sum(pool.map(one, range(votes)))
+    with Timer() as drained:
+        vote_writer.stop()
+
+    report(f"{mode}: acknowledged", votes - errors, acked.elapsed, errors=errors)
+    if mode == "queued":
+        report(f"{mode}: durable", vote_writer.written, acked.elapsed + drained.elapsed,
+               drain_s=round(drained.elapsed, 3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--votes", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    use_database(args.database_url)
+    from app.database import engine, Base
+    import app.models  # noqa: F401
+    Base.metadata.create_all(bind=engine)
+
+    for mode in ("sync", "queued"):
+        cast_votes(mode, args.votes, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Duplicate-voter prefilter on a contest with millions of voters.
+
+    cd backend
+    python -m benchmarks.voter_filter --voters 10000000 --requests 2000
+
+Measures:
+
+- the filter alone: add rate, memory and bits per voter, check latency,
+  and the measured false-positive rate over --probes unseen voters
+  against VOTER_FILTER_FP_RATE;
+- building it from a votes table of --voters votes, as at startup;
+- the repeat-voter lookup it replaces, for existing and new voters;
+- POST /api/votes/ over ASGI with the filter off and on, for new voters
+  and for a flood of repeat voters, in --ingest mode, with the SQL
+  statements each vote ran. The filter only changes direct (sync) writes:
+  queued votes are always looked up.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+
+from benchmarks.common import use_database, seed_contest, Timer, report, percentiles
+
+SEED_CHUNK = 50000
+
+
+def voter(n: int) -> str:
+    return f"voter-{n:010d}"
+
+
+def filter_alone(voters: int, probes: int):
+    from app.core import config
+    from app.services.voter_filter import VoterFilter
+
+    voter_filter = VoterFilter(config.VOTER_FILTER_FP_RATE, voters)
+    with Timer() as timer:
+        voter_filter.add_many(voter(n) for n in range(voters))
+    stats = voter_filter.stats()
+    report("filter add", voters, timer.elapsed, mb=round(stats["memory_bytes"] / 1e6, 1),
+           bits_per_voter=stats["bits_per_voter"], hashes=voter_filter.stages[0].hashes)
+
+    for label, names in (("check seen", (voter(n) for n in range(0, voters, max(1, voters // probes)))),
+                         ("check unseen", (f"unseen-{n:010d}" for n in range(probes)))):
+        names = list(names)
+        with Timer() as timer:
+            hits = sum(name in voter_filter for name in names)
+        report(label, len(names), timer.elapsed, us_per_check=round(timer.elapsed / len(names) * 1e6, 2),
+               positives=hits, rate=round(hits / len(names), 5))
+    print(f"configured false-positive rate {config.VOTER_FILTER_FP_RATE}, "
+          f"estimated {stats['estimated_fp_rate']:.5f}")
+
+
+def seed(db, voters: int) -> int:
+    from datetime import datetime
+    from sqlalchemy import insert
+    from app.core.sharding import vote_shards
+    from app.models import Contest, Vote
+
+    contest_id, contestant_ids = seed_contest(db, contestants=10, name="Voter filter")
+    now = datetime.utcnow()
+    with Timer() as timer:
+        with vote_shards.session(db, db.get(Contest, contest_id).shard) as votes_db:
+            for start in range(0, voters, SEED_CHUNK):
+                votes_db.execute(insert(Vote), [
+                    {"contest_id": contest_id, "contestant_id": contestant_ids[n % 10], "voter_identifier": voter(n),
+                     "vote_method": "web", "vote_hash": hashlib.sha256(str(n).encode()).hexdigest(),
+                     "timestamp": now}
+                    for n in range(start, min(voters, start + SEED_CHUNK))
+                ])
+                votes_db.commit()
+    report("seed votes", voters, timer.elapsed)
+    return contest_id
+
+
+def build_and_lookups(db, contest_id: int, voters: int, probes: int):
+    from app.core.sharding import vote_shards
+    from app.models import Contest, Vote
+    from app.services.voter_filter import voter_filters
+
+    with Timer() as timer:
+        voter_filters._wanted.add(contest_id)
+        voter_filters.tick()
+    stats = voter_filters.stats()["contests"][contest_id]
+    report("filter build from votes", stats["voters"], timer.elapsed, mb=round(stats["memory_bytes"] / 1e6, 1))
+
+    with vote_shards.session(db, db.get(Contest, contest_id).shard) as votes_db:
+        for label, names in (("lookup existing voter", [voter(n) for n in range(0, voters, max(1, voters // probes))]),
+                             ("lookup new voter", [f"unseen-{n:010d}" for n in range(probes)])):
+            latencies = []
+            for name in names:
+                started = time.perf_counter()
+                votes_db.query(Vote.id).filter(Vote.contest_id == contest_id, Vote.voter_identifier == name).first()
+                latencies.append(time.perf_counter() - started)
+            report(f"{label} (SQL)", len(names), sum(latencies), **percentiles(latencies))
+            latencies = []
+            for name in names:
+                started = time.perf_counter()
+                voter_filters.check(contest_id, name)
+                latencies.append(time.perf_counter() - started)
+            report(f"{label} (filter)", len(names), sum(latencies), **percentiles(latencies))
+
+
+async def endpoints(contest_id: int, voters: int, requests: int):
+    import httpx
+    from sqlalchemy import event
+    from app.database import SessionLocal, async_engine, engine
+    from app.main import app
+    from app.models import Contestant
+    from app.services.voter_filter import voter_filters
+
+    db = SessionLocal()
+    contestant_id = db.query(Contestant.id).filter(Contestant.contest_id == contest_id).first()[0]
+    db.close()
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    for counted in (engine, async_engine.sync_engine):
+        event.listen(counted, "before_cursor_execute", count)
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # The filter built by build_and_lookups, then none
+            for enabled in (True, False):
+                if not enabled:
+                    voter_filters.stop()
+                for label, names in (
+                    ("new voters", (f"new-{int(enabled)}-{n:08d}" for n in range(requests))),
+                    ("repeat voters", (voter(n * (voters // requests or 1) % voters) for n in range(requests)))
+                ):
+                    latencies, statuses = [], set()
+                    statements = 0
+                    for name in names:
+                        started = time.perf_counter()
+                        response = await client.post("/api/votes/", json={
+                            "contest_id": contest_id, "contestant_id": contestant_id, "voter_identifier": name
+                        })
+                        latencies.append(time.perf_counter() - started)
+                        statuses.add(response.status_code)
+                    report(f"POST {label}, filter {'on' if enabled else 'off'}", requests, sum(latencies),
+                           statuses=sorted(statuses), sql_per_vote=round(statements / requests, 2),
+                           **percentiles(latencies))
+    voter_filters.stop()
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--voters", type=int, default=10000000)
+    parser.add_argument("--probes", type=int, default=100000, help="Voters checked per filter measurement")
+    parser.add_argument("--requests", type=int, default=2000, help="Votes posted per endpoint measurement")
+    parser.add_argument("--ingest", choices=("sync", "queued"), default="sync")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    os.environ["VOTE_INGEST_MODE"] = args.ingest
+    # The benchmark builds and drops the filter itself; keep other
+    # background work off the measurements
+    os.environ["VOTER_FILTER_ENABLED"] = "false"
+    os.environ["MERKLE_ENABLED"] = "false"
+    use_database(args.database_url)
+    from app.main import app  # noqa: F401  creates the tables
+    from app.database import SessionLocal
+
+    filter_alone(args.voters, args.probes)
+    db = SessionLocal()
+    contest_id = seed(db, args.voters)
+    build_and_lookups(db, contest_id, args.voters, min(args.probes, 10000))
+    db.close()
+    asyncio.run(endpoints(contest_id, args.voters, args.requests))
+
+
+if __name__ == "__main__":
+    main()